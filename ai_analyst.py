@@ -1,24 +1,70 @@
-import openai
-import streamlit as st
+import asyncio
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+
+# 进程内共享的同步客户端 (按 api_key + base_url 复用，底层 HTTP 连接池也跟着复用)。
+# 异步客户端不在这里缓存：它的连接池绑定在创建它的事件循环上，见 generate_reports_batch
+_clients = {}
+_clients_lock = threading.Lock()
+
+# 正在生成中的报告：相同输入的并发请求只发一次 API 调用，其余等待同一个结果
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def _import_openai():
+    import openai  # openai 导入很慢 (~0.8s)，第一次真正调用 API 时才加载
+    return openai
+
+
+def _get_client(api_key, base_url):
+    key = (api_key, base_url)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = _import_openai().Client(api_key=api_key, base_url=base_url)
+        return _clients[key]
+
 
 class AIAnalyst:
-    def __init__(self, api_key):
-        # 初始化客户端
-        self.client = openai.Client(
-            api_key=api_key, 
-            base_url="https://api.siliconflow.cn/v1"
-        )
+    BASE_URL = "https://api.siliconflow.cn/v1"
+    MODEL = "deepseek-ai/DeepSeek-V3"  # 确认这个模型名是对的，硅基流动可能是 "deepseek-ai/deepseek-v3"
+    REPORT_TTL = 24 * 3600  # 报告缓存有效期 (秒)
 
-    def generate_assessment(self, repo_name, health_score, bus_factor_risk, intent_dist, activity_trend):
+    def __init__(self, api_key, db=None, base_url=None, model=None, ttl=None):
         """
-        生成项目诊断报告
-
-        :param repo_name: 仓库名
-        :param health_score: 健康分
-        :param bus_factor_risk: 是否有单点风险
-        :param intent_dist: 分类字典
+        :param api_key: API Key
+        :param db: DBManager，用来持久化报告缓存；None 表示不缓存
+        :param base_url: OpenAI 兼容接口地址 (测试时可指向本地 stub)
+        :param model: 模型名
+        :param ttl: 报告缓存有效期 (秒)
         """
+        self.api_key = api_key
+        self.base_url = base_url or self.BASE_URL
+        self.model = model or self.MODEL
+        self.ttl = self.REPORT_TTL if ttl is None else ttl
+        self.db = db
+
+    @property
+    def client(self):
+        """OpenAI 客户端 (复用已有的)，第一次用到时才创建；只读缓存报告时不需要它"""
+        return _get_client(self.api_key, self.base_url)
 
+    @staticmethod
+    def cache_key(repo_name, health_score, bus_factor_risk, intent_dist, activity_trend, model=MODEL):
+        """报告缓存键：对所有输入指标 + 模型名做哈希，指标不变就命中同一份报告"""
+        payload = json.dumps({
+            "repo": repo_name, 
+            "score": health_score, 
+            "risk": bool(bus_factor_risk), 
+            "intent": {str(k): int(v) for k, v in intent_dist.items()}, 
+            "trend": activity_trend, 
+            "model": model, 
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _build_messages(self, repo_name, health_score, bus_factor_risk, intent_dist, activity_trend):
         # 构建 Prompt
         system_prompt = """
         你是一位经验丰富的技术CTO和开源项目评估专家。
@@ -39,15 +85,25 @@ class AIAnalyst:
         - Bus Factor 风险：{"高危 (High Risk)" if bus_factor_risk else "安全 (Safe)"}
         - 工作重心分布：{intent_dist}
         """
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+
+    def generate_assessment(self, repo_name, health_score, bus_factor_risk, intent_dist, activity_trend):
+        """
+        生成项目诊断报告 (流式，不走缓存)
 
+        :param repo_name: 仓库名
+        :param health_score: 健康分
+        :param bus_factor_risk: 是否有单点风险
+        :param intent_dist: 分类字典
+        """
         try:
             # 调用 API
             response = self.client.chat.completions.create(
-                model="deepseek-ai/DeepSeek-V3", # 确认这个模型名是对的，硅基流动可能是 "deepseek-ai/deepseek-v3"
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
+                model=self.model,
+                messages=self._build_messages(repo_name, health_score, bus_factor_risk, intent_dist, activity_trend),
                 stream=True
             )
             
@@ -55,7 +111,103 @@ class AIAnalyst:
             return response
             
         except Exception as e:
-            # 如果出错，为了不让前端崩掉，我们返回一个假的生成器，抛出错误文本
-            # 这是一个高级技巧：Yield 一个包含错误信息的对象
             print(f"DEBUG: AI Error: {e}") # 在终端打印详细错误
-            raise e
\ No newline at end of file
+            raise e
+
+    def get_cached_report(self, repo_name, health_score, bus_factor_risk, intent_dist, activity_trend):
+        """只查缓存，不调用 API。:return: 报告文本或 None"""
+        if self.db is None:
+            return None
+        key = self.cache_key(repo_name, health_score, bus_factor_risk, intent_dist, activity_trend, self.model)
+        return self.db.get_ai_report(key, self.ttl)
+
+    def get_report(self, repo_name, health_score, bus_factor_risk, intent_dist, activity_trend,
+                   on_chunk=None, refresh=False):
+        """
+        获取诊断报告：先查持久化缓存，未命中才调用 API，结果写回缓存
+
+        同一进程里输入完全相同的并发请求只会有一个真正调用 API (其余等待它的结果)。
+
+        :param on_chunk: 流式回调 on_chunk(目前为止的全文)，只有真正发起调用的那个请求会收到
+        :param refresh: True 时忽略缓存，强制重新生成
+        :return: 报告全文
+        """
+        key = self.cache_key(repo_name, health_score, bus_factor_risk, intent_dist, activity_trend, self.model)
+        if not refresh and self.db is not None:
+            cached = self.db.get_ai_report(key, self.ttl)
+            if cached:
+                return cached
+
+        with _inflight_lock:
+            future = _inflight.get(key)
+            leader = future is None
+            if leader:
+                future = _inflight[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            stream = self.generate_assessment(repo_name, health_score, bus_factor_risk, intent_dist, activity_trend)
+            full_resp = ""
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    full_resp += chunk.choices[0].delta.content
+                    if on_chunk:
+                        on_chunk(full_resp)
+            if self.db is not None:
+                self.db.save_ai_report(key, repo_name, self.model, full_resp)
+            future.set_result(full_resp)
+            return full_resp
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with _inflight_lock:
+                _inflight.pop(key, None)
+
+    async def generate_reports_batch(self, items, concurrency=4):
+        """
+        并发批量生成多个仓库的报告 (异步客户端 + 并发上限)
+
+        缓存命中的直接返回；同一批里输入相同的只调用一次。
+        异步客户端每批新建、用完关闭：调用方每次用 asyncio.run 开一个新的事件循环，
+        跨循环复用的客户端连接池会失效，失败的请求被 SDK 自动重试，同一份报告就会被重复计费。
+
+        :param items: 字典列表，键为 repo_name / health_score / bus_factor_risk / intent_dist / activity_trend
+        :param concurrency: 同时进行的 API 调用数上限
+        :return: 与 items 一一对应的列表，元素是报告文本或异常对象
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        tasks = {}
+
+        async def generate(key, item):
+            if self.db is not None:
+                cached = await asyncio.to_thread(self.db.get_ai_report, key, self.ttl)
+                if cached:
+                    return cached
+            async with semaphore:
+                response = await client.chat.completions.create(
+                    model=self.model,
+                    messages=self._build_messages(
+                        item["repo_name"], item["health_score"], item["bus_factor_risk"], 
+                        item["intent_dist"], item["activity_trend"]
+                    ),
+                )
+            report = response.choices[0].message.content or ""
+            if self.db is not None:
+                await asyncio.to_thread(self.db.save_ai_report, key, item["repo_name"], self.model, report)
+            return report
+
+        keys = []
+        async with _import_openai().AsyncClient(api_key=self.api_key, base_url=self.base_url) as client:
+            for item in items:
+                key = self.cache_key(
+                    item["repo_name"], item["health_score"], item["bus_factor_risk"], 
+                    item["intent_dist"], item["activity_trend"], self.model
+                )
+                keys.append(key)
+                if key not in tasks:
+                    tasks[key] = asyncio.ensure_future(generate(key, item))
+
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+        return [tasks[key].exception() or tasks[key].result() for key in keys]
@@ -0,0 +1,256 @@
+"""
+可替换的分析引擎：Dashboard 和批量评分用到的聚合查询 (按天 / 周 / 星期几 / 作者 / 分类计数、评分输入)
+
+两个引擎实现同一套查询接口，结果完全一致，可以随时切换：
+- sqlite: 默认。计数读 DBManager 的按天汇总表，评分输入用 SQL 在 SQLite 里算完
+- duckdb: 可选 (pip install duckdb)。嵌入式列存引擎，直接挂载现有的 SQLite 文件 (sqlite 扩展)，
+  或者读取 Parquet / Arrow 快照 (见 snapshot.py)。只读用到的列、多线程向量化执行，
+  数据量超过内存时会溢出到磁盘，不需要把明细读进 pandas
+
+    engine = open_analytics("duckdb", db_path="data/project_data.db")
+    engine = DuckDBAnalytics.from_snapshots(["data/snapshots/a.parquet", "data/snapshots/b.parquet"])
+    engine.get_weekly_counts("pandas-dev/pandas")
+    engine.get_health_scores()
+
+时间窗口的语义和 DBManager 一致：计数按天粒度过滤 (和汇总表一样)，评分输入按 commit 时间精确过滤。
+"""
+import threading
+
+import pandas as pd
+
+import perf
+from db_manager import score_inputs_frame, score_inputs_query, to_epoch
+from score_calculator import scores_from_inputs
+
+ENGINES = ("sqlite", "duckdb")
+
+
+class Analytics:
+    """查询接口；按周计数和健康分由按天计数 / 评分输入推出来，两个引擎共用"""
+
+    name = None
+
+    def get_weekly_counts(self, repo_name, since=None, until=None):
+        """:return: Series，每周 (周日结束) 的 commit 数，没有 commit 的周为 0"""
+        return self.get_daily_counts(repo_name, since=since, until=until).resample('W').sum()
+
+    def get_health_scores(self, repo_name=None, since=None, until=None, now=None, truck_factors=None):
+        """
+        批量健康分，结果和 score_calculator.calculate_health_scores 一致
+
+        :param repo_name: None 表示所有仓库
+        :param now / truck_factors: 同 calculate_health_scores
+        """
+        inputs = self.get_score_inputs(repo_name, since=since, until=until)
+        return scores_from_inputs(inputs, now=now, truck_factors=truck_factors)
+
+    def close(self):
+        pass
+
+
+class SQLiteAnalytics(Analytics):
+    """直接用 DBManager 的查询 (连接池里的只读连接)"""
+
+    name = "sqlite"
+
+    def __init__(self, db):
+        self.db = db
+
+    def get_daily_counts(self, repo_name, since=None, until=None):
+        return self.db.get_daily_counts(repo_name, since=since, until=until)
+
+    def get_weekday_counts(self, repo_name, since=None, until=None):
+        return self.db.get_weekday_counts(repo_name, since=since, until=until)
+
+    def get_author_counts(self, repo_name, limit=None, since=None, until=None):
+        return self.db.get_author_counts(repo_name, limit=limit, since=since, until=until)
+
+    def get_category_counts(self, repo_name, since=None, until=None):
+        return self.db.get_category_counts(repo_name, since=since, until=until)
+
+    def get_score_inputs(self, repo_name=None, since=None, until=None):
+        return self.db.get_score_inputs(repo_name, since=since, until=until)
+
+
+def _import_duckdb():
+    try:
+        import duckdb  # 可选依赖，只在选了这个引擎时加载
+    except ImportError as e:
+        raise ImportError("The DuckDB analytics engine needs the duckdb package: pip install duckdb") from e
+    return duckdb
+
+
+def _quote(value):
+    """SQL 字符串字面量 (视图定义里不能用参数占位符)"""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+class DuckDBAnalytics(Analytics):
+    """
+    DuckDB 引擎。数据源统一包装成一个 commits 视图 (repo_name / author / ts / day / additions / deletions / category)，
+    day 是 UTC 的天序号 (epoch 天)，查询都在这个视图上做；评分输入和 SQLite 执行的是同一条 SQL。
+
+    一个 DuckDB 连接在多个线程之间共用 (Arrow 快照注册在这个连接上)，查询串行执行，
+    每条查询内部由 DuckDB 自己多线程并行。
+    """
+
+    name = "duckdb"
+
+    # commits 视图里的列，ts 是 epoch 秒
+    _DAY = "CAST(floor(ts / 86400) AS BIGINT)"
+
+    def __init__(self, source_sql, setup=(), tables=None):
+        """
+        :param source_sql: 产出 repo_name / author / ts / additions / deletions / category 的 SELECT
+        :param setup: 建视图之前执行的语句 (加载扩展、ATTACH)
+        :param tables: 要注册到连接上的 {名字: pyarrow.Table}
+        """
+        self._con = _import_duckdb().connect()
+        self._lock = threading.Lock()
+        for statement in setup:
+            self._con.execute(statement)
+        for name, table in (tables or {}).items():
+            self._con.register(name, table)
+        self._con.execute(f'''
+            CREATE VIEW commits AS
+            SELECT repo_name, author, ts, {self._DAY} AS day, additions, deletions, category
+            FROM ({source_sql})
+        ''')
+
+    @classmethod
+    def from_sqlite(cls, db_path):
+        """
+        只读挂载现有的 SQLite 数据库 (DuckDB 的 sqlite 扩展，第一次使用时需要联网下载)
+
+        按天汇总表在这里用不到：DuckDB 直接扫 commits 表的几列，一样很快
+        """
+        _import_duckdb()
+        try:
+            return cls(
+                "SELECT repo_name, author, ts, additions, deletions, category FROM src.commits",
+                setup=("INSTALL sqlite", "LOAD sqlite", f"ATTACH {_quote(db_path)} AS src (TYPE sqlite, READ_ONLY)"),
+            )
+        except Exception as e:
+            raise RuntimeError(
+                f"DuckDB could not attach {db_path}: {e}. The sqlite extension is downloaded on first use; "
+                "without network access, export Parquet snapshots and use DuckDBAnalytics.from_snapshots instead."
+            ) from e
+
+    @classmethod
+    def from_snapshots(cls, paths):
+        """
+        读取一个或多个仓库快照 (snapshot.py 导出的 .parquet / .arrow)，仓库名取自快照元数据
+
+        Parquet 由 DuckDB 直接扫描 (只解压用到的列)；Arrow IPC 内存映射打开后注册给 DuckDB，不拷贝
+        """
+        import pyarrow.parquet as pq  # pyarrow 只在用到快照时加载
+        from snapshot import read_snapshot, snapshot_info
+
+        selects, tables = [], {}
+        for i, path in enumerate(paths):
+            if str(path).lower().endswith(".parquet"):
+                metadata = pq.read_schema(path).metadata or {}
+                repo_name = metadata.get(b"repo_name", b"").decode()
+                source = f"read_parquet({_quote(path)})"
+            else:
+                table = read_snapshot(path)
+                repo_name = snapshot_info(table).get("repo_name")
+                source = f"snapshot_{i}"
+                tables[source] = table
+            if not repo_name:
+                raise ValueError(f"Snapshot has no repo_name metadata: {path}")
+            # author / category 在快照里是字典编码，转成普通字符串；date 是 UTC 时间戳，转成 epoch 秒
+            selects.append(f'''
+                SELECT {_quote(repo_name)} AS repo_name, CAST(author AS VARCHAR) AS author,
+                       CAST(floor(epoch(date)) AS BIGINT) AS ts, additions, deletions,
+                       CAST(category AS VARCHAR) AS category
+                FROM {source}
+            ''')
+        if not selects:
+            raise ValueError("No snapshot files given")
+        return cls(" UNION ALL ".join(selects), tables=tables)
+
+    def _fetch(self, sql, params=()):
+        with perf.span("duckdb.query"), self._lock:
+            return self._con.execute(sql, list(params)).fetchall()
+
+    @staticmethod
+    def _day_window(since, until):
+        """和 DBManager 的按天过滤一致：[since 那天, until 所在的那天]"""
+        since, until = to_epoch(since), to_epoch(until)
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("day >= ?")
+            params.append(since // 86400)
+        if until is not None:
+            clauses.append("day < ?")
+            params.append((until + 86399) // 86400)
+        return "".join(f" AND {c}" for c in clauses), params
+
+    def get_daily_counts(self, repo_name, since=None, until=None):
+        window, params = self._day_window(since, until)
+        rows = self._fetch(f'''
+            SELECT day, COUNT(*) FROM commits
+            WHERE repo_name = ?{window}
+            GROUP BY day
+            ORDER BY day
+        ''', (repo_name, *params))
+        df = pd.DataFrame.from_records(rows, columns=['day', 'commits'])
+        return pd.Series(
+            df['commits'].to_numpy(dtype='int64'),
+            index=pd.DatetimeIndex(pd.to_datetime(df['day'].to_numpy(dtype='int64') * 86400, unit='s', utc=True),
+                                   name='date').as_unit('ns'),
+            name='commits',
+        )
+
+    def get_weekday_counts(self, repo_name, since=None, until=None):
+        window, params = self._day_window(since, until)
+        # epoch 第 0 天 (1970-01-01) 是周四，周一 = 0；负数天序号取模后再修正
+        counts = dict(self._fetch(f'''
+            SELECT ((day + 3) % 7 + 7) % 7, COUNT(*) FROM commits
+            WHERE repo_name = ?{window}
+            GROUP BY 1
+        ''', (repo_name, *params)))
+        return pd.Series([counts.get(i, 0) for i in range(7)], name='commits')
+
+    def get_author_counts(self, repo_name, limit=None, since=None, until=None):
+        window, params = self._day_window(since, until)
+        # 作者为空的 commit 和汇总表一样记在空字符串名下
+        rows = self._fetch(f'''
+            SELECT COALESCE(author, '') AS name, COUNT(*) AS n FROM commits
+            WHERE repo_name = ?{window}
+            GROUP BY name
+            ORDER BY n DESC, name
+            {"LIMIT ?" if limit else ""}
+        ''', (repo_name, *params, limit) if limit else (repo_name, *params))
+        return pd.Series(dict(rows), name='commits', dtype='int64')
+
+    def get_category_counts(self, repo_name, since=None, until=None):
+        window, params = self._day_window(since, until)
+        rows = self._fetch(f'''
+            SELECT COALESCE(category, '') AS name, COUNT(*) AS n FROM commits
+            WHERE repo_name = ?{window}
+            GROUP BY name
+            ORDER BY n DESC, name
+        ''', (repo_name, *params))
+        return pd.Series(dict(rows), name='commits', dtype='int64')
+
+    def get_score_inputs(self, repo_name=None, since=None, until=None):
+        sql, params = score_inputs_query(repo_name, since, until)
+        return score_inputs_frame(self._fetch(sql, params))
+
+    def close(self):
+        self._con.close()
+
+
+def open_analytics(engine="sqlite", db=None, db_path=None):
+    """
+    :param engine: "sqlite" 或 "duckdb"
+    :param db: sqlite 引擎用的 DBManager
+    :param db_path: duckdb 引擎挂载的 SQLite 文件，默认取 db.db_path
+    """
+    if engine == "sqlite":
+        return SQLiteAnalytics(db)
+    if engine == "duckdb":
+        return DuckDBAnalytics.from_sqlite(db_path or db.db_path)
+    raise ValueError(f"Unknown analytics engine: {engine} (expected one of {', '.join(ENGINES)})")
@@ -1,25 +1,30 @@
-import altair as alt
 import streamlit as st
 import pandas as pd
+import os
 import traceback
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
-from github_loader import GitHubLoader
-from db_manager import DBManager
-from score_calculator import calculate_health_score
-from classifier import CommitClassifier
-from ai_analyst import AIAnalyst
+import perf
+from sync_pipeline import sync_repo
+from dashboard_cache import (
+    get_db, get_classifier, get_loaders, get_analyst, get_analytics, load_repo_view, load_portfolio_ranking,
+    load_snapshot_info, load_snapshot_view, start_warmup, DEFAULT_ENGINE
+)
+from analytics import ENGINES
+from db_manager import SearchQueryError
+from git_loader import GitLogError, GitRepoError, LocalGitLoader
 
 # === 初始化 ===
 st.set_page_config(page_title="Project Activity Dashboard", layout="wide") # 稍微优化一下布局宽屏模式
 st.title("Project Activity Dashboard")
 
 # 1. 初始化 Session State (这是解决你问题的核心！)
-# 我们用这两个变量来“记住”数据，不管你点什么按钮，数据都在。
-if 'data' not in st.session_state:
-    st.session_state['data'] = None
+# 只需要"记住"当前分析的仓库名，数据本身在跨会话缓存里 (见 dashboard_cache.py)
 if 'current_repo' not in st.session_state:
     st.session_state['current_repo'] = ""
+# 不为空时，当前仓库直接从这个快照文件展示 (内存映射，不读数据库)
+if 'snapshot_path' not in st.session_state:
+    st.session_state['snapshot_path'] = ""
 
 # 安全检查
 st.subheader("Security Check")
@@ -29,231 +34,478 @@ except:
     st.error("Please config your Token in .streamlit/secrets.toml !")
     st.stop()
 
-# 初始化加载器
-loader = GitHubLoader(token)
-db = DBManager()
-classifier = CommitClassifier()
+# 初始化加载器 (进程级共享，每次 rerun 不再重建连接)
+loader, graphql_loader = get_loaders(token)
+db = get_db()
+classifier = get_classifier()
+
+# 启动器 (main_launcher.py --warm N) 要求时，后台预热最近几个仓库的视图
+if os.environ.get("PAD_WARM_REPOS"):
+    start_warmup(int(os.environ["PAD_WARM_REPOS"]))
+
+# === 页面切换：单仓库分析 / 组合视图 ===
+page = st.sidebar.radio("Page", ["Single Repository", "Portfolio"])
+
+# 性能埋点开关 (进程级，关闭时几乎零开销)
+perf.enable(st.sidebar.toggle("Performance instrumentation", value=perf.is_enabled()))
+
+# 分析引擎：计数图表和组合评分用 SQLite 还是 DuckDB 算 (结果一致，DuckDB 是可选依赖)
+engine = st.sidebar.selectbox(
+    "Analytics engine", ENGINES, index=ENGINES.index(DEFAULT_ENGINE) if DEFAULT_ENGINE in ENGINES else 0,
+    help="duckdb needs `pip install duckdb`; falls back to sqlite when unavailable.",
+)
+analytics, engine_error = get_analytics(engine)
+if engine_error:
+    st.sidebar.warning(f"Using sqlite: {engine_error}")
+
+if page == "Portfolio":
+    # 所有本地缓存过的仓库一次性批量评分并排名 (纯本地数据，不请求网络)
+    st.subheader("Portfolio Health Ranking")
+    ranking = load_portfolio_ranking(db, analytics)
+    if ranking is None:
+        st.info("No repositories cached yet. Analyze a project first.")
+    else:
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Repositories", len(ranking))
+        col2.metric("Average Score", f"{ranking['score'].mean():.0f}")
+        col3.metric("At Risk (<50)", int((ranking['score'] < 50).sum()))
+        st.dataframe(
+            ranking.reset_index().rename(columns={'repo_name': 'Repository'}),
+            use_container_width=True, hide_index=True,
+            column_config={
+                "score": st.column_config.ProgressColumn("Score", min_value=0, max_value=100, format="%d"),
+                "top_contributor_ratio": st.column_config.NumberColumn("Top Contributor", format="percent"),
+                "truck_factor": st.column_config.NumberColumn("Truck Factor", format="%d"),
+            },
+        )
+
+        # 批量 AI 诊断：异步并发生成，已缓存的直接复用
+        api_key = st.secrets.get("DEEPSEEK_API_KEY")
+        if api_key and st.button("Generate AI Reports for All Repositories"):
+            import asyncio
+
+            analyst = get_analyst(api_key, st.secrets.get("AI_BASE_URL"))
+            items = []
+            for repo in ranking.index:
+                view = load_repo_view(db, repo, classifier.rule_version, analytics=analytics)
+                items.append({
+                    "repo_name": repo, "health_score": view['score'], "bus_factor_risk": view['is_risky'],
+                    "intent_dist": view['intent_dist'], "activity_trend": view['trend'],
+                })
+            with st.spinner(f"Generating {len(items)} reports..."):
+                reports = asyncio.run(analyst.generate_reports_batch(items, concurrency=4))
+            for item, report in zip(items, reports):
+                with st.expander(item["repo_name"]):
+                    if isinstance(report, Exception):
+                        st.error(f"AI Error: {report}")
+                    else:
+                        st.markdown(report)
+    st.stop()
+
+# === 后台同步服务维护的仓库：直接从本地数据库打开，不请求网络 ===
+synced = db.get_sync_status()
+if synced:
+    st.sidebar.subheader("Background Sync")
+
+    def open_synced_repo():
+        if st.session_state['synced_repo']:
+            st.session_state['current_repo'] = st.session_state['synced_repo']
+            st.session_state['snapshot_path'] = ""
+
+    st.sidebar.selectbox(
+        "Open synced repository", [""] + [r['repo_name'] for r in synced],
+        key="synced_repo", on_change=open_synced_repo
+    )
+    for r in synced:
+        icon = "🟢" if r['status'] == "ok" else "🟡" if r['status'] == "running" else "🔴"
+        st.sidebar.caption(f"{icon} {r['repo_name']} — {r['status']} at {r['last_sync_at']}")
+
+# === 快照：导出当前仓库 / 打开或导入别人给的快照 (.arrow / .parquet) ===
+st.sidebar.subheader("Snapshots")
+snapshot_input = st.sidebar.text_input("Snapshot file", help=".arrow opens memory-mapped; .parquet is smaller to share.")
+col_s1, col_s2 = st.sidebar.columns(2)
+if col_s1.button("Open Snapshot") and snapshot_input:
+    try:
+        info, _, _ = load_snapshot_info(snapshot_input)
+        st.session_state['current_repo'] = info.get('repo_name') or snapshot_input
+        st.session_state['snapshot_path'] = snapshot_input
+    except Exception as e:
+        st.sidebar.error(f"Snapshot Error: {e}")
+if col_s2.button("Import to DB") and snapshot_input:
+    from snapshot import import_snapshot
+
+    try:
+        with st.spinner("Importing snapshot..."):
+            info, _, _ = load_snapshot_info(snapshot_input)
+            import_snapshot(db, snapshot_input, classifier=classifier)
+        st.session_state['current_repo'] = info.get('repo_name')
+        st.session_state['snapshot_path'] = ""
+        st.rerun()
+    except Exception as e:
+        st.sidebar.error(f"Snapshot Error: {e}")
+if st.session_state['current_repo'] and not st.session_state['snapshot_path']:
+    if st.sidebar.button("Export Current Repository"):
+        from snapshot import export_snapshot
+
+        export_path = os.path.join("data", "snapshots", st.session_state['current_repo'].replace("/", "__") + ".arrow")
+        count = export_snapshot(db, st.session_state['current_repo'], export_path)
+        st.sidebar.success(f"Exported {count} commits to {export_path}")
 
 # === 用户输入 ===
 # 这里我们只是获取输入，不立即执行
 repo_input = st.text_input("Enter Repository Name", "pandas-dev/pandas")
+source_kind = st.radio(
+    "Data Source", ["GitHub REST", "GitHub GraphQL (line stats)", "Local git clone"], horizontal=True,
+    help="GraphQL fetches additions/deletions 100 commits per request; a local clone is read with git log and needs no API."
+)
+local_path = st.text_input("Local clone path") if source_kind == "Local git clone" else None
 
 # === 逻辑块 A：获取数据 (Data Fetching) ===
 # 只有点击这个按钮时，才去网络请求和读数据库
 if st.button("Analyze Project"):
     with st.spinner(f"Fetching data from {repo_input} ..."):
         try:
+            # 本地 clone：路径为空或不是 git 仓库时直接报错，不能悄悄退回 API
+            if local_path is not None:
+                local_path = local_path.strip()
+                LocalGitLoader(local_path).check()
+
             # 更新当前分析的仓库名
             st.session_state['current_repo'] = repo_input
+            st.session_state['snapshot_path'] = ""
             
             # --- 核心数据获取逻辑 (和你原来的一样) ---
             last_date = db.get_latest_commit_date(repo_input)
+            sync_state = None if local_path is not None else db.get_sync_state(repo_input)
 
-            if last_date:
+            if sync_state and sync_state['status'] in ("interrupted", "running"):
+                stored_back = f" (history stored back to {sync_state['oldest_date']})" if sync_state['oldest_date'] else ""
+                st.info(f"Resuming interrupted sync{stored_back}...")
+            elif last_date:
                 st.info(f"Local data found. Last update: {last_date}. Fetching new commits...")
-                new_commits_raw = loader.fetch_commits(repo_input, limit=500, since_date=last_date)
             else:
                 st.info("First time analysis. Fetching history...")
-                new_commits_raw = loader.fetch_commits(repo_input, limit=500)
-
-            # 数据清洗 & 分类
-            cleaned_data = []
-            for c in new_commits_raw:
-                message = c['commit']['message']
-                category = classifier.classify(message)
-                cleaned_data.append({
-                    "sha": c['sha'],
-                    "author": c['commit']['author']['name'],
-                    "date": c['commit']['author']['date'],
-                    "message": c['commit']['message'],
-                    "additions": 0,
-                    "deletions": 0,
-                    "category": category
-                })
 
-            if cleaned_data:
-                db.save_commits(repo_input, cleaned_data)
+            # 流式处理：每抓到一页就分类，攒够一批就写库，不再有 500 条上限
+            progress_text = st.empty()
+
+            def show_progress(fetched, saved):
+                progress_text.text(f"Fetched {fetched} commits, {saved} new saved to local DB...")
+
+            source = graphql_loader if source_kind == "GitHub GraphQL (line stats)" else loader
+            sync_repo(db, classifier, repo_input, loader=source, local_path=local_path, progress=show_progress)
 
-            # 读取全量数据
-            all_commits = db.get_all_commits(repo_input)
-            df = pd.DataFrame(all_commits)
-            
-            # --- 【关键修改】 ---
-            # 不要在这里直接画图！
-            # 而是把处理好的 df 存进 Session State 里
-            st.session_state['data'] = df
-            
             # 成功后，强制刷新一下页面，让下面的 "逻辑块 B" 立即运行
             st.rerun()
 
+        except GitLogError as e:
+            st.error(f"Reading the local clone failed: {e}")
+
+        except GitRepoError as e:
+            st.error(f"Invalid local clone path: {e}")
+
         except Exception as e:
             st.error(f"Error during fetch: {e}")
+            if local_path is None:
+                st.caption("Progress up to the last saved page is kept. Click Analyze again to resume.")
             traceback.print_exc()
 
 
 # === 逻辑块 B：展示数据 (Data Visualization) ===
 # 只要 Session State 里有数据，这部分代码就会运行。
 # 无论你是刚点完 "Analyze"，还是点了 "AI Report"，这里都会执行！
-if st.session_state['data'] is not None:
-    
-    # 使用副本，防止修改原始数据
-    df = st.session_state['data'].copy()
+if st.session_state['current_repo']:
     repo_name = st.session_state['current_repo']
+    snapshot_path = st.session_state['snapshot_path']
 
     try:
-        # === 数据预处理 ===
-        if 'date' in df.columns:
-            df['date'] = pd.to_datetime(df['date'], utc=True)
-            df.set_index('date', inplace=True)
-            df.sort_index(inplace=True)
+        # === 时间窗口：评分、图表、意图分析都只看这段时间 (过滤在 SQL 里完成) ===
+        if snapshot_path:
+            _, first_ts, last_ts = load_snapshot_info(snapshot_path)
+        else:
+            first_ts, last_ts = db.get_date_range(repo_name)
+        since = until = None
+        if first_ts is not None:
+            col_w1, col_w2 = st.columns([1, 2])
+            window_choice = col_w1.selectbox(
+                "Time Window", ["All time", "Last 30 days", "Last 90 days", "Last 365 days", "Custom"]
+            )
+            today = datetime.now(timezone.utc).date()
+            if window_choice == "Custom":
+                first_day = datetime.fromtimestamp(first_ts, timezone.utc).date()
+                last_day = datetime.fromtimestamp(last_ts, timezone.utc).date()
+                picked = col_w2.date_input(
+                    "Date range (UTC)", value=(first_day, last_day), min_value=first_day, max_value=max(last_day, today)
+                )
+                # 只选了开始日期时先按开放区间处理
+                picked = list(picked) if isinstance(picked, (tuple, list)) else [picked]
+                start_day = picked[0] if picked else None
+                end_day = picked[1] if len(picked) > 1 else None
+            elif window_choice != "All time":
+                start_day, end_day = today - timedelta(days=int(window_choice.split()[1]) - 1), None
+            else:
+                start_day = end_day = None
+            # 转成 epoch 秒，区间左闭右开：结束日期那天整天都算进来
+            if start_day:
+                since = int(datetime(start_day.year, start_day.month, start_day.day, tzinfo=timezone.utc).timestamp())
+            if end_day:
+                until = int(datetime(end_day.year, end_day.month, end_day.day, tzinfo=timezone.utc).timestamp()) + 86400
 
-        st.success(f"Analysis Ready for {repo_name}! Total Commits: {len(df)}")
+        # 所有派生数据都来自跨会话缓存：数据没变时 rerun 不做任何计算，也不复制 DataFrame
+        with perf.span("app.load_repo_view"):
+            if snapshot_path:
+                view = load_snapshot_view(snapshot_path, since=since, until=until)
+            else:
+                view = load_repo_view(
+                    db, repo_name, classifier.rule_version, since=since, until=until, analytics=analytics
+                )
+        total_commits = view['total_commits']
+        contributors = view['contributors']
+        duration = view['duration']
+        score, reasons = view['score'], view['reasons']
+        weekly_commits = view['weekly_commits']
+        author_totals = view['author_totals']
+        type_counts = view['type_counts']
+
+        window_note = "" if since is None and until is None else " in selected window"
+        st.success(f"Analysis Ready for {repo_name}! Total Commits{window_note}: {total_commits}")
+        if snapshot_path:
+            st.caption(f"Showing snapshot {snapshot_path} (read-only, not in the local database).")
         
         # === Day 3 新增: 使用 Tabs 组织布局 ===
-        tab_overview, tab_deep_dive, tab_intent = st.tabs(["Overview", "Deep Dive", "Intent Analysis"])
-        
-        # 计算一些通用指标 (复用)
-        total_commits = len(df)
-        contributors = df['author'].nunique()
-        duration = (df.index.max() - df.index.min()).days if not df.empty else 0
-        score, reasons = calculate_health_score(df)
+        # st.tabs 会把每个 tab 的内容都算一遍；这里只渲染选中的那一页，图表库等重模块也只在用到时才加载
+        active_tab = st.segmented_control(
+            "View", ["Overview", "Deep Dive", "Intent Analysis", "Search", "Performance"],
+            default="Overview", key="active_tab", label_visibility="collapsed"
+        ) or "Overview"
         
         # --- Tab 1: Overview (总览) ---
-        with tab_overview:
-            # 1. 核心指标卡片
-            col1, col2, col3 = st.columns(3)
-            col1.metric("Total Commits", total_commits)
-            col2.metric("Contributors", contributors)
-            col3.metric("Active Days", f"{duration} days")
+        if active_tab == "Overview":
+            with perf.span("tab.overview"):
+                # 1. 核心指标卡片
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Total Commits", total_commits)
+                col2.metric("Contributors", contributors)
+                col3.metric("Active Days", f"{duration} days")
             
-            st.divider()
+                st.divider()
             
-            # 2. 健康度评分 (左) + AI 报告 (右)
-            col_score, col_ai = st.columns([1, 2])
+                # 2. 健康度评分 (左) + AI 报告 (右)
+                col_score, col_ai = st.columns([1, 2])
             
-            with col_score:
-                st.subheader("Health Score")
-                color = "green" if score >= 80 else "orange" if score >= 50 else "red"
-                st.markdown(f"""
-                    <div style="text-align: center; padding: 20px; border: 1px solid #ddd; border-radius: 10px;">
-                        <h1 style="color: {color}; font-size: 80px; margin:0;">{score}</h1>
-                        <p>Out of 100</p>
-                    </div>
-                """, unsafe_allow_html=True)
+                with col_score:
+                    st.subheader("Health Score")
+                    color = "green" if score >= 80 else "orange" if score >= 50 else "red"
+                    st.markdown(f"""
+                        <div style="text-align: center; padding: 20px; border: 1px solid #ddd; border-radius: 10px;">
+                            <h1 style="color: {color}; font-size: 80px; margin:0;">{score}</h1>
+                            <p>Out of 100</p>
+                        </div>
+                    """, unsafe_allow_html=True)
                 
-                # 显示简单的扣分原因
-                with st.expander("View Score Details"):
-                    for reason in reasons:
-                        st.write(reason)
+                    # 显示简单的扣分原因
+                    with st.expander("View Score Details"):
+                        for reason in reasons:
+                            st.write(reason)
 
-            with col_ai:
-                st.subheader("AI CTO Diagnosis")
+                with col_ai:
+                    st.subheader("AI CTO Diagnosis")
                 
-                # 准备 AI 数据
-                type_counts = df['category'].value_counts()
-                intent_dist = type_counts.to_dict()
-                is_risky = (len(reasons) > 0 and "Risk" in reasons[-1])
-                
-                # 计算趋势
-                weekly_commits = df.resample('W')['sha'].count()
-                if len(weekly_commits) >= 4:
-                    recent_avg = weekly_commits.tail(4).mean()
-                    total_avg = weekly_commits.mean()
-                    trend = "Rising" if recent_avg > total_avg * 1.2 else "Falling" if recent_avg < total_avg * 0.5 else "Stable"
-                else:
-                    trend = "Unknown"
+                    # 准备 AI 数据 (趋势等已在缓存里算好)
+                    intent_dist = view['intent_dist']
+                    is_risky = view['is_risky']
+                    trend = view['trend']
 
-                # 缓存逻辑 (Day 2 作业成果)
-                if 'ai_reports' not in st.session_state:
-                    st.session_state['ai_reports'] = {}
-                current_report = st.session_state['ai_reports'].get(repo_name, "")
-                
-                if current_report:
-                    st.info(current_report)
-                    if st.button("Regenerate Diagnosis", key="regen_btn"):
-                        st.session_state['ai_reports'][repo_name] = ""
-                        st.rerun()
-                else:
-                    if st.button("Generate AI Report", key="gen_btn"):
+                    # 报告持久化在 SQLite 里 (键是输入指标的哈希，带有效期)，刷新页面、换个用户都能命中
+                    report_args = (repo_name, score, is_risky, intent_dist, trend)
+                    api_key = st.secrets.get("DEEPSEEK_API_KEY")
+                    analyst = get_analyst(api_key, st.secrets.get("AI_BASE_URL")) if api_key else None
+                    current_report = analyst.get_cached_report(*report_args) if analyst else None
+
+                    def run_report(refresh=False):
+                        report_box = st.empty()
                         try:
-                            api_key = st.secrets["DEEPSEEK_API_KEY"]
-                            analyst = AIAnalyst(api_key)
                             with st.spinner("AI is analyzing..."):
-                                stream = analyst.generate_assessment(repo_name, score, is_risky, intent_dist, trend)
-                                
-                                # 非流式处理 (如果 ai_analyst 改了的话) 或 流式处理
-                                # 这里假设你用的是 Day 2 的流式代码
-                                report_box = st.empty()
-                                full_resp = ""
-                                if isinstance(stream, str):
-                                    st.error(stream)
-                                else:
-                                    for chunk in stream:
-                                        if chunk.choices and chunk.choices[0].delta.content:
-                                            full_resp += chunk.choices[0].delta.content
-                                            report_box.markdown(full_resp + "▌")
-                                    
-                                    report_box.markdown(full_resp)
-                                    st.session_state['ai_reports'][repo_name] = full_resp
+                                # 流式显示；同一份输入的并发请求只会真正调用一次 API
+                                full_resp = analyst.get_report(
+                                    *report_args, refresh=refresh,
+                                    on_chunk=lambda text: report_box.markdown(text + "▌")
+                                )
+                            report_box.markdown(full_resp)
                         except Exception as e:
                             st.error(f"AI Error: {e}")
 
+                    if analyst is None:
+                        st.warning("Please config DEEPSEEK_API_KEY in .streamlit/secrets.toml to enable AI reports.")
+                    elif current_report:
+                        st.info(current_report)
+                        if st.button("Regenerate Diagnosis", key="regen_btn"):
+                            run_report(refresh=True)
+                    else:
+                        if st.button("Generate AI Report", key="gen_btn"):
+                            run_report()
+
         # --- Tab 2: Deep Dive (深度分析) ---
-        with tab_deep_dive:
-            st.subheader("Commit Activity")
-            st.line_chart(weekly_commits)
+        if active_tab == "Deep Dive":
+            import altair as alt  # 只在打开图表页时才加载
+
+            with perf.span("tab.deep_dive"):
+                st.subheader("Commit Activity")
+                st.line_chart(weekly_commits)
+
+                st.subheader("Code Churn (30-day rolling)")
+                if view['churn'] is None:
+                    st.caption("No line statistics for this repository. Sync it via GitHub GraphQL or a local git clone to see churn.")
+                else:
+                    col_c1, col_c2 = st.columns([2, 1])
+                    with col_c1:
+                        st.line_chart(view['churn'][['additions', 'deletions']])
+                    with col_c2:
+                        st.metric("Churn / Growth (last 90 days)", f"{view['churn_ratio']:.1f}")
+                        st.caption("Changed lines per net line added. Higher means more rework.")
+                        st.dataframe(
+                            view['author_churn'][['commits', 'churn', 'churn_to_growth']],
+                            use_container_width=True,
+                            column_config={"churn_to_growth": st.column_config.NumberColumn("churn/growth", format="%.1f")},
+                        )
             
-            col_d1, col_d2 = st.columns(2)
+                st.subheader("File Ownership")
+                truck = view['truck']
+                if truck is None:
+                    st.caption("No per-file statistics for this repository. Sync it from a local git clone to see the truck factor.")
+                else:
+                    col_t1, col_t2 = st.columns([1, 2])
+                    with col_t1:
+                        st.metric("Truck Factor", truck['truck_factor'])
+                        st.caption(
+                            f"Fewest developers whose departure leaves over half of the {truck['files']} current files "
+                            f"without an owner ({truck['authors']} authors, full history)."
+                        )
+                    with col_t2:
+                        st.dataframe(
+                            pd.DataFrame({'Developer': truck['key_authors'], 'Orphaned files': truck['orphaned']}),
+                            use_container_width=True, hide_index=True,
+                            column_config={"Orphaned files": st.column_config.ProgressColumn(
+                                "Orphaned files after departure", min_value=0, max_value=1, format="percent"
+                            )},
+                        )
+
+                col_d1, col_d2 = st.columns(2)
             
-            with col_d1:
-                st.subheader("Work Rhythm")
-                day_counts = df.index.day_name().value_counts()
-                days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-                day_counts = day_counts.reindex(days_order, fill_value=0).reset_index()
-                day_counts.columns = ['Day', 'Commits']
+                with col_d1:
+                    st.subheader("Work Rhythm")
+                    days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+                    day_counts = view['weekday_counts'].set_axis(days_order).reset_index()
+                    day_counts.columns = ['Day', 'Commits']
                 
-                c = alt.Chart(day_counts).mark_bar().encode(
-                    x=alt.X('Day', sort=days_order), y='Commits', tooltip=['Day', 'Commits']
-                )
-                st.altair_chart(c, use_container_width=True)
+                    c = alt.Chart(day_counts).mark_bar().encode(
+                        x=alt.X('Day', sort=days_order), y='Commits', tooltip=['Day', 'Commits']
+                    )
+                    st.altair_chart(c, use_container_width=True)
                 
-            with col_d2:
-                st.subheader("Top Contributors")
-                author_counts = df['author'].value_counts().head(10).reset_index()
-                author_counts.columns = ['Author', 'Commits']
+                with col_d2:
+                    st.subheader("Top Contributors")
+                    author_counts = author_totals.head(10).reset_index()
+                    author_counts.columns = ['Author', 'Commits']
                 
-                c2 = alt.Chart(author_counts).mark_bar().encode(
-                    x=alt.X('Author', sort='-y'), y='Commits', color=alt.Color('Commits', legend=None)
-                )
-                st.altair_chart(c2, use_container_width=True)
+                    c2 = alt.Chart(author_counts).mark_bar().encode(
+                        x=alt.X('Author', sort='-y'), y='Commits', color=alt.Color('Commits', legend=None)
+                    )
+                    st.altair_chart(c2, use_container_width=True)
 
         # --- Tab 3: Intent Analysis (意图分析) ---
-        with tab_intent:
-            col_i1, col_i2 = st.columns([2, 1])
+        if active_tab == "Intent Analysis":
+            import altair as alt
+
+            with perf.span("tab.intent"):
+                col_i1, col_i2 = st.columns([2, 1])
             
-            with col_i1:
-                st.subheader("Category Distribution")
-                type_df = type_counts.reset_index()
-                type_df.columns = ['Category', 'Count']
+                with col_i1:
+                    st.subheader("Category Distribution")
+                    type_df = type_counts.reset_index()
+                    type_df.columns = ['Category', 'Count']
                 
-                base = alt.Chart(type_df).encode(theta=alt.Theta("Count", stack=True))
-                pie = base.mark_arc(outerRadius=120).encode(
-                    color=alt.Color("Category"),
-                    order=alt.Order("Count", sort="descending"),
-                    tooltip=["Category", "Count"]
-                )
-                st.altair_chart(pie, use_container_width=True)
+                    base = alt.Chart(type_df).encode(theta=alt.Theta("Count", stack=True))
+                    pie = base.mark_arc(outerRadius=120).encode(
+                        color=alt.Color("Category"),
+                        order=alt.Order("Count", sort="descending"),
+                        tooltip=["Category", "Count"]
+                    )
+                    st.altair_chart(pie, use_container_width=True)
                 
-            with col_i2:
-                st.subheader("Data Quality")
-                other_count = type_df[type_df['Category'] == 'Other']['Count'].sum()
-                ratio = other_count / total_commits if total_commits > 0 else 0
-                st.metric("Unclassified Ratio", f"{ratio:.1%}")
+                with col_i2:
+                    st.subheader("Data Quality")
+                    other_count = type_df[type_df['Category'] == 'Other']['Count'].sum()
+                    ratio = other_count / total_commits if total_commits > 0 else 0
+                    st.metric("Unclassified Ratio", f"{ratio:.1%}")
                 
-                if ratio > 0.3:
-                    st.warning("High unclassified ratio. Consider updating classification rules.")
-                else:
-                    st.success("Good data quality.")
+                    if ratio > 0.3:
+                        st.warning("High unclassified ratio. Consider updating classification rules.")
+                    else:
+                        st.success("Good data quality.")
+
+        # --- Tab 4: Search (全文搜索) ---
+        # 直接查 SQLite 的 FTS5 索引，不把 message 读进 pandas
+        if active_tab == "Search":
+            with perf.span("tab.search"):
+                col_s1, col_s2, col_s3 = st.columns([3, 1, 1])
+                search_text = col_s1.text_input(
+                    "Search commit messages", placeholder='e.g. CVE, revert*, "memory leak", security OR vulnerability'
+                )
+                bucket = col_s2.selectbox("Bucket", ["week", "month", "day"])
+                all_repos = col_s3.checkbox("All repositories", help="Search every repository in the local database")
+                if snapshot_path:
+                    st.caption("Search runs on the local database. Import the snapshot to search it.")
+
+                hits = None
+                if search_text:
+                    search_repo = None if all_repos else repo_name
+                    try:
+                        hits = db.search_commits(search_text, search_repo, since=since, until=until, limit=100)
+                        counts = db.get_search_counts(search_text, search_repo, since=since, until=until, bucket=bucket)
+                    except SearchQueryError as e:
+                        # 只在搜索框下面提示，不影响页面其他部分
+                        st.error(f"Invalid search query: {e}")
+                if hits is not None:
+                    st.metric(f"Matching Commits{window_note}", int(counts.sum()))
+                    if hits.empty:
+                        st.caption("No matching commits.")
+                    else:
+                        st.bar_chart(counts)
+                        st.caption("Top matches by relevance (BM25). Matched terms are marked «like this».")
+                        hits['snippet'] = hits['snippet'].str.replace("\n", " ", regex=False)
+                        st.dataframe(
+                            hits[['date', 'repo_name', 'author', 'category', 'snippet', 'sha']] if all_repos
+                            else hits[['date', 'author', 'category', 'snippet', 'sha']],
+                            use_container_width=True, hide_index=True,
+                        )
+
+        # --- Tab 5: Performance (性能埋点) ---
+        # 每一页的耗时都记在 tab.* 下，切到这一页即可查看之前各页的累计统计
+        if active_tab == "Performance":
+            if not perf.is_enabled():
+                st.info("Instrumentation is off. Turn on 'Performance instrumentation' in the sidebar (or set PAD_PERF=1).")
+            stats = perf.snapshot()
+
+            st.subheader("Timing Spans")
+            if stats['spans']:
+                span_df = pd.DataFrame.from_dict(stats['spans'], orient='index').rename_axis('Span').reset_index()
+                st.dataframe(span_df.sort_values('total_s', ascending=False), use_container_width=True, hide_index=True)
+            else:
+                st.caption("No spans recorded yet.")
+
+            st.subheader("Counters")
+            if stats['counters']:
+                counter_df = pd.DataFrame(list(stats['counters'].items()), columns=['Counter', 'Value'])
+                st.dataframe(counter_df, use_container_width=True, hide_index=True)
+            else:
+                st.caption("No counters recorded yet.")
+
+            col_p1, col_p2 = st.columns(2)
+            col_p1.download_button("Export JSON", perf.to_json(), file_name="perf_stats.json", mime="application/json")
+            if col_p2.button("Reset Stats"):
+                perf.reset()
+                st.rerun()
 
     except Exception as e:
         st.error(f"Visualization Error: {e}")
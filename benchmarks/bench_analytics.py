@@ -0,0 +1,152 @@
+"""
+分析引擎基准：同一份数据上对比 sqlite 和 duckdb 引擎 (见 analytics.py)
+
+1. 数据：多个合成仓库写进 SQLite (save_commits，同时维护汇总表)，每个仓库再导出一份 Parquet 快照
+2. 查询：单个仓库的按周 / 星期几 / 作者 / 分类计数，所有仓库的评分输入和健康分；
+   每个查询取 repeat 次里最快的一次，并校验两个引擎的结果完全一致
+3. 对照：旧的组合评分路径 (get_portfolio_frame 把所有 commit 读进 pandas 再 calculate_health_scores)
+
+duckdb 挂载 SQLite 需要 sqlite 扩展 (第一次使用时联网下载)，装不上时只测 Parquet 快照。
+生成 1000 万 commit 的数据库要十几分钟，--workdir 指定目录后数据会保留下来，下次直接复用。
+
+    python benchmarks/bench_analytics.py --sizes 1000000,10000000 --workdir /tmp/bench_analytics
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from analytics import DuckDBAnalytics, SQLiteAnalytics
+from benchmarks.synthetic import DEFAULT_MIX, generate_history, to_cleaned_batches
+from db_manager import DBManager
+from score_calculator import calculate_health_scores
+from snapshot import export_snapshot
+
+
+def build_dataset(workdir, size, repos, authors, days):
+    """:return: (DBManager, 仓库名列表, Parquet 快照路径列表)；数据库已存在且行数对得上时直接复用"""
+    db = DBManager(os.path.join(workdir, f"analytics_{size}.db"))
+    names = [f"bench/repo{k:03d}" for k in range(repos)]
+    paths = [os.path.join(workdir, f"analytics_{size}_repo{k:03d}.parquet") for k in range(repos)]
+    per_repo = size // repos
+    if len(db.list_repos()) == repos and all(os.path.exists(p) for p in paths):
+        print(f"Reusing {db.db_path}")
+        return db, names, paths
+
+    kinds = list(DEFAULT_MIX)
+    start = time.perf_counter()
+    for k, (name, path) in enumerate(zip(names, paths)):
+        # 仓库之间的作者数、跨度、结束时间都不一样，评分才有高有低
+        history = generate_history(
+            per_repo, authors=max(1, authors * (k + 1) // repos), days=days * (k % 4 + 1) // 4 + 30,
+            end=pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=7 * k), seed=size + k,
+        )
+        rng = np.random.default_rng(k)
+        history['category'] = np.array(kinds)[rng.integers(0, len(kinds), len(history))]
+        for batch in to_cleaned_batches(history, batch_size=20000):
+            db.save_commits(name, batch)
+        del history
+        export_snapshot(db, name, path)
+    print(f"Built {size} commits in {repos} repositories in {time.perf_counter() - start:.0f}s")
+    return db, names, paths
+
+
+def best_of(repeat, func):
+    """:return: (最快一次的秒数, 最后一次的结果)"""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def queries(repo):
+    return {
+        "weekly_counts": lambda e: e.get_weekly_counts(repo),
+        "weekday_counts": lambda e: e.get_weekday_counts(repo),
+        "author_counts": lambda e: e.get_author_counts(repo, limit=10),
+        "category_counts": lambda e: e.get_category_counts(repo),
+        "score_inputs": lambda e: e.get_score_inputs(),
+        "health_scores": lambda e: e.get_health_scores(now=pd.Timestamp("2030-01-01", tz="UTC")),
+    }
+
+
+def same(a, b):
+    try:
+        (pd.testing.assert_frame_equal if isinstance(a, pd.DataFrame) else pd.testing.assert_series_equal)(a, b)
+        return True
+    except AssertionError:
+        return False
+
+
+def bench_size(size, args, workdir):
+    print(f"\n=== {size} commits, {args.repos} repositories ===")
+    db, names, paths = build_dataset(workdir, size, args.repos, args.authors, args.days)
+
+    engines = {"sqlite": SQLiteAnalytics(db), "duckdb_parquet": DuckDBAnalytics.from_snapshots(paths)}
+    try:
+        engines["duckdb_sqlite"] = DuckDBAnalytics.from_sqlite(db.db_path)
+    except RuntimeError as e:
+        print(f"Skipping duckdb_sqlite: {str(e).splitlines()[0]}")
+
+    ok = True
+    print(f"  {'query':<16}" + "".join(f"{name:>16}" for name in engines))
+    for query, func in queries(names[-1]).items():
+        times, results = [], []
+        for engine in engines.values():
+            seconds, result = best_of(args.repeat, lambda: func(engine))
+            times.append(seconds)
+            results.append(result)
+        match = all(same(results[0], r) for r in results[1:])
+        ok = ok and match
+        print(f"  {query:<16}" + "".join(f"{t:15.3f}s" for t in times) + ("" if match else "  MISMATCH"))
+
+    if size <= args.pandas_max:
+        start = time.perf_counter()
+        frame = db.get_portfolio_frame()
+        ranking = calculate_health_scores(frame, now=pd.Timestamp("2030-01-01", tz="UTC"))
+        elapsed = time.perf_counter() - start
+        del frame
+        ranking.index = ranking.index.astype(str)
+        match = same(ranking.sort_index(), results[0].sort_index())
+        ok = ok and match
+        print(f"  pandas portfolio (read all rows + calculate_health_scores) {elapsed:.3f}s"
+              + ("" if match else "  MISMATCH"))
+
+    for engine in engines.values():
+        engine.close()
+    db.close()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000000,10000000", help="逗号分隔的总 commit 数")
+    parser.add_argument("--repos", type=int, default=20)
+    parser.add_argument("--authors", type=int, default=400, help="最大的仓库的作者数")
+    parser.add_argument("--days", type=int, default=8 * 365, help="最长的仓库的历史跨度")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--pandas-max", type=int, default=2000000, help="超过这个规模不跑 pandas 对照 (内存)")
+    parser.add_argument("--workdir", help="数据保留在这个目录下 (默认临时目录，跑完删除)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+        ok = all([bench_size(size, args, args.workdir) for size in sizes])
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            ok = all([bench_size(size, args, workdir) for size in sizes])
+    print("\nAll engines agree." if ok else "\nResults differ between engines!")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+对比旧的逐条嵌套循环分类和 classify_many 的批量分类
+
+    python benchmarks/bench_classifier.py --messages 1000000
+    python benchmarks/bench_classifier.py --messages 1000000 --distinct 50000   # 大量重复的 message
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classifier import CommitClassifier
+
+
+def legacy_classify(rules, message):
+    """优化前 CommitClassifier.classify 的实现，作为基准和正确性对照"""
+    msg_lower = message.lower()
+    if ":" in msg_lower:
+        prefix = msg_lower.split(":")[0].strip()
+        for category, keywords in rules.items():
+            if prefix in keywords or prefix == category.lower():
+                return category
+    for category, keywords in rules.items():
+        for word in keywords:
+            if word in msg_lower:
+                return category
+    return "Other"
+
+
+def make_messages(n, distinct=None, seed=0):
+    """
+    生成 n 条 message
+
+    :param distinct: 不同 message 的个数，默认和 n 相同 (每条都不一样，去重帮不上忙)；
+                     小于 n 时从这么多条里有放回地抽样
+    """
+    distinct = n if distinct is None else distinct
+    rng = random.Random(seed)
+    words = ["login", "parser", "cache", "api", "docs", "memory", "layout", "worker", "query",
+             "config", "release", "index", "thread", "schema", "Refactor", "Fix", "Update", "page"]
+    templates = ["Merge pull request #{n} from user/branch", "Bump lodash from 4.17.{n} to 4.17.{m}",
+                 "feat: {w} {v} #{n}", "fix({w}): handle {v} #{n}", "{W} {v} {w} #{n}", "WIP {n}", "chore: release v1.{n}"]
+    pool = []
+    for i in range(distinct):
+        t = rng.choice(templates)
+        pool.append(t.format(n=i, m=i + 1, w=rng.choice(words), v=rng.choice(words), W=rng.choice(words).title()))
+    if distinct >= n:
+        return pool
+    return [rng.choice(pool) for _ in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--distinct", type=int, help="不同 message 的个数，默认每条都不一样")
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages, distinct=args.distinct)
+    clf = CommitClassifier()
+    # 旧规则里 Chore 重复列了 dep/dependency，Build 排在前面所以永远命中不到，结果不变
+    legacy_rules = dict(clf.rules, Chore=clf.rules["Chore"] + ["dep", "dependency"])
+
+    start = time.perf_counter()
+    expected = [legacy_classify(legacy_rules, m) for m in messages]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    single = [clf.classify(m) for m in messages]
+    single_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bulk = clf.classify_many(messages)
+    bulk_time = time.perf_counter() - start
+
+    assert single == expected, "classify differs from legacy implementation"
+    assert bulk == expected, "classify_many differs from legacy implementation"
+
+    print(f"{args.messages} messages ({len(set(messages))} distinct)")
+    print(f"  legacy loop   : {legacy_time:.2f}s")
+    print(f"  classify      : {single_time:.2f}s")
+    print(f"  classify_many : {bulk_time:.2f}s  ({legacy_time / bulk_time:.1f}x faster than legacy)")
+
+
+if __name__ == "__main__":
+    main()
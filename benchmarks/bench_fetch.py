@@ -0,0 +1,73 @@
+"""
+对比原来的翻页实现、新的顺序翻页和并发翻页的抓取耗时
+
+- baseline:   改造之前的 GitHubLoader.fetch_commits (每页一个新的 requests.get 连接，页之间固定 sleep 0.1s)
+- sequential: 新 GitHubLoader 的顺序模式 (共享 Session 连接池，节奏交给 RequestScheduler)
+- parallel:   新 GitHubLoader 的并发模式
+
+    python benchmarks/bench_fetch.py --commits 5000 --latency 0.05
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from github_loader import GitHubLoader
+from benchmarks.fake_github import FakeGitHubServer, make_commits
+
+
+def baseline_fetch(base_url, repo_name, limit, token="dummy"):
+    """改造之前的抓取循环 (去掉了吞异常，其余照搬)，作为对照"""
+    headers = {"Authorization": f"token {token}", "Accept": "application/vnd.github.v3 + json"}
+    commits = []
+    page = 1
+    while len(commits) < limit:
+        response = requests.get(
+            f"{base_url}/repos/{repo_name}/commits", headers=headers, params={"per_page": 100, "page": page}
+        )
+        response.raise_for_status()
+        data = response.json()
+        if not data:
+            break
+        commits.extend(data)
+        page += 1
+        time.sleep(0.1)
+    return commits[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--commits", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.05, help="模拟的单请求网络延迟 (秒)")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    commits = make_commits(args.commits)
+    expected = [c["sha"] for c in commits]
+    with FakeGitHubServer(commits, latency=args.latency) as server:
+        fetchers = {"baseline": lambda: baseline_fetch(server.url, "fake/repo", args.commits)}
+        for mode, parallel in (("sequential", False), ("parallel", True)):
+            loader = GitHubLoader("dummy", base_url=server.url, max_workers=args.workers, etag_cache_path=None)
+            fetchers[mode] = lambda loader=loader, parallel=parallel: loader.fetch_commits(
+                "fake/repo", limit=args.commits, parallel=parallel
+            )
+
+        results = {}
+        for mode, fetch in fetchers.items():
+            start = time.perf_counter()
+            fetched = fetch()
+            results[mode] = time.perf_counter() - start
+            assert [c["sha"] for c in fetched] == expected, f"{mode}: order mismatch"
+
+    print(f"\n{args.commits} commits, latency={args.latency}s, workers={args.workers}")
+    for mode, elapsed in results.items():
+        speedup = "" if mode == "baseline" else f"  ({results['baseline'] / elapsed:.1f}x vs baseline)"
+        print(f"  {mode:<10}: {elapsed:.2f}s{speedup}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+文件归属 / truck factor 基准
+
+1. 计算：合成 (文件 x 作者) 贡献矩阵 (作者按 Zipf 分布，少数人覆盖大部分文件)，计时 ownership.truck_factor
+2. 入库：带逐文件改动的 commit 批量 save_commits (含 file_authors 汇总表的增量维护)，再读回来算 truck factor
+
+    python benchmarks/bench_ownership.py --files 100000 --authors 3000 --pairs 2000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import generate_history, to_cleaned_batches
+from db_manager import DBManager
+from ownership import truck_factor
+
+REPO = "bench/ownership"
+
+
+def synthetic_ownership(files, authors, pairs, seed=0):
+    """:return: get_file_ownership 格式的 DataFrame (path / author / lines / commits)"""
+    rng = np.random.default_rng(seed)
+    file_idx = rng.integers(0, files, pairs)
+    author_idx = (rng.zipf(1.3, pairs) - 1) % authors
+    df = pd.DataFrame({
+        'path': pd.Categorical.from_codes(file_idx, [f"src/module{i // 100}/file{i}.py" for i in range(files)]),
+        'author': pd.Categorical.from_codes(author_idx, [f"dev{i:05d}" for i in range(authors)]),
+        'lines': rng.integers(1, 400, pairs),
+        'commits': np.ones(pairs, dtype='int64'),
+    })
+    return df.groupby(['path', 'author'], observed=True, as_index=False).sum()
+
+
+def with_file_changes(batch, files, rng):
+    """给每个 commit 随机挂上 1-5 个文件的改动"""
+    for commit in batch:
+        count = int(rng.integers(1, 6))
+        commit['files'] = [
+            (f"src/file{int(f)}.py", int(rng.integers(0, 200)), int(rng.integers(0, 100)), False)
+            for f in rng.integers(0, files, count)
+        ]
+    return batch
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--authors", type=int, default=3000)
+    parser.add_argument("--pairs", type=int, default=2000000, help="(文件, 作者) 贡献记录数 (去重前)")
+    parser.add_argument("--commits", type=int, default=100000, help="入库测试的 commit 数")
+    args = parser.parse_args()
+
+    ownership = synthetic_ownership(args.files, args.authors, args.pairs)
+    start = time.perf_counter()
+    result = truck_factor(ownership)
+    print(f"truck_factor: {len(ownership)} (file, author) pairs, {result['files']} files, {result['authors']} authors "
+          f"-> {result['truck_factor']} in {time.perf_counter() - start:.2f}s")
+
+    rng = np.random.default_rng(1)
+    history = generate_history(args.commits, authors=200)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DBManager(os.path.join(tmp, "ownership.db"))
+        batches = [with_file_changes(batch, args.files // 10, rng) for batch in to_cleaned_batches(history, batch_size=1000)]
+        start = time.perf_counter()
+        for batch in batches:
+            db.save_commits(REPO, batch)
+        ingest = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ownership = db.get_file_ownership(REPO)
+        read = time.perf_counter() - start
+        start = time.perf_counter()
+        result = truck_factor(ownership)
+        print(f"ingest: {args.commits} commits with file changes in {ingest:.2f}s; "
+              f"read {len(ownership)} pairs in {read:.2f}s; truck factor {result['truck_factor']} "
+              f"in {time.perf_counter() - start:.2f}s")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+启动耗时基准
+
+1. 服务就绪：从启动 streamlit 进程到健康检查接口返回 200 的时间 (旧启动器固定 sleep 3 秒)
+2. 首次渲染：全新 Python 进程里第一次执行 app.py 的耗时 (模块导入 + 首屏计算)，分两种模式：
+   - lazy:  当前的 app.py (openai / altair 只在用到时才导入)
+   - eager: 先把这些重模块全部导入再渲染，相当于改动前在顶层导入的行为
+   pyarrow 不算在里面：pandas 2.x 导入时自己就会加载已安装的 pyarrow (pandas.compat.pyarrow)，
+   两种模式下都在启动时加载，单独列出来
+
+    python benchmarks/bench_startup.py --repeat 3 --commits 100000
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from main_launcher import HEALTH_PATH, wait_until_ready
+
+APP_PATH = os.path.join(ROOT, "app.py")
+REPO = "bench/startup"
+LEGACY_SLEEP = 3.0  # 旧启动器的固定等待时间
+HEAVY_MODULES = ["openai", "altair"]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def seed_database(workdir, commits):
+    """在 workdir/data/project_data.db 里写入一个合成仓库"""
+    from benchmarks.synthetic import generate_history, to_cleaned_batches
+    from db_manager import DBManager
+
+    db = DBManager(os.path.join(workdir, "data", "project_data.db"))
+    for batch in to_cleaned_batches(generate_history(commits)):
+        db.save_commits(REPO, batch)
+    db.close()
+
+
+def measure_server_ready(workdir):
+    """:return: 服务就绪耗时 (秒)"""
+    port = _free_port()
+    cmd = [
+        sys.executable, "-m", "streamlit", "run", APP_PATH,
+        "--server.port", str(port), "--server.headless", "true", "--browser.gatherUsageStats", "false",
+    ]
+    process = subprocess.Popen(cmd, cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        start = time.monotonic()
+        elapsed = wait_until_ready(process, f"http://localhost:{port}{HEALTH_PATH}", timeout=60, interval=0.05)
+        if elapsed is None:
+            raise RuntimeError("streamlit server did not become ready")
+        return time.monotonic() - start
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def measure_first_render(workdir, mode):
+    """在新进程里跑一次 app.py，:return: 子进程报告的结果字典"""
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", mode],
+        cwd=workdir, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def child(mode):
+    """子进程：计时 AppTest 第一次执行 app.py (进程刚启动，所有模块都是冷导入)"""
+    start = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+
+    if mode == "eager":
+        for name in HEAVY_MODULES:
+            __import__(name)
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    at.secrets["GITHUB_TOKEN"] = "bench"
+    at.session_state["current_repo"] = REPO
+    at.run()
+    elapsed = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    print(json.dumps({
+        "mode": mode,
+        "first_render_s": elapsed,
+        "loaded": [name for name in HEAVY_MODULES if name in sys.modules],
+        "pyarrow_loaded": "pyarrow" in sys.modules,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--commits", type=int, default=20000, help="合成仓库的 commit 数")
+    parser.add_argument("--child", choices=["lazy", "eager"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        seed_database(workdir, args.commits)
+
+        ready = [measure_server_ready(workdir) for _ in range(args.repeat)]
+        print(f"server ready      median {statistics.median(ready):.2f}s  (legacy fixed sleep {LEGACY_SLEEP:.1f}s)")
+
+        for mode in ("eager", "lazy"):
+            runs = [measure_first_render(workdir, mode) for _ in range(args.repeat)]
+            median = statistics.median(r["first_render_s"] for r in runs)
+            print(f"first render {mode:5s} median {median:.2f}s  heavy modules loaded: {runs[0]['loaded'] or 'none'}"
+                  f"  (pyarrow loaded: {runs[0]['pyarrow_loaded']})")
+
+
+if __name__ == "__main__":
+    main()
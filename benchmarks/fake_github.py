@@ -0,0 +1,225 @@
+"""
+本地假 GitHub API 服务器
+
+只实现 Dashboard 用到的那一小部分接口，方便在没有网络 / 不消耗真实配额的情况下
+测试和压测 GitHubLoader。
+
+用法:
+    with FakeGitHubServer(make_commits(5000), latency=0.05) as server:
+        loader = GitHubLoader("dummy", base_url=server.url)
+"""
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def make_commits(n, authors=10, start=None):
+    """生成 n 条 REST 格式的假 commit，按时间倒序 (和 GitHub 一致)"""
+    start = start or datetime(2020, 1, 1, tzinfo=timezone.utc)
+    commits = []
+    for i in range(n):
+        date = (start + timedelta(hours=i)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        commits.append({
+            "sha": f"{i:040x}",
+            "commit": {
+                "author": {"name": f"author{i % authors}", "date": date},
+                "committer": {"name": f"author{i % authors}", "date": date},
+                "message": f"fix: synthetic commit {i}",
+            },
+            # 列表接口里没有 stats，这里只给 GraphQL 端点用
+            "stats": {"additions": i % 50, "deletions": i % 20},
+        })
+    commits.reverse()
+    return commits
+
+
+def _committed(commit):
+    """GitHub 的 since / until 按提交时间过滤 (没有 committer 时退回作者时间)"""
+    return (commit["commit"].get("committer") or commit["commit"]["author"])["date"]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 支持 keep-alive
+
+    def log_message(self, format, *args):
+        pass  # 静音，压测时不刷屏
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+
+        parsed = urlparse(self.path)
+        parts = parsed.path.strip("/").split("/")
+        if len(parts) != 4 or parts[0] != "repos" or parts[3] != "commits":
+            return self._send_json(404, {"message": "Not Found"})
+
+        repo_name = f"{parts[1]}/{parts[2]}"
+        commits = server.repos.get(repo_name)
+        if commits is None:
+            return self._send_json(404, {"message": "Not Found"})
+
+        query = parse_qs(parsed.query)
+        per_page = int(query.get("per_page", ["30"])[0])
+        page = int(query.get("page", ["1"])[0])
+        since = query.get("since", [None])[0]
+        if since:
+            commits = [c for c in commits if _committed(c) >= since]
+        until = query.get("until", [None])[0]
+        if until:
+            commits = [c for c in commits if _committed(c) <= until]
+
+        last_page = max(1, -(-len(commits) // per_page))
+        body = commits[(page - 1) * per_page: page * per_page]
+        base = f"{server.url}{parsed.path}"
+        link = f'<{base}?per_page={per_page}&page={last_page}>; rel="last"'
+        if page < last_page:
+            link = f'<{base}?per_page={per_page}&page={page + 1}>; rel="next", ' + link
+        etag = '"' + hashlib.sha1(json.dumps(body).encode("utf-8")).hexdigest() + '"'
+
+        with server.lock:
+            server.request_count += 1
+            headers = {"Link": link, "ETag": etag}
+
+            # 条件请求命中：304 不消耗配额 (和 GitHub 行为一致)
+            if self.headers.get("If-None-Match") == etag:
+                server.not_modified_count += 1
+                headers.update(server.rate_headers())
+                return self._send_empty(304, headers)
+
+            if server.rate_limit is not None:
+                if time.time() >= server.reset_at:
+                    server.remaining = server.rate_limit
+                    server.reset_at = time.time() + server.rate_window
+                if server.remaining <= 0:
+                    return self._send_json(403, {"message": "API rate limit exceeded"}, server.rate_headers())
+                server.remaining -= 1
+                headers.update(server.rate_headers())
+
+        return self._send_json(200, body, headers)
+
+    def do_POST(self):
+        """最小化的 GraphQL 端点：只支持 defaultBranchRef.target.history 分页"""
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+
+        if urlparse(self.path).path != "/graphql":
+            return self._send_json(404, {"message": "Not Found"})
+
+        length = int(self.headers.get("Content-Length", 0))
+        variables = json.loads(self.rfile.read(length)).get("variables", {})
+        with server.lock:
+            server.request_count += 1
+
+        commits = server.repos.get(f"{variables['owner']}/{variables['name']}")
+        if commits is None:
+            return self._send_json(200, {
+                "data": {"repository": None},
+                "errors": [{"type": "NOT_FOUND", "message": "Could not resolve to a Repository"}],
+            })
+
+        since = variables.get("since")
+        if since:
+            commits = [c for c in commits if _committed(c) >= since]
+        until = variables.get("until")
+        if until:
+            commits = [c for c in commits if _committed(c) <= until]
+        start = int(variables.get("cursor") or 0)
+        end = start + variables.get("first", 100)
+        nodes = [{
+            "oid": c["sha"],
+            "message": c["commit"]["message"],
+            "additions": c["stats"]["additions"],
+            "deletions": c["stats"]["deletions"],
+            "author": c["commit"]["author"],
+            "committedDate": _committed(c),
+        } for c in commits[start:end]]
+        history = {
+            "pageInfo": {"hasNextPage": end < len(commits), "endCursor": str(end)},
+            "nodes": nodes,
+        }
+        body = {"data": {"repository": {"defaultBranchRef": {"target": {"history": history}}}}}
+        return self._send_json(200, body, server.rate_headers())
+
+    def _send_empty(self, status, headers):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+
+
+class FakeGitHubServer:
+    def __init__(self, commits=None, repo_name="fake/repo", latency=0.0, port=0,
+                 rate_limit=None, rate_window=60.0):
+        """
+        :param commits: REST 格式的 commit 列表 (倒序)
+        :param repo_name: 仓库名
+        :param latency: 每个请求人为增加的延迟 (秒)，模拟真实网络 RTT
+        :param port: 0 表示随机端口
+        :param rate_limit: 每个窗口内允许的请求数，None 表示不限流
+        :param rate_window: 限流窗口长度 (秒)
+        """
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.repos = {repo_name: commits or []}
+        self.httpd.latency = latency
+        self.httpd.lock = threading.Lock()
+        self.httpd.request_count = 0
+        self.httpd.not_modified_count = 0
+        self.httpd.rate_limit = rate_limit
+        self.httpd.rate_window = rate_window
+        self.httpd.remaining = rate_limit
+        self.httpd.reset_at = time.time() + rate_window
+        self.httpd.rate_headers = lambda: {} if self.httpd.rate_limit is None else {
+            "X-RateLimit-Limit": str(self.httpd.rate_limit),
+            "X-RateLimit-Remaining": str(self.httpd.remaining),
+            "X-RateLimit-Reset": str(int(self.httpd.reset_at)),
+        }
+        self.httpd.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self._thread = None
+
+    @property
+    def url(self):
+        return self.httpd.url
+
+    @property
+    def request_count(self):
+        return self.httpd.request_count
+
+    @property
+    def not_modified_count(self):
+        return self.httpd.not_modified_count
+
+    def add_repo(self, repo_name, commits):
+        self.httpd.repos[repo_name] = commits
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,123 @@
+"""
+本地 OpenAI 兼容 stub 服务器
+
+只实现 POST /v1/chat/completions (流式和非流式)，用来在不花钱、不联网的情况下
+测试 AIAnalyst 的报告缓存、并发去重和批量生成。
+
+用法:
+    with FakeOpenAIServer(latency=0.2) as server:
+        analyst = AIAnalyst("dummy", base_url=server.url)
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length))
+
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            payload = json.dumps({"error": {"message": "Not Found"}}).encode("utf-8")
+            self.send_response(404)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        with server.lock:
+            server.request_count += 1
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            if server.latency:
+                time.sleep(server.latency)
+            user_prompt = body["messages"][-1]["content"]
+            text = f"**总体评价**：stub report #{server.request_count}\n\n{user_prompt.strip()[:80]}"
+            if body.get("stream"):
+                self._send_stream(body["model"], text)
+            else:
+                self._send_completion(body["model"], text)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def _send_completion(self, model, text):
+        payload = json.dumps({
+            "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_stream(self, model, text):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for i in range(0, len(text), 16):
+            chunk = {
+                "id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "delta": {"content": text[i:i + 16]}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+class FakeOpenAIServer:
+    def __init__(self, latency=0.0, port=0):
+        """
+        :param latency: 每个请求人为增加的延迟 (秒)，模拟模型生成耗时
+        :param port: 0 表示随机端口
+        """
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency
+        self.httpd.lock = threading.Lock()
+        self.httpd.request_count = 0
+        self.httpd.active = 0
+        self.httpd.max_active = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+
+    @property
+    def request_count(self):
+        return self.httpd.request_count
+
+    @property
+    def max_active(self):
+        """观察到的最大并发请求数"""
+        return self.httpd.max_active
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
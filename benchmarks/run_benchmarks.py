@@ -0,0 +1,226 @@
+"""
+Dashboard 各环节的性能基准
+
+对每个规模 (默认 1k / 10k / 100k，可加到 1M) 分别计时：
+- fetch:        GitHubLoader.fetch_commits 对本地假 API 的顺序 / 并发抓取
+- classify:     CommitClassifier.classify 逐条 / classify_many 批量
+- save:         DBManager.save_commits (含汇总表维护)
+- read:         get_all_commits (字典) / get_commits_frame (列式) / 最近 90 天的窗口读取 /
+                内存映射打开 Arrow 快照 (snapshot_mmap)
+- score:        calculate_health_score
+- preprocess:   旧版 app 的 DataFrame 预处理 + 聚合 (to_datetime / resample / value_counts)
+- aggregate:    现在 app 用的汇总表读取 + 周聚合
+- search:       FTS5 全文搜索 (少见的词 / 常见的词 / 按周分桶计数)，对比把 message 读进 pandas 做字符串扫描
+
+结果写成 JSON，便于跨版本对比：
+
+    python benchmarks/run_benchmarks.py --sizes 1000,10000,100000 --output bench.json
+    python benchmarks/run_benchmarks.py --sizes 1000000 --skip fetch --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from benchmarks.fake_github import FakeGitHubServer
+from benchmarks.synthetic import generate_history, to_cleaned_batches, to_rest_commits
+from classifier import CommitClassifier
+from db_manager import DBManager
+from github_loader import GitHubLoader
+from score_calculator import calculate_health_score
+from snapshot import export_snapshot, read_snapshot, snapshot_frame
+
+STAGES = ["fetch", "classify", "save", "read", "score", "preprocess", "aggregate", "search"]
+REPO = "bench/repo"
+
+
+class Recorder:
+    def __init__(self):
+        self.results = []
+
+    @contextmanager
+    def time(self, stage, variant, size):
+        start = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - start
+        self.results.append({
+            "stage": stage, "variant": variant, "size": size,
+            "seconds": round(seconds, 6), "rows_per_sec": round(size / seconds) if seconds > 0 else None,
+        })
+        print(f"  {stage:<10} {variant:<18} {seconds:9.3f}s")
+
+
+def bench_size(size, args, rec):
+    print(f"\n=== {size} commits ===")
+    history = generate_history(size, authors=args.authors, days=args.days, seed=size)
+
+    if "fetch" not in args.skip and size <= args.fetch_max:
+        with FakeGitHubServer(to_rest_commits(history), repo_name=REPO, latency=args.latency) as server:
+            for parallel in (False, True):
+                loader = GitHubLoader("dummy", base_url=server.url, etag_cache_path=None)
+                with rec.time("fetch", "parallel" if parallel else "sequential", size):
+                    loader.fetch_commits(REPO, limit=size, parallel=parallel)
+
+    classifier = CommitClassifier()
+    messages = history["message"].tolist()
+    if "classify" not in args.skip:
+        # 合成的 message 大量重复；计时用各不相同的 message (末尾加序号，不影响分类)，去重帮不上忙
+        distinct = [f"{m} #{i}" for i, m in enumerate(messages)]
+        with rec.time("classify", "classify", size):
+            [classifier.classify(m) for m in distinct]
+        with rec.time("classify", "classify_many", size):
+            classifier.classify_many(distinct)
+    history["category"] = classifier.classify_many(messages)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DBManager(os.path.join(tmp, "bench.db"))
+        batches = list(to_cleaned_batches(history, batch_size=args.batch_size))
+        with rec.time("save", f"batch={args.batch_size}", size):
+            for batch in batches:
+                db.save_commits(REPO, batch)
+        del batches
+
+        if "read" not in args.skip:
+            with rec.time("read", "get_all_commits", size):
+                rows = db.get_all_commits(REPO)
+            with rec.time("read", "get_commits_frame", size):
+                df = db.get_commits_frame(REPO)
+            # 时间窗口走 (repo_name, ts) 索引，耗时只和窗口内的行数有关
+            last_ts = db.get_date_range(REPO)[1]
+            with rec.time("read", "window_90d", size):
+                db.get_commits_frame(REPO, since=last_ts - 90 * 86400)
+                db.get_daily_counts(REPO, since=last_ts - 90 * 86400)
+            snapshot_path = os.path.join(tmp, "bench.arrow")
+            with rec.time("read", "snapshot_export", size):
+                export_snapshot(db, REPO, snapshot_path)
+            with rec.time("read", "snapshot_mmap", size):
+                snapshot_frame(read_snapshot(snapshot_path))
+        else:
+            rows = db.get_all_commits(REPO)
+            df = db.get_commits_frame(REPO)
+
+        if "score" not in args.skip:
+            with rec.time("score", "calculate_health", size):
+                calculate_health_score(df)
+
+        if "preprocess" not in args.skip:
+            # 优化前 app.py 每次 rerun 做的事
+            with rec.time("preprocess", "legacy_app", size):
+                legacy = pd.DataFrame(rows).copy()
+                legacy['date'] = pd.to_datetime(legacy['date'], utc=True)
+                legacy.set_index('date', inplace=True)
+                legacy.sort_index(inplace=True)
+                legacy['category'].value_counts()
+                legacy.resample('W')['sha'].count()
+                legacy.index.day_name().value_counts()
+                legacy['author'].value_counts().head(10)
+        del rows
+
+        if "aggregate" not in args.skip:
+            with rec.time("aggregate", "rollups", size):
+                db.get_daily_counts(REPO).resample('W').sum()
+                db.get_weekday_counts(REPO)
+                db.get_author_counts(REPO, limit=10)
+                db.get_category_counts(REPO)
+
+        if "search" not in args.skip:
+            with rec.time("search", "pandas_scan", size):
+                messages = pd.Series(db.get_commit_messages(REPO))
+                messages[messages.str.contains("lodash", case=False)].head(50)
+            del messages
+            with rec.time("search", "fts_rare", size):
+                db.search_commits('"4.17.42"', REPO, limit=50)
+            with rec.time("search", "fts_common", size):
+                db.search_commits("fix", REPO, limit=50)
+            with rec.time("search", "fts_weekly_counts", size):
+                db.get_search_counts("lodash", REPO, bucket="week")
+        db.close()
+
+
+def compare(results, baseline_path, threshold):
+    """和基线结果对比，慢于 threshold 倍的标成回归"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["stage"], r["variant"], r["size"]): r["seconds"] for r in json.load(f)["results"]}
+    print(f"\n=== Compared with {baseline_path} ===")
+    regressions = 0
+    for r in results:
+        before = baseline.get((r["stage"], r["variant"], r["size"]))
+        if not before:
+            continue
+        ratio = r["seconds"] / before
+        # 毫秒级的阶段噪声很大，绝对差值小于 10ms 的不算回归
+        flag = "REGRESSION" if ratio > threshold and r["seconds"] - before > 0.01 else ""
+        regressions += bool(flag)
+        print(f"  {r['stage']:<10} {r['variant']:<18} {r['size']:>8}  {before:8.3f}s -> {r['seconds']:8.3f}s  x{ratio:5.2f} {flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000", help="逗号分隔的 commit 数，最大可到 1000000")
+    parser.add_argument("--authors", type=int, default=50)
+    parser.add_argument("--days", type=int, default=3 * 365)
+    parser.add_argument("--batch-size", type=int, default=500, help="save_commits 每批条数")
+    parser.add_argument("--latency", type=float, default=0.0, help="假 API 的单请求延迟 (秒)")
+    parser.add_argument("--fetch-max", type=int, default=100000, help="超过该规模时跳过 fetch (HTTP JSON 太慢)")
+    parser.add_argument("--skip", default="", help=f"跳过的阶段，逗号分隔: {','.join(STAGES)}")
+    parser.add_argument("--output", help="结果 JSON 路径")
+    parser.add_argument("--compare", help="基线 JSON 路径")
+    parser.add_argument("--threshold", type=float, default=1.2, help="慢多少倍算回归")
+    args = parser.parse_args(argv)
+    args.skip = {s for s in args.skip.split(",") if s}
+
+    # loader / DBManager 的进度输出会刷屏，基准运行时静音
+    rec = Recorder()
+    real_stdout = sys.stdout
+    for size in (int(s) for s in args.sizes.split(",")):
+        sys.stdout = _StageOnly(real_stdout)
+        try:
+            bench_size(size, args, rec)
+        finally:
+            sys.stdout = real_stdout
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "args": {k: (sorted(v) if isinstance(v, set) else v) for k, v in vars(args).items()},
+        },
+        "results": rec.results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        return 1 if compare(rec.results, args.compare, args.threshold) else 0
+    return 0
+
+
+class _StageOnly:
+    """只放行基准自己的输出行 (以两个空格或 === 开头)"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        if text.startswith(("  ", "\n===", "===")) and "-->" not in text:
+            self.stream.write(text + ("" if text.endswith("\n") else "\n"))
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
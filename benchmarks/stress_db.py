@@ -0,0 +1,136 @@
+"""
+DBManager 并发压力测试
+
+1. 写：多个线程同时 save_commits (批次之间有重叠，模拟多个会话 / 后台同步重复抓到同一批 commit)，
+   同时有读线程不停查询。结束后校验：commits 行数 == 不同 sha 数、没有重复行、汇总表合计 == 行数、
+   没有任何 "database is locked" 之类的异常
+2. 读：1 / 2 / 4 / 8 个线程并发读，统计每秒完成的查询数
+
+    python benchmarks/stress_db.py --writers 8 --commits 200000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import generate_history, to_cleaned_batches
+import perf
+from db_manager import DBManager
+
+REPO = "stress/repo"
+
+
+def stress_writes(db, batches, writers, readers, overlap=0.2, seed=0):
+    """
+    :param overlap: 额外重复写入的批次比例 (这些 commit 必须被忽略)
+    :return: (耗时, 所有线程抛出的异常列表, 读线程完成的查询数)
+    """
+    rng = random.Random(seed)
+    jobs = list(batches) + rng.sample(batches, int(len(batches) * overlap))
+    rng.shuffle(jobs)
+    errors = []
+    done = threading.Event()
+    reads = [0]
+    lock = threading.Lock()
+
+    def write_worker(my_jobs):
+        try:
+            for batch in my_jobs:
+                db.save_commits(REPO, batch)
+        except Exception as e:
+            errors.append(e)
+
+    def read_worker():
+        try:
+            while not done.is_set():
+                db.get_author_counts(REPO, limit=10)
+                db.get_latest_commit_date(REPO)
+                with lock:
+                    reads[0] += 1
+        except Exception as e:
+            errors.append(e)
+
+    write_threads = [threading.Thread(target=write_worker, args=(jobs[i::writers],)) for i in range(writers)]
+    read_threads = [threading.Thread(target=read_worker) for _ in range(readers)]
+    start = time.perf_counter()
+    for t in write_threads + read_threads:
+        t.start()
+    for t in write_threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    for t in read_threads:
+        t.join()
+    return elapsed, errors, reads[0]
+
+
+def read_throughput(db, threads, duration=2.0):
+    """:return: threads 个线程并发读时每秒完成的查询数"""
+    last_ts = db.get_date_range(REPO)[1]
+    stop = time.perf_counter() + duration
+    counts = [0] * threads
+
+    def worker(i):
+        while time.perf_counter() < stop:
+            # 一次 90 天窗口的明细读取 + 一次汇总表读取，SQLite 执行查询时会释放 GIL
+            db.get_commits_frame(REPO, since=last_ts - 90 * 86400)
+            db.get_category_counts(REPO)
+            counts[i] += 1
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return sum(counts) / duration
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--commits", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=4)
+    args = parser.parse_args()
+
+    history = generate_history(args.commits)
+    batches = list(to_cleaned_batches(history, batch_size=args.batch_size))
+    expected = history['sha'].nunique()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DBManager(os.path.join(tmp, "stress.db"))
+        perf.enable(True)
+        elapsed, errors, reads = stress_writes(db, batches, args.writers, args.readers)
+        counters = perf.snapshot()["counters"]
+        perf.enable(False)
+        print(f"writes: {len(batches)} batches from {args.writers} threads in {elapsed:.2f}s, "
+              f"{reads} concurrent reads, {len(errors)} errors")
+        print(f"group commit: {counters.get('db.write_jobs', 0)} write jobs in "
+              f"{counters.get('db.group_commits', 0)} transactions")
+        for e in errors[:5]:
+            print(f"  error: {e!r}")
+
+        frame = db.get_commits_frame(REPO)
+        rows, distinct = len(frame), frame['sha'].nunique()
+        rollup_total = int(db.get_daily_counts(REPO).sum())
+        author_total = int(db.get_author_counts(REPO).sum())
+        ok = not errors and rows == distinct == expected == rollup_total == author_total
+        print(f"rows={rows} distinct={distinct} expected={expected} rollups={rollup_total}/{author_total} "
+              f"-> {'OK' if ok else 'FAILED'}")
+
+        base = None
+        for threads in (1, 2, 4, 8):
+            qps = read_throughput(db, threads)
+            base = base or qps
+            print(f"reads: {threads} threads {qps:8.1f} queries/s  (x{qps / base:.2f})")
+        db.close()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+合成 commit 历史生成器
+
+按给定的 commit 数、作者数、时间跨度和 message 类型比例生成可复现的历史，
+输出列式的 DataFrame，再按需转换成 loader 清洗后的字典或 REST 原始格式。
+
+    df = generate_history(100_000, authors=50, days=3 * 365)
+    for batch in to_cleaned_batches(df): db.save_commits("bench/repo", batch)
+"""
+import numpy as np
+import pandas as pd
+
+# 每种类型的 message 模板，{n} 会被替换成序号 (让 message 大部分各不相同)
+MESSAGE_TEMPLATES = {
+    "Feature": ["feat: add {n} endpoint", "Implement {n} support", "feat(ui): new {n} widget"],
+    "Bugfix": ["fix: crash in {n}", "Fix issue #{n}", "hotfix: resolve {n} timeout"],
+    "Refactor": ["refactor: split {n}", "Clean up {n} module", "Optimize {n} loop"],
+    "Docs": ["docs: update readme {n}", "Fix typo in {n}"],
+    "Test": ["test: cover {n}", "Add benchmark {n}"],
+    "Build": ["ci: bump workflow {n}", "build: pin dependency {n}"],
+    "Chore": ["chore: release v1.{n}", "Bump lodash from 4.17.{n} to 4.17.{n}1"],
+    "Other": ["Merge pull request #{n} from user/branch", "WIP", "{n}"],
+}
+
+DEFAULT_MIX = {
+    "Feature": 0.25, "Bugfix": 0.25, "Refactor": 0.1, "Docs": 0.08,
+    "Test": 0.07, "Build": 0.05, "Chore": 0.1, "Other": 0.1,
+}
+
+
+def generate_history(commits, authors=20, days=2 * 365, end=None, mix=None, seed=0):
+    """
+    生成合成的 commit 历史
+
+    :param commits: commit 数
+    :param authors: 作者数 (按 Zipf 分布分配，少数人贡献大部分 commit，接近真实项目)
+    :param days: 历史跨度 (天)
+    :param end: 最新 commit 的时间，默认当前时间
+    :param mix: {类型: 比例}，默认 DEFAULT_MIX
+    :param seed: 随机种子
+    :return: DataFrame，列为 sha / author / date (ISO 字符串) / message / additions / deletions，按时间倒序
+    """
+    rng = np.random.default_rng(seed)
+    mix = mix or DEFAULT_MIX
+    end = pd.Timestamp(end or pd.Timestamp.now(tz="UTC")).floor("s")
+
+    offsets = np.sort(rng.random(commits))[::-1] * days * 86400
+    dates = (end - pd.to_timedelta(offsets.astype("int64"), unit="s")).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    ranks = np.arange(1, authors + 1)
+    author_p = (1.0 / ranks) / (1.0 / ranks).sum()
+    author_ids = rng.choice(authors, size=commits, p=author_p)
+
+    kinds = list(mix)
+    kind_p = np.array([mix[k] for k in kinds], dtype=float)
+    kind_ids = rng.choice(len(kinds), size=commits, p=kind_p / kind_p.sum())
+    template_pick = rng.integers(0, 1 << 30, size=commits)
+    messages = [
+        MESSAGE_TEMPLATES[kinds[k]][t % len(MESSAGE_TEMPLATES[kinds[k]])].format(n=i % 5000)
+        for i, (k, t) in enumerate(zip(kind_ids, template_pick))
+    ]
+
+    return pd.DataFrame({
+        "sha": [f"{seed:08x}{i:032x}" for i in range(commits)],
+        "author": np.array([f"dev{a:04d}" for a in range(authors)])[author_ids],
+        "date": np.asarray(dates),
+        "message": messages,
+        "additions": rng.geometric(0.02, size=commits),
+        "deletions": rng.geometric(0.04, size=commits),
+    })
+
+
+def to_cleaned_batches(df, batch_size=10000):
+    """逐批产出 save_commits 接受的清洗后字典"""
+    for start in range(0, len(df), batch_size):
+        yield df.iloc[start:start + batch_size].to_dict("records")
+
+
+def to_rest_commits(df):
+    """转换成 GitHub REST commits 列表的原始格式 (给假 API 服务器用)"""
+    return [
+        {
+            "sha": sha,
+            "commit": {"author": {"name": author, "date": date}, "message": message},
+            "stats": {"additions": int(additions), "deletions": int(deletions)},
+        }
+        for sha, author, date, message, additions, deletions in df.itertuples(index=False)
+    ]
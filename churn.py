@@ -0,0 +1,112 @@
+"""
+代码 churn (改动行数) 指标
+
+- churn = additions + deletions，net growth = additions - deletions
+- churn-to-growth: 窗口内 churn / |净增长|。越大说明原地改来改去多、真正留下 (或真正删掉) 的代码少。
+  净增长为负的窗口 (清理、删旧代码) 按删掉的净行数算，不再当成 inf；分母至少取 churn 的 CHURN_MIN_NET_SHARE，
+  所以比值最大为 1 / CHURN_MIN_NET_SHARE
+- 全部在按天的时间索引上做向量化计算 (groupby + rolling)，开销和天数有关，和 commit 数几乎无关
+
+只有 GraphQL / 本地 git 同步的数据才有行数统计，REST 同步的 additions / deletions 全是 0，
+这种情况下 has_line_stats 返回 False，评分里的 churn 项也会跳过。
+"""
+import numpy as np
+import pandas as pd
+
+# 评分用的窗口：最后一个 commit 往前 90 天
+CHURN_WINDOW_DAYS = 90
+# churn-to-growth 阈值：3 相当于删除量是新增量的一半，9 相当于删除量是新增量的 80%
+CHURN_RATIO_ELEVATED = 3.0
+CHURN_RATIO_HIGH = 9.0
+# 分母下限：|净增长| 至少按 churn 的 5% 算，加删几乎抵消时比值封顶 20 (仍然是最高一档惩罚)
+CHURN_MIN_NET_SHARE = 0.05
+
+
+def has_line_stats(df):
+    """DataFrame 里是否有真实的行数统计"""
+    if df.empty or 'additions' not in df.columns:
+        return False
+    return bool(df['additions'].to_numpy().any() or df['deletions'].to_numpy().any())
+
+
+def churn_to_growth(additions, deletions):
+    """
+    向量化的 churn-to-growth 比值
+
+    :param additions / deletions: 标量或数组
+    :return: 同形状的比值，在 [1, 1 / CHURN_MIN_NET_SHARE] 之间；没有改动时为 0
+    """
+    additions = np.asarray(additions, dtype='float64')
+    deletions = np.asarray(deletions, dtype='float64')
+    churn = additions + deletions
+    net = np.maximum(np.abs(additions - deletions), churn * CHURN_MIN_NET_SHARE)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(churn > 0, churn / np.where(churn > 0, net, 1), 0.0)
+
+
+def churn_penalty(ratio):
+    """churn-to-growth -> 扣分 (0 / 5 / 10)，标量和数组都可以"""
+    ratio = np.asarray(ratio, dtype='float64')
+    return np.select([ratio > CHURN_RATIO_HIGH, ratio > CHURN_RATIO_ELEVATED], [10, 5], default=0)
+
+
+def daily_line_stats(df):
+    """
+    按天汇总新增 / 删除行数
+
+    :param df: 以 UTC datetime 为索引、含 additions / deletions 列的 DataFrame (get_commits_frame 的格式)
+    :return: 连续日期索引的 DataFrame (没有 commit 的天为 0)，列 additions / deletions / churn / net_growth
+    """
+    cols = ['additions', 'deletions', 'churn', 'net_growth']
+    if df.empty:
+        return pd.DataFrame(columns=cols, dtype='int64')
+    daily = df[['additions', 'deletions']].groupby(df.index.floor('D')).sum()
+    daily = daily.reindex(pd.date_range(daily.index[0], daily.index[-1], freq='D'), fill_value=0)
+    daily['churn'] = daily['additions'] + daily['deletions']
+    daily['net_growth'] = daily['additions'] - daily['deletions']
+    daily.index.name = 'date'
+    return daily
+
+
+def rolling_churn(df=None, window=30, daily=None):
+    """
+    滚动窗口 churn 指标
+
+    :param df: commit 明细 (和 daily 二选一)
+    :param window: 窗口天数
+    :param daily: 已经按天汇总好的数据 (daily_line_stats 的结果)
+    :return: 按天索引的 DataFrame，列 additions / deletions / churn / net_growth (窗口内合计) 和 churn_to_growth
+    """
+    if daily is None:
+        daily = daily_line_stats(df)
+    rolled = daily[['additions', 'deletions', 'churn', 'net_growth']].rolling(window, min_periods=1).sum()
+    rolled['churn_to_growth'] = churn_to_growth(rolled['additions'], rolled['deletions'])
+    return rolled
+
+
+def author_churn(df, window=None, end=None):
+    """
+    每个作者的 churn
+
+    :param window: 只统计 end 之前这么多天，None 表示全部历史
+    :param end: 窗口结束时间，默认最后一个 commit
+    :return: 按 churn 降序的 DataFrame，列 commits / additions / deletions / churn / churn_to_growth
+    """
+    if window is not None and not df.empty:
+        end = df.index.max() if end is None else end
+        df = df[df.index > end - pd.Timedelta(days=window)]
+    grouped = df.groupby('author', observed=True, sort=False)
+    result = grouped[['additions', 'deletions']].sum()
+    result.insert(0, 'commits', grouped.size())
+    result['churn'] = result['additions'] + result['deletions']
+    result['churn_to_growth'] = churn_to_growth(result['additions'], result['deletions'])
+    return result.sort_values('churn', ascending=False, kind='stable')
+
+
+def window_churn_ratio(df, window=CHURN_WINDOW_DAYS):
+    """评分用：最后一个 commit 往前 window 天的 churn-to-growth，没有行数统计时返回 None"""
+    if not has_line_stats(df):
+        return None
+    recent = df[df.index > df.index.max() - pd.Timedelta(days=window)]
+    return float(churn_to_growth(recent['additions'].sum(), recent['deletions'].sum()))
+
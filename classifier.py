@@ -1,7 +1,31 @@
+import hashlib
+import json
+import re
+
+import numpy as np
+import pandas as pd
+
+import perf
+
+# str.strip() 去掉的空白字符 (str.isspace() 为 True 的全部字符)，给 Arrow 的 utf8_trim 用
+_WHITESPACE = "\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f \x85\xa0\u1680\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000"
+
+
+def _import_pyarrow():
+    import pyarrow as pa  # pyarrow 导入要 ~0.6s，只在批量分类时加载；Dashboard 启动时只构造分类器
+    import pyarrow.compute as pc
+    return pa, pc
+
+
 class CommitClassifier:
-    def __init__(self):
+    def __init__(self, word_boundaries=False):
+        """
+        :param word_boundaries: True 时关键词必须出现在单词开头 ("fix" 匹配 "fixes"，不匹配 "prefix")。
+                                默认 False，和原来的子串匹配结果完全一致
+        """
         # 定义关键词规则
         # 这种做法在工业界叫 "Heuristic Rule-based Approach"
+        # 字典顺序就是优先级：同一条 message 命中多个分类时取排在前面的
         self.rules = {
             "Feature": ["feat", "feature", "add", "new", "create", "implement"],
             "Bugfix": ["fix", "bug", "issue", "resolve", "correct", "patch", "hotfix"],
@@ -9,8 +33,45 @@ class CommitClassifier:
             "Docs": ["doc", "docs", "readme", "comment", "typo"],
             "Test": ["test", "tests", "coverage", "benchmark"],
             "Build": ["build", "ci", "cd", "workflow", "dep", "dependency"], 
-            "Chore": ["chore", "misc", "update", "upgrade", "bump", "dep", "dependency"], 
+            "Chore": ["chore", "misc", "update", "upgrade", "bump"], 
         }
+        self.word_boundaries = word_boundaries
+        self.compile()
+
+    def compile(self):
+        """
+        把 self.rules 编译成匹配器 (构造时自动调用，修改 rules 之后需要手动再调一次)
+
+        - 前缀表：Conventional Commits 前缀 -> 分类，一次字典查找
+        - 关键词：每个分类一条 alternation 正则，按优先级依次匹配；另有一条包含所有关键词的总 alternation
+        """
+        # 规则内容的哈希：规则 (包括优先级顺序) 或匹配方式一变，版本号就变，旧的分类缓存自动失效
+        spec = json.dumps({"rules": list(self.rules.items()), "word_boundaries": self.word_boundaries})
+        self.rule_version = hashlib.sha1(spec.encode("utf-8")).hexdigest()[:12]
+
+        self._prefix_map = {}
+        for category, keywords in self.rules.items():
+            # setdefault: 同一个词出现在多个分类里时，排在前面的分类优先
+            for word in [*keywords, category.lower()]:
+                self._prefix_map.setdefault(word, category)
+
+        # 逐条分类 (classify)：不要求单词边界时就是普通的子串查找，比正则快
+        boundary = r"\b" if self.word_boundaries else ""
+        self._keywords = [(category, tuple(keywords)) for category, keywords in self.rules.items() if keywords]
+        self._sources = [
+            (category, boundary + "(?:" + "|".join(map(re.escape, keywords)) + ")") for category, keywords in self._keywords
+        ]
+        self._patterns = [(category, re.compile(source)) for category, source in self._sources]
+
+        # 批量分类 (classify_many) 在 Arrow 数组上做，分类用整数编号，最后一个是 Other
+        self._labels = np.array([*self.rules, "Other"], dtype=object)
+        self._code_of = code_of = {label: i for i, label in enumerate(self._labels)}
+        self._prefix_keys = list(self._prefix_map)
+        self._prefix_codes = np.array([code_of[c] for c in self._prefix_map.values()], dtype=np.int64)
+        self._keyword_codes = [(code_of[category], source) for category, source in self._sources]
+        # 关键词正则交给 pyarrow 的 RE2 (DFA，线性时间，不回溯)；
+        # 所有关键词拼成一条 alternation，一次扫描就能排除一个关键词都不含的 message
+        self._any_source = "|".join(source for _, source in self._sources)
 
     def classify(self, message):
         """
@@ -20,18 +81,101 @@ class CommitClassifier:
         
         # 优先匹配 Conventional Commits 格式 (例如 "feat: login")
         if ":" in msg_lower:
-            prefix = msg_lower.split(":")[0].strip()
-            # 检查前缀是否直接命中
-            for category, keywords in self.rules.items():
-                # 如果前缀就是 feat, fix 等
-                if prefix in keywords or prefix == category.lower():
-                    return category
+            prefix = msg_lower.split(":", 1)[0].strip()
+            # 检查前缀是否直接命中 (feat, fix 等或者分类名本身)
+            category = self._prefix_map.get(prefix)
+            if category:
+                return category
         
-        # 如果不是标准格式，进行关键词扫描
-        for category, keywords in self.rules.items():
+        # 如果不是标准格式，按优先级逐个分类做关键词扫描
+        return self._match_keywords(msg_lower)
+
+    def _match_keywords(self, msg_lower):
+        if self.word_boundaries:
+            for category, pattern in self._patterns:
+                if pattern.search(msg_lower):
+                    return category
+            return "Other"
+        for category, keywords in self._keywords:
             for word in keywords:
-                # 简单的单词匹配
                 if word in msg_lower:
                     return category
-                    
-        return "Other" # 没匹配到
\ No newline at end of file
+        return "Other" # 没匹配到
+
+    @perf.timed("classifier.classify_many")
+    def classify_many(self, messages):
+        """
+        批量分类，结果和逐条调用 classify 完全一致
+
+        先对 message 去重 (bump / merge 之类的 message 大量重复)，之后小写化、前缀查找、
+        关键词匹配都是 Arrow 的整列计算，不逐条进 Python。
+
+        :param messages: pandas Series 或任意可迭代的字符串
+        :return: 输入是 Series 时返回同索引的 Series，否则返回 list
+        """
+        is_series = isinstance(messages, pd.Series)
+        values = messages.to_numpy(dtype=object) if is_series else list(messages)
+        if len(values) == 0:
+            return messages.astype(object) if is_series else []
+
+        pa, pc = _import_pyarrow()
+        encoded = pa.array(values, type=pa.string(), from_pandas=True).dictionary_encode()
+        perf.incr("classifier.messages", len(values))
+        perf.incr("classifier.distinct_messages", len(encoded.dictionary))
+        codes = np.append(self._classify_distinct(_lower(encoded.dictionary)), len(self._labels) - 1)
+        # None / NaN 没有字典编号，记为 Other
+        result = self._labels[codes[pc.fill_null(encoded.indices, len(encoded.dictionary)).to_numpy()]]
+        if is_series:
+            return pd.Series(result, index=messages.index, name=messages.name)
+        return result.tolist()
+
+    def _classify_distinct(self, lower):
+        """
+        :param lower: 小写化之后的 message (Arrow 字符串数组)
+        :return: 每条 message 的分类编号 (self._labels 的下标)
+        """
+        pa, pc = _import_pyarrow()
+        codes = np.full(len(lower), len(self._labels) - 1, dtype=np.int64)
+
+        # 1. Conventional Commits 前缀：第一个冒号之前、去掉首尾空白的部分整列查表
+        has_colon = pc.match_substring(lower, ":").to_numpy(zero_copy_only=False)
+        prefix = pc.utf8_trim(pc.list_element(pc.split_pattern(lower, ":", max_splits=1), 0), characters=_WHITESPACE)
+        value_set = pa.array(self._prefix_keys, type=pa.string())
+        key = pc.fill_null(pc.index_in(prefix, value_set=value_set), -1).to_numpy()
+        decided = has_colon & (key >= 0)
+        codes[decided] = self._prefix_codes[key[decided]]
+
+        # 2. 关键词。先用所有关键词的 alternation 整列扫一遍，没命中的就是 Other；
+        #    命中的再按优先级确认是哪个分类，每确认一个分类剩下的行就少一批
+        idx = np.flatnonzero(~decided)
+        texts = lower.filter(pa.array(~decided))
+        if self.word_boundaries and len(idx):
+            # RE2 的 \b 只认 ASCII，含非 ASCII 字符的 message 逐条用 Python re 匹配 (Unicode 语义)
+            ascii_only = pc.string_is_ascii(texts).to_numpy(zero_copy_only=False)
+            for i, text in zip(idx[~ascii_only], texts.filter(pa.array(~ascii_only)).to_pylist()):
+                codes[i] = self._code_of[self._match_keywords(text)]
+            idx, texts = idx[ascii_only], texts.filter(pa.array(ascii_only))
+        if len(idx) and self._any_source:
+            hit = pc.match_substring_regex(texts, self._any_source).to_numpy(zero_copy_only=False)
+            idx, texts = idx[hit], texts.filter(pa.array(hit))
+        for code, source in self._keyword_codes:
+            if len(idx) == 0:
+                break
+            matched = pc.match_substring_regex(texts, source).to_numpy(zero_copy_only=False)
+            codes[idx[matched]] = code
+            idx, texts = idx[~matched], texts.filter(pa.array(~matched))
+        return codes
+
+
+def _lower(texts):
+    """
+    和 str.lower 完全一致的小写化。纯 ASCII 的整列交给 Arrow；
+    含非 ASCII 字符的 (少数) 逐条用 Python，Arrow 对 İ、词尾 Σ 等特殊大小写的处理和 Python 不同
+    """
+    pa, pc = _import_pyarrow()
+    lower = pc.utf8_lower(texts)
+    non_ascii = pc.invert(pc.string_is_ascii(texts))
+    if pc.any(non_ascii).as_py():
+        replacements = pa.array([text.lower() for text in texts.filter(non_ascii).to_pylist()], type=pa.string())
+        lower = pc.replace_with_mask(lower, non_ascii, replacements)
+    return lower
@@ -0,0 +1,233 @@
+"""
+Streamlit 跨会话缓存层
+
+Streamlit 每次点击都会把 app.py 从头跑一遍。这里把两类东西缓存到进程级别，所有会话共享：
+1. 资源：DBManager (SQLite 连接)、loader、classifier，整个进程只建一次
+2. 派生数据：DataFrame、汇总序列、健康分、趋势等，按 (仓库, 时间窗口, 最新 commit 时间, 行数, 规则版本, 当天日期) 做键。
+   数据没变就直接命中，多个分析师看同一个仓库时共用同一份对象；条目数有上限，超出后淘汰最久未用的。
+   健康分里的活跃度、距上次 commit 的天数是相对"现在"算的，所以键里带上 UTC 日期，长时间运行的服务每天至少重算一次。
+
+3. 快照视图：内存映射打开的 Arrow / Parquet 快照 (见 snapshot.py)，按 (路径, 修改时间, 时间窗口) 做键。
+4. 分析引擎 (见 analytics.py)：计数和组合评分走选中的引擎 (sqlite / duckdb)，默认取环境变量 PAD_ANALYTICS。
+
+缓存返回的是共享对象，调用方只能读，不能原地修改。
+"""
+import os
+import threading
+
+import pandas as pd
+import streamlit as st
+
+from ai_analyst import AIAnalyst
+from analytics import open_analytics
+from churn import CHURN_WINDOW_DAYS, author_churn, has_line_stats, rolling_churn, window_churn_ratio
+from classifier import CommitClassifier
+from db_manager import DBManager
+from github_loader import GitHubLoader, GitHubGraphQLLoader
+from ownership import truck_factor, truck_factors
+from score_calculator import calculate_health_score
+
+# 默认的分析引擎
+DEFAULT_ENGINE = os.environ.get("PAD_ANALYTICS", "sqlite")
+
+
+@st.cache_resource
+def get_db():
+    return DBManager()
+
+
+@st.cache_resource
+def get_classifier():
+    return CommitClassifier()
+
+
+@st.cache_resource
+def get_loaders(token):
+    """REST 和 GraphQL loader 共用同一个调度器 (同一份配额和 ETag 缓存)"""
+    loader = GitHubLoader(token)
+    return loader, GitHubGraphQLLoader(token, scheduler=loader.scheduler)
+
+
+@st.cache_resource
+def get_analyst(api_key, base_url=None):
+    """AI 分析器 (复用 OpenAI 客户端，报告持久化在共享的 SQLite 里)"""
+    return AIAnalyst(api_key, db=get_db(), base_url=base_url)
+
+
+@st.cache_resource(show_spinner=False)
+def get_analytics(engine):
+    """
+    分析引擎 (进程级共享)。duckdb 没装或打不开数据库时退回 sqlite，两者结果一致
+
+    :return: (引擎, 退回时的错误信息或 None)
+    """
+    try:
+        return open_analytics(engine, db=get_db()), None
+    except (ImportError, RuntimeError) as e:
+        print(f"Analytics engine {engine} unavailable, falling back to sqlite: {e}")
+        return open_analytics("sqlite", db=get_db()), str(e)
+
+
+def _utc_today():
+    """缓存键里的当天日期 (UTC)"""
+    return pd.Timestamp.now(tz='UTC').strftime('%Y-%m-%d')
+
+
+def _weekly_trend(weekly_commits):
+    """最近 4 周均值和整体均值比较，得到趋势描述"""
+    if len(weekly_commits) < 4:
+        return "Unknown"
+    recent_avg = weekly_commits.tail(4).mean()
+    total_avg = weekly_commits.mean()
+    return "Rising" if recent_avg > total_avg * 1.2 else "Falling" if recent_avg < total_avg * 0.5 else "Stable"
+
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def _build_repo_view(repo_name, window, data_version, day, engine, _db, _analytics):
+    """
+    计算单个仓库 Dashboard 需要的所有派生数据
+
+    :param window: (since, until) epoch 秒，左闭右开，None 表示不限。过滤在 SQL 里完成
+    :param data_version: 只用来做缓存键，数据一变键就变
+    :param day: 当天的 UTC 日期，只用来做缓存键 (见 _utc_today)
+    :param engine: 分析引擎名，只用来做缓存键
+    :param _db / _analytics: 下划线开头，Streamlit 不对它们做哈希
+    """
+    since, until = window
+    df = _db.get_commits_frame(repo_name, since=since, until=until)
+
+    # 计数类图表走分析引擎 (sqlite 读按天预聚合的汇总表，duckdb 列式扫描)，不依赖上面的明细
+    daily_commits = _analytics.get_daily_counts(repo_name, since=since, until=until)
+    author_totals = _analytics.get_author_counts(repo_name, since=since, until=until)
+    type_counts = _analytics.get_category_counts(repo_name, since=since, until=until)
+    weekday_counts = _analytics.get_weekday_counts(repo_name, since=since, until=until)
+    # 文件归属看的是现存文件的整个历史，不受时间窗口影响 (只有本地 git 同步的仓库有数据)
+    truck = truck_factor(_db.get_file_ownership(repo_name))
+    return _assemble_view(df, daily_commits, weekday_counts, author_totals, type_counts, until, truck)
+
+
+def _assemble_view(df, daily_commits, weekday_counts, author_totals, type_counts, until=None, truck=None):
+    """
+    由读出来的明细和计数序列组装视图字典 (数据库和快照两条路径共用)
+
+    :param truck: ownership.truck_factor 的结果，没有文件级数据时为 None
+    """
+    weekly_commits = daily_commits.resample('W').sum()
+    # 看历史窗口时，活跃度相对窗口结束时间计算，而不是今天
+    now = pd.Timestamp(until, unit='s', tz='UTC') if until is not None else None
+    if now is not None and now > pd.Timestamp.now(tz='UTC'):
+        now = None
+    score, reasons = calculate_health_score(df, now=now, truck_factor=truck["truck_factor"] if truck else None)
+    # churn 只在有行数统计 (GraphQL / 本地 git 同步) 时计算
+    line_stats = has_line_stats(df)
+
+    return {
+        "df": df,
+        "daily_commits": daily_commits,
+        "weekly_commits": weekly_commits,
+        "weekday_counts": weekday_counts,
+        "author_totals": author_totals,
+        "type_counts": type_counts,
+        "total_commits": int(daily_commits.sum()),
+        "contributors": len(author_totals),
+        "duration": (df.index.max() - df.index.min()).days if not df.empty else 0,
+        "score": score,
+        "reasons": reasons,
+        "trend": _weekly_trend(weekly_commits),
+        "intent_dist": type_counts.to_dict(),
+        "is_risky": (len(reasons) > 0 and "Risk" in reasons[-1]),
+        "churn": rolling_churn(df, window=30) if line_stats else None,
+        "author_churn": author_churn(df, window=CHURN_WINDOW_DAYS).head(10) if line_stats else None,
+        "churn_ratio": window_churn_ratio(df),
+        "truck": truck,
+    }
+
+
+def load_repo_view(db, repo_name, rule_version, since=None, until=None, analytics=None):
+    """
+    按当前数据版本取仓库视图 (命中缓存时不做任何计算)
+
+    :param since / until: 只看这个时间窗口 [since, until)，epoch 秒，None 表示不限
+    :param analytics: 计数用的分析引擎，默认 DEFAULT_ENGINE
+    """
+    analytics = analytics or get_analytics(DEFAULT_ENGINE)[0]
+    version = (*db.get_data_version(repo_name), rule_version)
+    return _build_repo_view(repo_name, (since, until), version, _utc_today(), analytics.name, db, analytics)
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _open_snapshot(path, mtime):
+    """内存映射打开快照，:param mtime: 只用来做缓存键，文件被覆盖后重新打开"""
+    from snapshot import read_snapshot, snapshot_frame, snapshot_info  # pyarrow 只在用到快照时加载
+
+    table = read_snapshot(path)
+    return snapshot_info(table), snapshot_frame(table)
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _build_snapshot_view(path, mtime, window, day):
+    """从快照计算和 _build_repo_view 同样结构的视图 (不经过数据库)，:param day: 同 _build_repo_view"""
+    since, until = window
+    df = _open_snapshot(path, mtime)[1]
+    # 索引已按时间升序，窗口直接二分切片
+    start = df.index.searchsorted(pd.Timestamp(since, unit='s', tz='UTC')) if since is not None else 0
+    stop = df.index.searchsorted(pd.Timestamp(until, unit='s', tz='UTC')) if until is not None else len(df)
+    df = df.iloc[start:stop]
+
+    daily_commits = df.groupby(df.index.floor('D')).size().astype('int64').rename('commits')
+    daily_commits.index.name = 'date'
+    weekday_counts = df.index.dayofweek.value_counts().reindex(range(7), fill_value=0).rename('commits')
+    author_totals = df['author'].value_counts()
+    author_totals = author_totals[author_totals > 0].rename('commits')
+    type_counts = df['category'].value_counts()
+    type_counts = type_counts[type_counts > 0].rename('commits')
+    return _assemble_view(df, daily_commits, weekday_counts, author_totals, type_counts, until)
+
+
+def load_snapshot_info(path):
+    """快照的元数据和时间范围 (epoch 秒)，:return: (info, first_ts, last_ts)"""
+    info, df = _open_snapshot(path, os.path.getmtime(path))
+    if df.empty:
+        return info, None, None
+    return info, int(df.index[0].timestamp()), int(df.index[-1].timestamp())
+
+
+def load_snapshot_view(path, since=None, until=None):
+    """快照文件的仓库视图，:param since / until: 时间窗口 [since, until)，epoch 秒"""
+    return _build_snapshot_view(path, os.path.getmtime(path), (since, until), _utc_today())
+
+
+@st.cache_resource(show_spinner=False)
+def start_warmup(limit):
+    """
+    在后台线程里预先算好最近几个仓库的视图，之后打开它们直接命中缓存 (每个进程只启动一次)
+
+    :param limit: 预热的仓库数 (来自启动器设置的 PAD_WARM_REPOS)
+    """
+    db, classifier = get_db(), get_classifier()
+
+    def run():
+        for repo in db.get_recent_repos(limit):
+            try:
+                load_repo_view(db, repo, classifier.rule_version)
+                print(f"Warmed up cache for {repo}.")
+            except Exception as e:
+                print(f"Warm-up failed for {repo}: {e}")
+
+    thread = threading.Thread(target=run, name="cache-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _build_portfolio_ranking(data_version, day, engine, _db, _analytics):
+    """:param day: 同 _build_repo_view，评分里的活跃度随日期变化"""
+    # 评分输入在引擎里用 SQL 聚合好 (每个仓库一行)，不再把所有 commit 读进 pandas
+    ranking = _analytics.get_health_scores(truck_factors=truck_factors(_db.get_file_ownership()))
+    return None if ranking.empty else ranking
+
+
+def load_portfolio_ranking(db, analytics=None):
+    """所有本地仓库的批量评分 (任何仓库有新数据时、以及每天重算)，:param analytics: 同 load_repo_view"""
+    analytics = analytics or get_analytics(DEFAULT_ENGINE)[0]
+    return _build_portfolio_ranking(db.get_data_version(), _utc_today(), analytics.name, db, analytics)
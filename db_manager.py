@@ -1,89 +1,1428 @@
+import functools
+import hashlib
+import itertools
+import queue
+import re
 import sqlite3
 import os
+import threading
+import time
+from concurrent.futures import Future
+
+import pandas as pd
+
+import perf
+from churn import CHURN_WINDOW_DAYS
+from score_calculator import SCORE_INPUT_COLUMNS
+
+def message_hash(message):
+    """commit message 的内容哈希，作为分类缓存的键 (相同 message 只分类一次)"""
+    return hashlib.blake2b((message or "").encode("utf-8"), digest_size=12).hexdigest()
+
+
+def to_epoch(value):
+    """
+    把时间窗口的边界统一转成 UTC epoch 秒
+
+    :param value: epoch 秒、ISO 字符串、date / datetime / pandas Timestamp (不带时区的按 UTC)，或 None
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize("UTC")
+    return int(ts.timestamp())
+
+
+def _time_window(since=None, until=None, column="ts"):
+    """
+    生成时间窗口的 WHERE 片段，区间是左闭右开 [since, until)
+
+    :param column: "ts" (或带表别名的 "c.ts") 按 commits 表的 epoch 列过滤；"day" 按汇总表的日期过滤
+                   (天粒度，until 所在的那天只要有一部分落在窗口里就算进来)
+    :return: (" AND ..." 形式的 SQL 片段, 参数元组)
+    """
+    since, until = to_epoch(since), to_epoch(until)
+    by_day = column.rsplit(".", 1)[-1] == "day"
+    clauses, params = [], []
+    if since is not None:
+        clauses.append(f"{column} >= date(?, 'unixepoch')" if by_day else f"{column} >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append(f"{column} < date(? + 86399, 'unixepoch')" if by_day else f"{column} < ?")
+        params.append(until)
+    return "".join(f" AND {c}" for c in clauses), tuple(params)
+
+
+class SearchQueryError(ValueError):
+    """搜索词不是合法的查询 (比如以 NOT 开头、运算符连在一起)"""
+
+
+_FTS_OPERATORS = ("OR", "AND", "NOT")
+
+
+def fts_query(text):
+    """
+    用户输入 -> FTS5 查询语句
+
+    每个词都加上引号按短语匹配，这样 CVE-2021-44228、foo.bar 这类带符号的词不会被当成 FTS5 语法；
+    保留 OR / AND / NOT 运算符、双引号括起来的短语和结尾的 * 前缀匹配 (leak* 匹配 leaks / leaking)。
+
+    运算符的规则 (FTS5 的 NOT 是二元的，"a NOT b" 表示有 a 没有 b)：
+    - 开头的 AND / OR、结尾的运算符直接去掉 (还没输完)
+    - "AND NOT" 合并成 NOT
+    - 开头的 NOT 和其他连续的运算符 (AND OR、NOT NOT) 抛 SearchQueryError，不去猜用户的意思
+
+    :return: MATCH 用的字符串，输入里没有可搜的词时返回空字符串
+    """
+    terms = []
+    for token in re.findall(r'"[^"]*"?|\S+', text or ""):
+        if token in _FTS_OPERATORS:
+            if terms and terms[-1] in _FTS_OPERATORS:
+                if (terms[-1], token) != ("AND", "NOT"):
+                    raise SearchQueryError(f"'{terms[-1]} {token}': operators must be separated by a search term")
+                terms.pop()
+            elif not terms and token == "NOT":
+                raise SearchQueryError("NOT needs a term before it, e.g. 'leak NOT test'")
+            if terms:
+                terms.append(token)
+            continue
+        prefix = token.endswith("*") and len(token) > 1
+        token = token.strip('"*') if prefix else token.strip('"')
+        if token:
+            terms.append('"' + token.replace('"', '""') + '"' + ("*" if prefix else ""))
+    while terms and terms[-1] in _FTS_OPERATORS:
+        terms.pop()
+    return " ".join(terms)
+
+
+def _execute_match(cursor, sql, params):
+    """执行带 FTS5 MATCH 的查询，FTS5 的语法错误转成 SearchQueryError (调用方显示成"查询无效"，而不是整页报错)"""
+    try:
+        return cursor.execute(sql, params)
+    except sqlite3.OperationalError as e:
+        if "fts5" in str(e):
+            raise SearchQueryError(str(e)) from e
+        raise
+
+
+# 多行 VALUES 每条语句的行数 (9 列 x 100 行，低于老版本 SQLite 999 个参数的上限)
+_INSERT_CHUNK = 100
+
+
+def _insert_many(cursor, sql, rows, width, chunk=_INSERT_CHUNK):
+    """
+    批量插入：每条语句带 chunk 行的多行 VALUES。Python 侧逐行 bind / step 的开销是大头，
+    合并成多行之后绑定的参数数不变，语句执行次数少两个数量级，写入耗时约为逐行 executemany 的一半
+
+    :param sql: 不含 VALUES 的 INSERT 语句，如 "INSERT INTO t (a, b)"
+    :param width: 每行的列数
+    """
+    values = "(" + ", ".join("?" * width) + ")"
+    full = len(rows) - len(rows) % chunk
+    if full:
+        cursor.executemany(
+            f"{sql} VALUES {', '.join([values] * chunk)}",
+            (tuple(itertools.chain.from_iterable(rows[i:i + chunk])) for i in range(0, full, chunk)),
+        )
+    if full < len(rows):
+        rest = rows[full:]
+        cursor.execute(f"{sql} VALUES {', '.join([values] * len(rest))}", tuple(itertools.chain.from_iterable(rest)))
+
+
+# 搜索结果按时间分桶的 SQL 表达式 (ts 是 epoch 秒)，周从周一开始
+_SEARCH_BUCKETS = {
+    "day": "date(c.ts, 'unixepoch')",
+    "week": "date(c.ts, 'unixepoch', 'weekday 0', '-6 days')",
+    "month": "strftime('%Y-%m-01', c.ts, 'unixepoch')",
+}
+
+# 批量评分的每仓库聚合值 (列见 score_calculator.SCORE_INPUT_COLUMNS)。
+# 只用 SQLite 和 DuckDB 都支持的语法，两个分析引擎 (见 analytics.py) 执行同一条语句，结果必然一致。
+# {where} 是 commits 的过滤条件，{recent} 是 churn 窗口的秒数
+SCORE_INPUTS_SQL = '''
+    WITH c AS (
+        SELECT repo_name, author, ts, COALESCE(additions, 0) AS additions, COALESCE(deletions, 0) AS deletions
+        FROM commits
+        WHERE true{where}
+    ),
+    repo AS (
+        SELECT repo_name, COUNT(*) AS commits, MIN(ts) AS first_ts, MAX(ts) AS last_ts,
+               SUM(additions + deletions) AS total_lines
+        FROM c
+        GROUP BY repo_name
+    ),
+    per_author AS (
+        SELECT repo_name, COUNT(*) AS n FROM c WHERE author IS NOT NULL GROUP BY repo_name, author
+    ),
+    authors AS (
+        SELECT repo_name, COUNT(*) AS unique_authors, SUM(n) AS authored_commits, MAX(n) AS top_author_commits
+        FROM per_author
+        GROUP BY repo_name
+    ),
+    recent AS (
+        SELECT c.repo_name, SUM(c.additions) AS recent_additions, SUM(c.deletions) AS recent_deletions
+        FROM c JOIN repo ON repo.repo_name = c.repo_name
+        WHERE c.ts > repo.last_ts - {recent}
+        GROUP BY c.repo_name
+    )
+    SELECT repo.repo_name, repo.commits, repo.first_ts, repo.last_ts,
+           COALESCE(authors.unique_authors, 0), COALESCE(authors.authored_commits, 0),
+           COALESCE(authors.top_author_commits, 0), repo.total_lines,
+           COALESCE(recent.recent_additions, 0), COALESCE(recent.recent_deletions, 0)
+    FROM repo
+    LEFT JOIN authors ON authors.repo_name = repo.repo_name
+    LEFT JOIN recent ON recent.repo_name = repo.repo_name
+    ORDER BY repo.repo_name
+'''
+
+
+def score_inputs_query(repo_name=None, since=None, until=None):
+    """
+    :param repo_name: 只算这个仓库，None 表示所有仓库
+    :param since / until: 时间窗口 [since, until)，按 commit 时间精确过滤
+    :return: (SQL, 参数元组)，占位符是 ?，SQLite 和 DuckDB 都能直接执行
+    """
+    window, params = _time_window(since, until)
+    where = (" AND repo_name = ?" if repo_name else "") + window
+    sql = SCORE_INPUTS_SQL.format(where=where, recent=CHURN_WINDOW_DAYS * 86400)
+    return sql, ((repo_name,) if repo_name else ()) + params
+
+
+def score_inputs_frame(rows):
+    """SCORE_INPUTS_SQL 的结果行 -> 以 repo_name 为索引的 DataFrame (两个引擎共用，保证类型一致)"""
+    df = pd.DataFrame.from_records(rows, columns=['repo_name', *SCORE_INPUT_COLUMNS])
+    return df.set_index('repo_name').astype('int64')
+
+
+def _reader(method):
+    """
+    读方法：从连接池借一个只读连接，多个线程的读互不等待 (WAL 模式下读也不等写)。
+    在写线程里或嵌套调用时直接用当前线程已有的连接。
+    顺便给每个公开方法计时 (db.<方法名>)，关闭埋点时没有额外开销。
+    """
+    span_name = f"db.{method.__name__}"
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with perf.span(span_name):
+            if getattr(self._local, "conn", None) is not None:
+                return method(self, *args, **kwargs)
+            conn = self._checkout()
+            self._local.conn = conn
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self._local.conn = None
+                self._checkin(conn)
+    return wrapper
+
+
+def _writer(method):
+    """
+    写方法：交给唯一的写线程执行并等待结果。写线程把排队的多个写操作合并进一个事务提交 (group commit)，
+    每个操作有自己的 SAVEPOINT，失败只回滚它自己。计时包含排队时间。
+    """
+    span_name = f"db.{method.__name__}"
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with perf.span(span_name):
+            if getattr(self._local, "is_writer", False):
+                return method(self, *args, **kwargs)
+            return self._submit(method, args, kwargs).result()
+    return wrapper
+
 
 class DBManager:
-    def __init__(self, db_path="data/project_data.db"):
+    """
+    并发模型：
+    - 读：连接池里的只读连接，每个线程借用自己的连接，WAL 模式下可以并行，也不会被写阻塞
+    - 写：所有写操作进入一个队列，由唯一的写线程 / 写连接执行，排队中的多个写操作合并成一个事务提交。
+      只有一个写连接，进程内不会再出现 "database is locked"；和其他进程 (如 sync_service) 的竞争由 busy_timeout 兜底
+    """
+    # 当前 schema 版本，存在 SQLite 的 PRAGMA user_version 里
+    SCHEMA_VERSION = 9
+
+    # sync_state 表里可以更新的字段 (见 _migrate_to_v7)
+    SYNC_STATE_FIELDS = (
+        'status', 'newest_sha', 'newest_date', 'oldest_sha', 'oldest_date', 
+        'inc_cursor', 'inc_until', 'inc_top_sha', 'inc_top_date', 
+        'backfill_cursor', 'backfill_until', 'backfill_complete', 'error', 
+    )
+
+    def __init__(self, db_path="data/project_data.db", max_readers=8, max_batch=64):
+        """
+        :param max_readers: 连接池里保留的只读连接数 (更多线程同时读时临时新建，用完关闭)
+        :param max_batch: 一次 group commit 最多合并的写操作数
+        """
         # 确保 data 文件夹存在
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self.max_batch = max_batch
+        self._local = threading.local()
+        self._pool = queue.LifoQueue(maxsize=max_readers)
+
+        # 写连接：建表 / 迁移在这里同步完成，之后只由写线程使用
+        self._writer_conn = self._connect()
+        self._writer_conn.execute("PRAGMA journal_mode=WAL")
+        self._local.conn, self._local.is_writer = self._writer_conn, True
+        try:
+            self.create_tables()
+        finally:
+            self._local.conn, self._local.is_writer = None, False
+
+        self._queue = queue.Queue()
+        self._writer_thread = threading.Thread(target=self._writer_loop, name="db-writer", daemon=True)
+        self._writer_thread.start()
+
+    def _connect(self, readonly=False):
+        """
+        新建连接 + 调优参数 (WAL 模式下读写互不阻塞，批量写入只在 checkpoint 时 fsync)
+
+        isolation_level=None：不让 sqlite3 模块隐式开事务，事务边界由写线程显式控制
+        """
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        conn.create_function("message_hash", 1, message_hash, deterministic=True)
+        conn.execute("PRAGMA synchronous=NORMAL")  # WAL 下 NORMAL 已经足够安全
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-65536")  # 64 MB 页缓存
+        conn.execute("PRAGMA mmap_size=268435456")  # 256 MB 内存映射读
+        if readonly:
+            conn.execute("PRAGMA query_only=ON")
+        return conn
 
-        # 连接数据库
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.create_tables()
+    @property
+    def conn(self):
+        """当前线程正在使用的连接 (读方法里是借来的只读连接，写线程里是写连接)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            raise RuntimeError("DBManager.conn is only available inside DBManager methods")
+        return conn
+
+    def _checkout(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return self._connect(readonly=True)
+
+    def _checkin(self, conn):
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _submit(self, method, args, kwargs):
+        """把写操作放进队列，:return: Future"""
+        future = Future()
+        self._queue.put((method, args, kwargs, future))
+        return future
+
+    def _writer_loop(self):
+        """写线程：取出当前排队的所有写操作 (最多 max_batch 个)，在一个事务里执行并提交"""
+        self._local.conn, self._local.is_writer = self._writer_conn, True
+        stopping = False
+        while not stopping:
+            job = self._queue.get()
+            if job is None:
+                break
+            jobs = [job]
+            while len(jobs) < self.max_batch:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    stopping = True
+                    break
+                jobs.append(job)
+            self._group_commit(jobs)
+
+    def _group_commit(self, jobs):
+        conn = self._writer_conn
+        outcomes = []
+        try:
+            with perf.span("db.group_commit"):
+                conn.execute("BEGIN IMMEDIATE")
+                for method, args, kwargs, future in jobs:
+                    conn.execute("SAVEPOINT write_job")
+                    try:
+                        outcomes.append((future, method(self, *args, **kwargs), None))
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO write_job")
+                        outcomes.append((future, None, e))
+                    conn.execute("RELEASE write_job")
+                conn.execute("COMMIT")
+        except Exception as e:
+            # 提交本身失败：整批都没有写进去
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for _, _, _, future in jobs:
+                future.set_exception(e)
+            return
+
+        perf.incr("db.group_commits")
+        perf.incr("db.write_jobs", len(jobs))
+        # 提交成功之后才通知调用方，返回即代表已经落盘
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
 
     def create_tables(self):
-        """初始化表结构"""
-        cursor = self.conn.cursor()
+        """初始化表结构，并把旧版本的数据库迁移到最新 schema"""
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        migrations = [
+            self._migrate_to_v1, self._migrate_to_v2, self._migrate_to_v3, self._migrate_to_v4, 
+            self._migrate_to_v5, self._migrate_to_v6, self._migrate_to_v7, 
+            self._migrate_to_v8, self._migrate_to_v9, 
+        ]
+
+        for target, migrate in enumerate(migrations[version:], start=version + 1):
+            # 每一步迁移在一个显式事务里完成 (包括 DDL)，失败则整体回滚
+            cursor = self.conn.cursor()
+            cursor.execute("BEGIN")
+            try:
+                migrate(cursor)
+                cursor.execute(f"PRAGMA user_version = {target}")
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+            print(f"Database schema migrated to v{target}.")
+
+    def _migrate_to_v1(self, cursor):
+        """
+        v1: 修复 commits 表的主键
+
+        旧表写成了 `sha TEXT PRIMATY KEY` (拼写错误)，sha 实际上没有任何约束，
+        INSERT OR IGNORE 永远不会忽略，增量同步每次都会重复插入边界 commit。
+        这里建一张以 (repo_name, sha) 为主键的新表，去重后把旧数据搬过去。
+        """
+        legacy = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'commits'"
+        ).fetchone()
+        if legacy:
+            cursor.execute("ALTER TABLE commits RENAME TO commits_legacy")
 
         # 创建 commits 表
-        # UNIQUE(sha) 保证同一个 commit 不会被重复存储
+        # (repo_name, sha) 主键保证同一个仓库的同一个 commit 不会被重复存储
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS commits (
-                sha TEXT PRIMATY KEY, 
-                repo_name TEXT, 
+            CREATE TABLE commits (
+                sha TEXT NOT NULL, 
+                repo_name TEXT NOT NULL, 
                 author TEXT, 
                 date TEXT, 
                 message TEXT, 
                 additions INTEGER, 
                 deletions INTEGER,
-                category TEXT
+                category TEXT,
+                PRIMARY KEY (repo_name, sha)
             )
         ''')
-        self.conn.commit()
 
+        if legacy:
+            # 按插入顺序去重：重复的 commit 保留最早写入的那一行
+            cursor.execute('''
+                INSERT OR IGNORE INTO commits
+                (sha, repo_name, author, date, message, additions, deletions, category)
+                SELECT sha, repo_name, author, date, message, additions, deletions, category
+                FROM commits_legacy
+                WHERE sha IS NOT NULL AND repo_name IS NOT NULL
+                ORDER BY rowid
+            ''')
+            cursor.execute("DROP TABLE commits_legacy")
+
+        # get_latest_commit_date / get_all_commits 都是按 repo 过滤、按 date 排序
+        cursor.execute("CREATE INDEX idx_commits_repo_date ON commits (repo_name, date)")
+
+    def _migrate_to_v2(self, cursor):
+        """
+        v2: 按天预聚合的汇总表
+
+        Dashboard 的周趋势、星期分布、贡献者排行、分类分布都可以从这两张表算出来，
+        渲染开销只和天数有关，和 commit 总数无关。save_commits 在同一个事务里增量维护。
+        """
+        cursor.execute('''
+            CREATE TABLE daily_author_counts (
+                repo_name TEXT NOT NULL, 
+                day TEXT NOT NULL, 
+                author TEXT NOT NULL, 
+                commits INTEGER NOT NULL, 
+                PRIMARY KEY (repo_name, day, author)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE daily_category_counts (
+                repo_name TEXT NOT NULL, 
+                day TEXT NOT NULL, 
+                category TEXT NOT NULL, 
+                commits INTEGER NOT NULL, 
+                PRIMARY KEY (repo_name, day, category)
+            ) WITHOUT ROWID
+        ''')
+        # 用已有数据回填
+        self._rebuild_rollups(cursor)
+
+    def _migrate_to_v3(self, cursor):
+        """
+        v3: 带版本的分类缓存
+
+        commits 表记录每行的 message 哈希和打标签时的规则版本；classification_cache 以
+        (message 哈希, 规则版本) 为键缓存分类结果。规则一变，只需要对新版本下没见过的
+        不同 message 重新分类 (见 reclassify)。
+        """
+        cursor.execute("ALTER TABLE commits ADD COLUMN msg_hash TEXT")
+        cursor.execute("ALTER TABLE commits ADD COLUMN rule_version TEXT")
+        cursor.execute("UPDATE commits SET msg_hash = message_hash(message)")
+        cursor.execute("CREATE INDEX idx_commits_repo_rule ON commits (repo_name, rule_version)")
+        cursor.execute('''
+            CREATE TABLE classification_cache (
+                msg_hash TEXT NOT NULL, 
+                rule_version TEXT NOT NULL, 
+                category TEXT NOT NULL, 
+                PRIMARY KEY (msg_hash, rule_version)
+            ) WITHOUT ROWID
+        ''')
+
+    def _migrate_to_v4(self, cursor):
+        """v4: 后台同步服务记录每个仓库最近一次同步的状态"""
+        cursor.execute('''
+            CREATE TABLE sync_status (
+                repo_name TEXT PRIMARY KEY, 
+                status TEXT NOT NULL, 
+                last_sync_at TEXT, 
+                commits_added INTEGER, 
+                duration REAL, 
+                error TEXT
+            )
+        ''')
+
+    def _migrate_to_v5(self, cursor):
+        """v5: AI 诊断报告缓存，键是输入指标 + 模型的哈希 (见 AIAnalyst.cache_key)"""
+        cursor.execute('''
+            CREATE TABLE ai_reports (
+                cache_key TEXT PRIMARY KEY, 
+                repo_name TEXT NOT NULL, 
+                model TEXT NOT NULL, 
+                report TEXT NOT NULL, 
+                created_at REAL NOT NULL
+            )
+        ''')
+
+    def _migrate_to_v6(self, cursor):
+        """
+        v6: commit 时间存成带索引的整数 epoch (ts 列)
+
+        时间窗口查询直接走 (repo_name, ts) 索引做范围扫描，不再按 TEXT 排序、也不用在 pandas 里解析字符串。
+        date 列保留原始文本；原来的 (repo_name, date) 索引被 ts 索引取代。
+        """
+        cursor.execute("ALTER TABLE commits ADD COLUMN ts INTEGER")
+        cursor.execute("UPDATE commits SET ts = CAST(strftime('%s', date) AS INTEGER)")
+        cursor.execute("DROP INDEX IF EXISTS idx_commits_repo_date")
+        cursor.execute("CREATE INDEX idx_commits_repo_ts ON commits (repo_name, ts)")
+
+    def _migrate_to_v7(self, cursor):
+        """
+        v7: 可断点续传的同步状态 (见 sync_pipeline.ResumableSync)
+
+        - newest / oldest: 本地已存的连续区间的两端
+        - inc_*: 进行中的增量同步 (从最新往回翻，遇到 newest_sha 停止)，游标 + 固定的 until 时间 + 本轮最新 commit
+        - backfill_*: 进行中的历史回填 (往更老的历史翻)，可以分多次运行完成
+        """
+        cursor.execute('''
+            CREATE TABLE sync_state (
+                repo_name TEXT PRIMARY KEY, 
+                status TEXT, 
+                newest_sha TEXT, 
+                newest_date TEXT, 
+                oldest_sha TEXT, 
+                oldest_date TEXT, 
+                inc_cursor TEXT, 
+                inc_until TEXT, 
+                inc_top_sha TEXT, 
+                inc_top_date TEXT, 
+                backfill_cursor TEXT, 
+                backfill_until TEXT, 
+                backfill_complete INTEGER NOT NULL DEFAULT 0, 
+                error TEXT, 
+                updated_at TEXT
+            )
+        ''')
+
+    def _migrate_to_v8(self, cursor):
+        """
+        v8: commit message 的 FTS5 全文索引
+
+        external content 表：索引只存词条，原文仍在 commits 表里，按 rowid 关联，不会把 message 存两份。
+        commits 表上的触发器在同一个事务里维护索引，save_commits / 快照导入 / 迁移都不需要额外处理。
+        porter 分词器做词干归一 (leak / leaks / leaking 是同一个词)。
+        """
+        cursor.execute('''
+            CREATE VIRTUAL TABLE commits_fts USING fts5(
+                message, content='commits', content_rowid='rowid', tokenize='porter unicode61'
+            )
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER commits_fts_insert AFTER INSERT ON commits BEGIN
+                INSERT INTO commits_fts (rowid, message) VALUES (new.rowid, new.message);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER commits_fts_delete AFTER DELETE ON commits BEGIN
+                INSERT INTO commits_fts (commits_fts, rowid, message) VALUES ('delete', old.rowid, old.message);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER commits_fts_update AFTER UPDATE OF message ON commits BEGIN
+                INSERT INTO commits_fts (commits_fts, rowid, message) VALUES ('delete', old.rowid, old.message);
+                INSERT INTO commits_fts (rowid, message) VALUES (new.rowid, new.message);
+            END
+        ''')
+        # 已有的 commit 一次性建索引
+        cursor.execute("INSERT INTO commits_fts (commits_fts) VALUES ('rebuild')")
+
+    def _migrate_to_v9(self, cursor):
+        """
+        v9: 逐文件的改动 (本地 git 同步的 numstat)，供文件归属 / truck factor 使用 (见 ownership.py)
+
+        - repo_files: 路径字典，路径只存一份；last_ts / deleted_ts 用来判断文件现在是否还存在
+        - file_changes: 每个 commit 改了哪些文件、各多少行
+        - file_authors: 按 (文件, 作者) 预聚合的改动行数和 commit 数，save_commits 增量维护，
+          计算 truck factor 时只读这张表，开销和 (文件 x 作者) 的非零项数有关，和 commit 数无关
+        """
+        cursor.execute('''
+            CREATE TABLE repo_files (
+                file_id INTEGER PRIMARY KEY, 
+                repo_name TEXT NOT NULL, 
+                path TEXT NOT NULL, 
+                last_ts INTEGER, 
+                deleted_ts INTEGER, 
+                UNIQUE (repo_name, path)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE file_changes (
+                repo_name TEXT NOT NULL, 
+                sha TEXT NOT NULL, 
+                file_id INTEGER NOT NULL, 
+                additions INTEGER, 
+                deletions INTEGER, 
+                PRIMARY KEY (repo_name, sha, file_id)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE file_authors (
+                repo_name TEXT NOT NULL, 
+                file_id INTEGER NOT NULL, 
+                author TEXT NOT NULL, 
+                lines INTEGER NOT NULL, 
+                commits INTEGER NOT NULL, 
+                PRIMARY KEY (repo_name, file_id, author)
+            ) WITHOUT ROWID
+        ''')
+
+    def _rebuild_rollups(self, cursor, repo_name=None, tables=("daily_author_counts", "daily_category_counts")):
+        """从 commits 表重新计算汇总表 (repo_name 为 None 时重算全部仓库)"""
+        where = "WHERE repo_name = ?" if repo_name else "WHERE true"
+        params = (repo_name,) if repo_name else ()
+        columns = {"daily_author_counts": "author", "daily_category_counts": "category"}
+        for table in tables:
+            column = columns[table]
+            cursor.execute(f"DELETE FROM {table} {where}", params)
+            cursor.execute(f'''
+                INSERT INTO {table} (repo_name, day, {column}, commits)
+                SELECT repo_name, date(date), IFNULL({column}, ''), COUNT(*)
+                FROM commits {where}
+                GROUP BY 1, 2, 3
+            ''', params)
+
+    @_writer
     def save_commits(self, repo_name, commits_data):
         """
-        批量保存 commits
-        
-        :param commits_data: 兴起后的字典列表
+        批量保存 commits (在写线程的事务里执行)，并在同一个事务里更新按天汇总表
+
+        全部是集合操作，每批的语句数是固定的，和条数无关：
+        1. 多行 VALUES 写进没有索引的临时表 (见 _insert_many)
+        2. 一条 INSERT OR IGNORE ... SELECT 写进 commits (已存在的跳过)；全文索引的触发器在同一条语句里批量更新，
+           逐行 executemany 写 commits 时 FTS5 每行都要单独刷一次，慢好几倍
+        3. 新行的 rowid 都比写入前的最大 rowid 大：按这段 rowid 范围扫一遍新行，
+           按 (天, 作者, 分类) 计数到带主键的临时表 (小 B 树上 upsert，比 GROUP BY 排序整批新行快一倍)，
+           两张汇总表再从这个小得多的计数结果更新
+
+        :param commits_data: 清洗后的字典列表
+        :return: 新写入的条数
         """
-        cursor = self.conn.cursor()
-        count = 0
+        rows = []
         for c in commits_data:
             try:
-                # INSERT OR IGNORE: 如果 sha 已存在，就跳过，不报错
-                cursor.execute('''
-                    INSERT OR IGNORE INTO commits
-                    (sha, repo_name, author, date, message, additions, deletions, category)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    c['sha'], repo_name, c['author'], c['date'], 
+                rows.append((
+                    c['sha'], c['author'], c['date'], 
                     c['message'], c.get('additions', 0), c.get('deletions', 0), 
-                    c.get('category', 'Other')
+                    c.get('category', 'Other'), 
+                    c.get('msg_hash') or message_hash(c['message']), c.get('rule_version')
                 ))
-                if cursor.rowcount > 0:
-                    count += 1
-                
             except Exception as e:
-                print(f"Error saving commit {c['sha']}: {e}")
+                print(f"Error saving commit {c.get('sha')}: {e}")
+
+        cursor = self.conn.cursor()
+        # 临时表不建主键：批内重复和已存在的 commit 都由写 commits 时的 INSERT OR IGNORE 处理
+        cursor.execute('''
+            CREATE TEMP TABLE IF NOT EXISTS staged_commits (
+                sha TEXT NOT NULL, 
+                author TEXT, 
+                date TEXT, 
+                message TEXT, 
+                additions INTEGER, 
+                deletions INTEGER,
+                category TEXT,
+                msg_hash TEXT, 
+                rule_version TEXT
+            )
+        ''')
+        cursor.execute('''
+            CREATE TEMP TABLE IF NOT EXISTS staged_counts (
+                day TEXT NOT NULL, 
+                author TEXT NOT NULL, 
+                category TEXT NOT NULL, 
+                commits INTEGER NOT NULL, 
+                PRIMARY KEY (day, author, category)
+            ) WITHOUT ROWID
+        ''')
+        _insert_many(cursor, '''
+            INSERT INTO staged_commits
+            (sha, author, date, message, additions, deletions, category, msg_hash, rule_version)
+        ''', rows, width=9)
 
-        self.conn.commit()
+        last_rowid = cursor.execute("SELECT IFNULL(MAX(rowid), 0) FROM commits").fetchone()[0]
+        cursor.execute('''
+            INSERT OR IGNORE INTO commits
+            (sha, repo_name, author, date, ts, message, additions, deletions, category, msg_hash, rule_version)
+            SELECT sha, ?, author, date, CAST(strftime('%s', date) AS INTEGER),
+                   message, additions, deletions, category, msg_hash, rule_version
+            FROM staged_commits
+        ''', (repo_name,))
+        count = cursor.rowcount
+        cursor.execute("DELETE FROM staged_commits")
+
+        if count:
+            # NOT INDEXED：固定按 rowid 范围只读新行，不让规划器改走 (repo_name, ts) 索引扫全表
+            cursor.execute('''
+                INSERT INTO staged_counts (day, author, category, commits)
+                SELECT date(date), IFNULL(author, ''), IFNULL(category, ''), 1
+                FROM commits NOT INDEXED
+                WHERE rowid > ?
+                ON CONFLICT (day, author, category) DO UPDATE SET commits = commits + 1
+            ''', (last_rowid,))
+            for table, column in (("daily_author_counts", "author"), ("daily_category_counts", "category")):
+                cursor.execute(f'''
+                    INSERT INTO {table} (repo_name, day, {column}, commits)
+                    SELECT ?, day, {column}, SUM(commits)
+                    FROM staged_counts
+                    WHERE true
+                    GROUP BY day, {column}
+                    ON CONFLICT (repo_name, day, {column}) DO UPDATE SET commits = commits + excluded.commits
+                ''', (repo_name,))
+            cursor.execute("DELETE FROM staged_counts")
+
+        file_rows = [
+            (c['sha'], path, added, removed, int(deleted))
+            for c in commits_data if c.get('files')
+            for path, added, removed, deleted in c['files']
+        ]
+        if file_rows:
+            self._save_file_changes(cursor, repo_name, file_rows)
+
+        perf.incr("db.rows_written", count)
+        perf.incr("db.rows_ignored", len(rows) - count)
         print(f"Saved {count} new commits to DB.")
+        return count
+
+    def _save_file_changes(self, cursor, repo_name, file_rows):
+        """
+        写入逐文件改动，并增量更新 repo_files / file_authors (在 save_commits 的事务里)
+
+        和 commits 一样先进临时表、去掉已经存过的行，汇总表只加真正新增的部分。
+        commit 必须已经在 commits 表里 (作者和时间从那里取)。
 
+        :param file_rows: [(sha, path, additions, deletions, deleted)]
+        """
+        cursor.execute('''
+            CREATE TEMP TABLE IF NOT EXISTS staged_files (
+                sha TEXT NOT NULL, 
+                path TEXT NOT NULL, 
+                additions INTEGER, 
+                deletions INTEGER, 
+                deleted INTEGER, 
+                file_id INTEGER, 
+                PRIMARY KEY (sha, path)
+            )
+        ''')
+        cursor.execute("DELETE FROM staged_files")
+        _insert_many(cursor, "INSERT OR IGNORE INTO staged_files (sha, path, additions, deletions, deleted)",
+                     file_rows, width=5)
+        cursor.execute('''
+            INSERT OR IGNORE INTO repo_files (repo_name, path) SELECT DISTINCT ?, path FROM staged_files
+        ''', (repo_name,))
+        cursor.execute('''
+            UPDATE staged_files SET file_id = (
+                SELECT file_id FROM repo_files rf WHERE rf.repo_name = ? AND rf.path = staged_files.path
+            )
+        ''', (repo_name,))
+        cursor.execute('''
+            DELETE FROM staged_files
+            WHERE EXISTS (
+                SELECT 1 FROM file_changes fc
+                WHERE fc.repo_name = ? AND fc.sha = staged_files.sha AND fc.file_id = staged_files.file_id
+            )
+        ''', (repo_name,))
+        cursor.execute('''
+            INSERT INTO file_changes (repo_name, sha, file_id, additions, deletions)
+            SELECT ?, sha, file_id, additions, deletions FROM staged_files
+        ''', (repo_name,))
+
+        # CROSS JOIN 固定连接顺序：以这一批的临时表为外层，按主键查 commits
+        # (否则规划器可能选择扫描整个仓库的 commits，写入耗时随历史长度增长)
+        # 文件最后一次改动 / 最后一次删除的时间 (commit 可能不按时间顺序到来，所以取最大值)
+        cursor.execute('''
+            UPDATE repo_files SET
+                last_ts = MAX(IFNULL(repo_files.last_ts, 0), t.changed_ts),
+                deleted_ts = CASE WHEN t.removed_ts IS NULL THEN repo_files.deleted_ts
+                                  ELSE MAX(IFNULL(repo_files.deleted_ts, 0), t.removed_ts) END
+            FROM (
+                SELECT sf.file_id, MAX(c.ts) AS changed_ts, MAX(CASE WHEN sf.deleted THEN c.ts END) AS removed_ts
+                FROM staged_files sf
+                CROSS JOIN commits c ON c.repo_name = ? AND c.sha = sf.sha
+                GROUP BY sf.file_id
+            ) AS t
+            WHERE repo_files.file_id = t.file_id
+        ''', (repo_name,))
+        cursor.execute('''
+            INSERT INTO file_authors (repo_name, file_id, author, lines, commits)
+            SELECT ?, sf.file_id, IFNULL(c.author, ''), SUM(sf.additions + sf.deletions), COUNT(*)
+            FROM staged_files sf
+            CROSS JOIN commits c ON c.repo_name = ? AND c.sha = sf.sha
+            WHERE true
+            GROUP BY sf.file_id, IFNULL(c.author, '')
+            ON CONFLICT (repo_name, file_id, author) DO UPDATE SET
+                lines = lines + excluded.lines, commits = commits + excluded.commits
+        ''', (repo_name, repo_name))
+        perf.incr("db.file_changes_written", cursor.execute("SELECT COUNT(*) FROM staged_files").fetchone()[0])
+        cursor.execute("DELETE FROM staged_files")
+
+    def _cached_categories(self, cursor, hashes, rule_version):
+        """查分类缓存，:return: {msg_hash: category}"""
+        found = {}
+        hashes = list(hashes)
+        # SQLite 单条语句的参数个数有上限，分块查询
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i + 500]
+            cursor.execute(
+                f"SELECT msg_hash, category FROM classification_cache "
+                f"WHERE rule_version = ? AND msg_hash IN ({','.join('?' * len(chunk))})",
+                (rule_version, *chunk),
+            )
+            found.update(cursor.fetchall())
+        return found
+
+    @_writer
+    def _save_categories(self, rule_version, entries):
+        """写入分类缓存，:param entries: [(msg_hash, category)]"""
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO classification_cache (msg_hash, rule_version, category) VALUES (?, ?, ?)",
+            [(h, rule_version, label) for h, label in entries],
+        )
+
+    @_reader
+    def classify_commits(self, commits_data, classifier):
+        """
+        借助持久化缓存给一批 commit 打分类标签 (原地写入 category / msg_hash / rule_version)
+
+        当前规则版本下见过的 message 直接查缓存，没见过的不同 message 才交给 classify_many。
+        分类在调用方线程里完成，只有写缓存这一步进写队列。
+        """
+        rule_version = classifier.rule_version
+        for c in commits_data:
+            c['msg_hash'] = message_hash(c['message'])
+
+        cursor = self.conn.cursor()
+        categories = self._cached_categories(cursor, {c['msg_hash'] for c in commits_data}, rule_version)
+
+        missing = {}
+        for c in commits_data:
+            if c['msg_hash'] not in categories:
+                missing.setdefault(c['msg_hash'], c['message'])
+        if missing:
+            labels = classifier.classify_many(list(missing.values()))
+            new_entries = list(zip(missing.keys(), labels))
+            categories.update(new_entries)
+            self._save_categories(rule_version, new_entries)
+
+        for c in commits_data:
+            c['category'] = categories[c['msg_hash']]
+            c['rule_version'] = rule_version
+        return commits_data
+
+    @_reader
+    def needs_reclassification(self, repo_name, rule_version):
+        """该仓库是否有按旧规则版本打的标签"""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT 1 FROM commits WHERE repo_name = ? AND rule_version IS NOT ? LIMIT 1",
+            (repo_name, rule_version),
+        )
+        return cursor.fetchone() is not None
+
+    @_writer
+    def reclassify(self, classifier, repo_name=None):
+        """
+        规则变化后的增量重分类
+
+        只把当前规则版本下缓存里还没有的不同 message 批量分类一次，然后用缓存一条 UPDATE
+        刷新所有旧标签，并重算受影响仓库的分类汇总表。整个过程在一个事务里完成。
+
+        :param repo_name: 只处理这个仓库，None 表示全部
+        :return: 更新的 commit 行数
+        """
+        rule_version = classifier.rule_version
+        repo_filter = "AND repo_name = ?" if repo_name else ""
+        params = (rule_version, repo_name) if repo_name else (rule_version,)
+        cursor = self.conn.cursor()
+
+        cursor.execute(f'''
+            SELECT DISTINCT repo_name FROM commits
+            WHERE rule_version IS NOT ? {repo_filter}
+        ''', params)
+        stale_repos = [row[0] for row in cursor.fetchall()]
+        if not stale_repos:
+            return 0
+
+        # 缓存里没有的不同 message
+        cursor.execute(f'''
+            SELECT msg_hash, MIN(message) FROM commits
+            WHERE rule_version IS NOT ? {repo_filter}
+              AND NOT EXISTS (
+                  SELECT 1 FROM classification_cache cc
+                  WHERE cc.msg_hash = commits.msg_hash AND cc.rule_version = ?
+              )
+            GROUP BY msg_hash
+        ''', (*params, rule_version))
+        missing = cursor.fetchall()
+        labels = classifier.classify_many([m for _, m in missing]) if missing else []
+        print(f"Reclassifying: {len(missing)} distinct messages not cached for rules {rule_version}.")
+
+        cursor.executemany(
+            "INSERT OR IGNORE INTO classification_cache (msg_hash, rule_version, category) VALUES (?, ?, ?)",
+            [(h, rule_version, label) for (h, _), label in zip(missing, labels)],
+        )
+        cursor.execute(f'''
+            UPDATE commits SET
+                category = (
+                    SELECT category FROM classification_cache cc
+                    WHERE cc.msg_hash = commits.msg_hash AND cc.rule_version = ?
+                ),
+                rule_version = ?
+            WHERE rule_version IS NOT ? {repo_filter}
+        ''', (rule_version, rule_version, *params))
+        updated = cursor.rowcount
+        for repo in stale_repos:
+            self._rebuild_rollups(cursor, repo, tables=("daily_category_counts",))
+
+        return updated
+
+    @_reader
     def get_latest_commit_date(self, repo_name):
         """获取该仓库在数据库里最新一条 commit 的时间"""
         cursor = self.conn.cursor()
         cursor.execute('''
             SELECT date FROM commits
             WHERE repo_name = ?
-            ORDER BY date DESC
+            ORDER BY ts DESC
             LIMIT 1
         ''', (repo_name,))
         result = cursor.fetchone()
         return result[0] if result else None
     
-    def get_all_commits(self, repo_name):
-        """读取该仓库所有本地数据"""
+    @_reader
+    def get_latest_commit_sha(self, repo_name):
+        """获取该仓库在数据库里最新一条 commit 的 SHA (本地 git 增量同步的起点)"""
         cursor = self.conn.cursor()
         cursor.execute('''
-            SELECT sha, author, date, message, additions, deletions, category
-            FROM commits
+            SELECT sha FROM commits
             WHERE repo_name = ?
-            ORDER BY date DESC
+            ORDER BY ts DESC
+            LIMIT 1
         ''', (repo_name,))
+        result = cursor.fetchone()
+        return result[0] if result else None
+
+    @_reader
+    def get_oldest_commit(self, repo_name):
+        """:return: 该仓库最早一条 commit 的 (sha, date)，没有数据时为 None"""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT sha, date FROM commits WHERE repo_name = ? ORDER BY ts LIMIT 1", (repo_name,)
+        )
+        return cursor.fetchone()
+
+    @_reader
+    def get_date_range(self, repo_name):
+        """
+        该仓库本地数据的时间范围 (走 (repo_name, ts) 索引，只读两端)
+
+        :return: (最早, 最晚) 的 UTC epoch 秒，没有数据时为 (None, None)
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT MIN(ts), MAX(ts) FROM commits WHERE repo_name = ?", (repo_name,))
+        return cursor.fetchone()
+
+    @_reader
+    def get_all_commits(self, repo_name, since=None, until=None):
+        """
+        读取该仓库的本地数据
+
+        :param since / until: 时间窗口 [since, until)，None 表示不限
+        """
+        window, window_params = _time_window(since, until)
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT sha, author, date, message, additions, deletions, category
+            FROM commits
+            WHERE repo_name = ?{window}
+            ORDER BY ts DESC
+        ''', (repo_name, *window_params))
 
         # 转成字典列表返回
         cols = ['sha', 'author', 'date', 'message', 'additions', 'deletions', 'category']
         return [dict(zip(cols, row)) for row in cursor.fetchall()]
     
+    @_reader
+    def get_commits_frame(self, repo_name, include_messages=False, since=None, until=None):
+        """
+        读取该仓库的本地数据，直接返回类型化的 DataFrame (列式，不经过逐行字典)
+
+        - 索引: UTC datetime，升序。直接读整数 epoch 列，pandas 不再解析字符串
+        - author / category: pandas Categorical，重复值只存一份
+        - message: 默认不加载 (最占内存的一列)，需要时用 include_messages=True 或 get_commit_messages
+
+        - since / until: 时间窗口 [since, until)，在 SQL 里按 ts 索引过滤
+
+        :return: 以 date 为索引的 DataFrame
+        """
+        cols = ['sha', 'author', 'ts', 'additions', 'deletions', 'category']
+        if include_messages:
+            cols.append('message')
+        window, window_params = _time_window(since, until)
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT sha, author, ts, additions, deletions, category{", message" if include_messages else ""}
+            FROM commits
+            WHERE repo_name = ?{window}
+            ORDER BY ts
+        ''', (repo_name, *window_params))
+
+        df = pd.DataFrame.from_records(cursor.fetchall(), columns=cols)
+        df['date'] = pd.to_datetime(df.pop('ts').astype('int64'), unit='s', utc=True)
+        df['additions'] = df['additions'].fillna(0).astype('int64')
+        df['deletions'] = df['deletions'].fillna(0).astype('int64')
+        df['author'] = df['author'].astype('category')
+        df['category'] = df['category'].astype('category')
+        return df.set_index('date')
+
+    @_reader
+    def get_commit_rows(self, repo_name, since=None, until=None):
+        """
+        按存储格式读出该仓库的所有列 (导出快照用)
+
+        :param since / until: 时间窗口 [since, until)，None 表示不限
+        :return: (列名列表, 行元组列表)，按 ts 升序
+        """
+        cols = ['sha', 'author', 'ts', 'message', 'additions', 'deletions', 'category', 'msg_hash', 'rule_version']
+        window, window_params = _time_window(since, until)
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT {', '.join(cols)} FROM commits
+            WHERE repo_name = ?{window}
+            ORDER BY ts
+        ''', (repo_name, *window_params))
+        return cols, cursor.fetchall()
+
+    @_reader
+    def get_data_version(self, repo_name=None):
+        """
+        数据版本号：(最新 commit 时间, commit 行数)，用作上层缓存的键
+
+        行数从按天汇总表求和，最新时间走 (repo_name, ts) 索引 (idx_commits_repo_ts)，都不需要扫 commits 全表。
+        整个数据库时按仓库逐个取索引上的最后一条，再取其中最新的 (单独 ORDER BY ts 用不上这个索引，会扫全表再排序)。
+
+        :param repo_name: None 表示整个数据库
+        """
+        cursor = self.conn.cursor()
+        if repo_name is None:
+            cursor.execute('''
+                SELECT c.date
+                FROM (SELECT DISTINCT repo_name FROM daily_category_counts) r
+                JOIN commits c ON c.rowid = (
+                    SELECT rowid FROM commits WHERE repo_name = r.repo_name ORDER BY ts DESC LIMIT 1
+                )
+                ORDER BY c.ts DESC
+                LIMIT 1
+            ''')
+            row = cursor.fetchone()
+            latest = row[0] if row else None
+            cursor.execute("SELECT IFNULL(SUM(commits), 0) FROM daily_category_counts")
+        else:
+            latest = self.get_latest_commit_date(repo_name)
+            cursor.execute(
+                "SELECT IFNULL(SUM(commits), 0) FROM daily_category_counts WHERE repo_name = ?", (repo_name,)
+            )
+        return latest, cursor.fetchone()[0]
+
+    @_writer
+    def record_sync_status(self, repo_name, status, commits_added=None, duration=None, error=None):
+        """
+        记录某个仓库的同步状态
+
+        :param status: 'running' / 'ok' / 'error'
+        """
+        self.conn.execute('''
+            INSERT OR REPLACE INTO sync_status
+            (repo_name, status, last_sync_at, commits_added, duration, error)
+            VALUES (?, ?, strftime('%Y-%m-%dT%H:%M:%SZ', 'now'), ?, ?, ?)
+        ''', (repo_name, status, commits_added, duration, error))
+
+    @_reader
+    def get_sync_state(self, repo_name):
+        """:return: 该仓库的断点续传状态字典，没有记录时为 None"""
+        cursor = self.conn.cursor()
+        cols = ['repo_name', *self.SYNC_STATE_FIELDS, 'updated_at']
+        cursor.execute(f"SELECT {', '.join(cols)} FROM sync_state WHERE repo_name = ?", (repo_name,))
+        row = cursor.fetchone()
+        return dict(zip(cols, row)) if row else None
+
+    @_writer
+    def update_sync_state(self, repo_name, **fields):
+        """
+        更新断点续传状态 (只改传入的字段，没有记录时新建)
+
+        :param fields: SYNC_STATE_FIELDS 里的字段
+        """
+        unknown = set(fields) - set(self.SYNC_STATE_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown sync state fields: {sorted(unknown)}")
+        cols = list(fields)
+        self.conn.execute(f'''
+            INSERT INTO sync_state (repo_name, {''.join(c + ', ' for c in cols)}updated_at)
+            VALUES (?, {''.join('?, ' for _ in cols)}strftime('%Y-%m-%dT%H:%M:%SZ', 'now'))
+            ON CONFLICT (repo_name) DO UPDATE SET
+                {''.join(f'{c} = excluded.{c}, ' for c in cols)}updated_at = excluded.updated_at
+        ''', (repo_name, *fields.values()))
+
+    @_reader
+    def get_sync_status(self, repo_name=None):
+        """:return: 同步状态字典列表 (repo_name 为 None 时返回全部仓库)"""
+        cursor = self.conn.cursor()
+        cols = ['repo_name', 'status', 'last_sync_at', 'commits_added', 'duration', 'error']
+        if repo_name is None:
+            cursor.execute(f"SELECT {', '.join(cols)} FROM sync_status ORDER BY repo_name")
+        else:
+            cursor.execute(f"SELECT {', '.join(cols)} FROM sync_status WHERE repo_name = ?", (repo_name,))
+        return [dict(zip(cols, row)) for row in cursor.fetchall()]
+
+    @_reader
+    def get_ai_report(self, cache_key, max_age):
+        """
+        读取缓存的 AI 报告
+
+        :param max_age: 有效期 (秒)，过期的视为不存在
+        :return: 报告文本或 None
+        """
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT report FROM ai_reports WHERE cache_key = ? AND created_at >= ?",
+            (cache_key, time.time() - max_age),
+        )
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    @_writer
+    def save_ai_report(self, cache_key, repo_name, model, report):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO ai_reports (cache_key, repo_name, model, report, created_at) VALUES (?, ?, ?, ?, ?)",
+            (cache_key, repo_name, model, report, time.time()),
+        )
+
+    @_reader
+    def list_repos(self):
+        """本地缓存过的所有仓库名"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT DISTINCT repo_name FROM commits ORDER BY repo_name")
+        return [row[0] for row in cursor.fetchall()]
+
+    @_reader
+    def get_recent_repos(self, limit=5):
+        """最近有新数据的仓库 (按各自最新 commit 时间降序)，启动预热用"""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT repo_name FROM commits GROUP BY repo_name ORDER BY MAX(ts) DESC LIMIT ?", (limit,)
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    @_reader
+    def get_portfolio_frame(self):
+        """
+        一次读出所有仓库的 (repo_name, author, date, additions, deletions)，供批量评分使用
+
+        :return: 以 UTC date 为索引的 DataFrame，repo_name / author 为 Categorical
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT repo_name, author, ts, IFNULL(additions, 0), IFNULL(deletions, 0)
+            FROM commits
+        ''')
+        df = pd.DataFrame.from_records(
+            cursor.fetchall(), columns=['repo_name', 'author', 'ts', 'additions', 'deletions']
+        )
+        df['date'] = pd.to_datetime(df.pop('ts').astype('int64'), unit='s', utc=True)
+        df['additions'] = df['additions'].astype('int64')
+        df['deletions'] = df['deletions'].astype('int64')
+        df['repo_name'] = df['repo_name'].astype('category')
+        df['author'] = df['author'].astype('category')
+        return df.set_index('date')
+
+    @_reader
+    def get_score_inputs(self, repo_name=None, since=None, until=None):
+        """
+        批量评分需要的每仓库聚合值，直接在 SQL 里算完 (不把明细读进 pandas)
+
+        :param repo_name: None 表示所有仓库
+        :param since / until: 时间窗口 [since, until)
+        :return: 以 repo_name 为索引的 DataFrame，列见 score_calculator.SCORE_INPUT_COLUMNS
+        """
+        sql, params = score_inputs_query(repo_name, since, until)
+        cursor = self.conn.cursor()
+        cursor.execute(sql, params)
+        return score_inputs_frame(cursor.fetchall())
+
+    @_reader
+    def get_commit_messages(self, repo_name, shas=None, since=None, until=None):
+        """
+        按需加载 commit message
+
+        :param shas: 只取这些 commit，None 表示全部
+        :param since / until: shas 为 None 时按时间窗口 [since, until) 过滤
+        :return: {sha: message}
+        """
+        cursor = self.conn.cursor()
+        if shas is None:
+            window, window_params = _time_window(since, until)
+            cursor.execute(f"SELECT sha, message FROM commits WHERE repo_name = ?{window}", (repo_name, *window_params))
+            return dict(cursor.fetchall())
+
+        result = {}
+        shas = list(shas)
+        # SQLite 单条语句的参数个数有上限，分块查询
+        for i in range(0, len(shas), 500):
+            chunk = shas[i:i + 500]
+            cursor.execute(
+                f"SELECT sha, message FROM commits WHERE repo_name = ? AND sha IN ({','.join('?' * len(chunk))})",
+                (repo_name, *chunk),
+            )
+            result.update(cursor.fetchall())
+        return result
+
+    @_reader
+    def get_daily_counts(self, repo_name, since=None, until=None):
+        """
+        每天的 commit 数 (来自汇总表)
+
+        :param since / until: 时间窗口 [since, until)，按天粒度过滤
+        :return: Series，UTC 日期索引 (升序)
+        """
+        window, window_params = _time_window(since, until, column="day")
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT day, SUM(commits) FROM daily_category_counts
+            WHERE repo_name = ?{window}
+            GROUP BY day
+            ORDER BY day
+        ''', (repo_name, *window_params))
+        df = pd.DataFrame.from_records(cursor.fetchall(), columns=['day', 'commits'])
+        return pd.Series(
+            df['commits'].to_numpy(dtype='int64'),
+            index=pd.DatetimeIndex(pd.to_datetime(df['day'], utc=True), name='date'),
+            name='commits',
+        )
+
+    @_reader
+    def get_weekday_counts(self, repo_name, since=None, until=None):
+        """
+        按星期几统计 commit 数 (来自汇总表)
+
+        :param since / until: 时间窗口 [since, until)，按天粒度过滤
+        :return: Series，索引 0-6 (周一 = 0，和 pandas 的 dayofweek 一致)
+        """
+        window, window_params = _time_window(since, until, column="day")
+        cursor = self.conn.cursor()
+        # SQLite 的 %w 周日 = 0，换成周一 = 0
+        cursor.execute(f'''
+            SELECT (CAST(strftime('%w', day) AS INTEGER) + 6) % 7, SUM(commits)
+            FROM daily_category_counts
+            WHERE repo_name = ?{window}
+            GROUP BY 1
+        ''', (repo_name, *window_params))
+        counts = dict(cursor.fetchall())
+        return pd.Series([counts.get(i, 0) for i in range(7)], name='commits')
+
+    @_reader
+    def get_author_counts(self, repo_name, limit=None, since=None, until=None):
+        """
+        每个作者的 commit 数，降序 (来自汇总表)
+
+        :param limit: 只取前 N 名，None 表示全部
+        :param since / until: 时间窗口 [since, until)，按天粒度过滤
+        :return: Series，author -> commits
+        """
+        window, window_params = _time_window(since, until, column="day")
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT author, SUM(commits) AS n FROM daily_author_counts
+            WHERE repo_name = ?{window}
+            GROUP BY author
+            ORDER BY n DESC, author
+            {"LIMIT ?" if limit else ""}
+        ''', (repo_name, *window_params, limit) if limit else (repo_name, *window_params))
+        rows = cursor.fetchall()
+        return pd.Series(dict(rows), name='commits', dtype='int64')
+
+    @_reader
+    def get_category_counts(self, repo_name, since=None, until=None):
+        """
+        每个分类的 commit 数，降序 (来自汇总表)
+
+        :param since / until: 时间窗口 [since, until)，按天粒度过滤
+        :return: Series，category -> commits
+        """
+        window, window_params = _time_window(since, until, column="day")
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT category, SUM(commits) AS n FROM daily_category_counts
+            WHERE repo_name = ?{window}
+            GROUP BY category
+            ORDER BY n DESC, category
+        ''', (repo_name, *window_params))
+        return pd.Series(dict(cursor.fetchall()), name='commits', dtype='int64')
+
+    @_reader
+    def get_file_ownership(self, repo_name=None):
+        """
+        每个 (现存文件, 作者) 的累计改动 (来自 file_authors 汇总表)，只有本地 git 同步的仓库有数据
+
+        被删除 (或重命名走) 之后没有再改过的文件不算在内。
+
+        :param repo_name: None 表示所有仓库
+        :return: DataFrame，列 repo_name / path / author / lines / commits
+        """
+        repo_filter = "AND fa.repo_name = ?" if repo_name else ""
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT fa.repo_name, rf.path, fa.author, fa.lines, fa.commits
+            FROM file_authors fa
+            JOIN repo_files rf ON rf.file_id = fa.file_id
+            WHERE (rf.deleted_ts IS NULL OR rf.last_ts > rf.deleted_ts) {repo_filter}
+        ''', (repo_name,) if repo_name else ())
+        df = pd.DataFrame.from_records(
+            cursor.fetchall(), columns=['repo_name', 'path', 'author', 'lines', 'commits']
+        )
+        df['lines'] = df['lines'].astype('int64')
+        df['commits'] = df['commits'].astype('int64')
+        for column in ('repo_name', 'path', 'author'):
+            df[column] = df[column].astype('category')
+        return df
+
+    @_reader
+    def search_commits(self, query, repo_name=None, since=None, until=None, limit=50):
+        """
+        全文搜索 commit message (FTS5 索引，按 bm25 相关度排序)
+
+        :param query: 用户输入的搜索词，见 fts_query；不是合法的查询时抛 SearchQueryError
+        :param repo_name: 只搜这个仓库，None 表示所有仓库
+        :param since / until: 时间窗口 [since, until)
+        :param limit: 最多返回多少条
+        :return: DataFrame，列 repo_name / sha / author / date / category / snippet / score (越小越相关)
+        """
+        columns = ['repo_name', 'sha', 'author', 'date', 'category', 'snippet', 'score']
+        match = fts_query(query)
+        if not match:
+            return pd.DataFrame(columns=columns)
+
+        repo_filter = " AND c.repo_name = ?" if repo_name else ""
+        window, window_params = _time_window(since, until, column="c.ts")
+        cursor = self.conn.cursor()
+        _execute_match(cursor, f'''
+            SELECT c.repo_name, c.sha, c.author, c.ts, c.category,
+                   snippet(commits_fts, 0, '«', '»', '…', 16), bm25(commits_fts)
+            FROM commits_fts
+            JOIN commits c ON c.rowid = commits_fts.rowid
+            WHERE commits_fts MATCH ?{repo_filter}{window}
+            ORDER BY bm25(commits_fts)
+            LIMIT ?
+        ''', (match, *((repo_name,) if repo_name else ()), *window_params, limit))
+        df = pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+        df['date'] = pd.to_datetime(df['date'].astype('int64'), unit='s', utc=True)
+        return df
+
+    @_reader
+    def get_search_counts(self, query, repo_name=None, since=None, until=None, bucket="week"):
+        """
+        搜索命中数按时间分桶 (看某个话题什么时候被频繁提起)
+
+        :param query: 同 search_commits
+        :param bucket: "day" / "week" / "month"
+        :return: Series，UTC 时间索引 (每个桶的起点，升序)，只包含有命中的桶
+        """
+        match = fts_query(query)
+        repo_filter = " AND c.repo_name = ?" if repo_name else ""
+        window, window_params = _time_window(since, until, column="c.ts")
+        rows = []
+        if match:
+            cursor = self.conn.cursor()
+            _execute_match(cursor, f'''
+                SELECT {_SEARCH_BUCKETS[bucket]} AS bucket, COUNT(*)
+                FROM commits_fts
+                JOIN commits c ON c.rowid = commits_fts.rowid
+                WHERE commits_fts MATCH ?{repo_filter}{window}
+                GROUP BY bucket
+                ORDER BY bucket
+            ''', (match, *((repo_name,) if repo_name else ()), *window_params))
+            rows = cursor.fetchall()
+        df = pd.DataFrame.from_records(rows, columns=['bucket', 'hits'])
+        return pd.Series(
+            df['hits'].to_numpy(dtype='int64'),
+            index=pd.DatetimeIndex(pd.to_datetime(df['bucket'], utc=True), name='date'),
+            name='hits',
+        )
+
+    @_writer
+    def rebuild_search_index(self):
+        """
+        从 commits 表重建全文索引
+
+        索引按 rowid 关联 commits 表，VACUUM 可能会重排没有整数主键的表的 rowid，做过 VACUUM 之后调用一次。
+        """
+        self.conn.execute("INSERT INTO commits_fts (commits_fts) VALUES ('rebuild')")
+
     def close(self):
-        self.conn.close()
\ No newline at end of file
+        """等写队列里的操作全部提交后停止写线程，关闭所有连接"""
+        if self._writer_thread.is_alive():
+            self._queue.put(None)
+            self._writer_thread.join()
+        self._writer_conn.close()
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
\ No newline at end of file
@@ -0,0 +1,201 @@
+import os
+import subprocess
+from datetime import datetime, timezone
+
+import perf
+
+
+class GitRepoError(ValueError):
+    """本地仓库路径为空、不存在或者不是 git 仓库"""
+
+
+class GitLogError(GitRepoError):
+    """路径是 git 仓库，但读取历史的 git 命令执行失败 (比如 rev 不存在)"""
+
+
+class LocalGitLoader:
+    """
+    从本地 clone (或 bare mirror) 读取 commit 历史，不走 GitHub API
+
+    流式解析 `git log -z --raw --numstat` 的输出，边读边产出，内存占用和历史长度无关。
+    输出和其它 loader 一样是清洗后的字典，而且带真实的 additions/deletions，
+    以及逐文件的改动 files: [(path, additions, deletions, deleted)]，供文件归属 / truck factor 使用。
+
+    -z 模式下路径原样输出、用 NUL 分隔 (不会被 core.quotePath 转义成 "\\303\\274.txt"，
+    路径里的制表符、" => " 也不会和分隔符混在一起)。--summary 在 -z 下仍然是转义过的文本行，
+    所以删除 / 重命名从 --raw 的状态字母里读。
+    """
+    # 用 ASCII 控制字符做分隔符，commit message 里基本不可能出现
+    RECORD_SEP = "\x1e"
+    FIELD_SEP = "\x1f"
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, repo_path, rev="HEAD", git="git"):
+        """
+        :param repo_path: 本地仓库路径 (工作区或 bare 仓库都可以)
+        :param rev: 从哪个引用开始往回读，默认 HEAD
+        :param git: git 可执行文件
+        """
+        self.repo_path = repo_path
+        self.rev = rev
+        self.git = git
+
+    def check(self):
+        """确认 repo_path 是一个 git 仓库 (工作区或 bare 都可以)，否则抛 GitRepoError"""
+        if not self.repo_path or not self.repo_path.strip():
+            raise GitRepoError("Enter the path of a local git clone")
+        if not os.path.isdir(self.repo_path):
+            raise GitRepoError(f"{self.repo_path} does not exist or is not a directory")
+        result = subprocess.run([self.git, "-C", self.repo_path, "rev-parse", "--git-dir"], capture_output=True)
+        if result.returncode != 0:
+            raise GitRepoError(f"{self.repo_path} is not a git repository")
+
+    def has_commit(self, sha):
+        """仓库里是否有这个 commit"""
+        result = subprocess.run(
+            [self.git, "-C", self.repo_path, "cat-file", "-e", f"{sha}^{{commit}}"], capture_output=True
+        )
+        return result.returncode == 0
+
+    def _log_cmd(self, since_sha=None, since_date=None):
+        rev = f"{since_sha}..{self.rev}" if since_sha else self.rev
+        fmt = self.RECORD_SEP + self.FIELD_SEP.join(["%H", "%an", "%at", "%B"])
+        cmd = [self.git, "-C", self.repo_path, "log", "-z", "--raw", "--numstat", f"--format={fmt}", rev]
+        if since_date:
+            cmd.append(f"--since={since_date}")
+        return cmd
+
+    @classmethod
+    def _iter_tokens(cls, stream):
+        """把 -z 输出按 NUL 切开，边读边产出 (路径不一定是合法 UTF-8，解不开的字节替换掉)"""
+        pending = b""
+        while True:
+            chunk = stream.read(cls.CHUNK_SIZE)
+            if not chunk:
+                break
+            parts = (pending + chunk).split(b"\0")
+            pending = parts.pop()
+            for part in parts:
+                yield part.decode("utf-8", errors="replace")
+        if pending:
+            yield pending.decode("utf-8", errors="replace")
+
+    def _parse_log(self, tokens):
+        """
+        按 token 流逐条组装 commit
+
+        每条 commit 是: 头部 (RECORD_SEP 开头)，若干 raw 条目 (":状态行" + 路径，重命名 / 复制是新旧两个路径)，
+        若干 numstat 条目 ("增\\t删\\t路径"，重命名时路径为空，后面跟新旧两个路径)。
+        路径总是按位置读取，不看内容。
+        """
+        tokens = iter(tokens)
+        commit = None
+        for token in tokens:
+            if token.startswith(self.RECORD_SEP):
+                if commit:
+                    yield self._finish(commit)
+                commit = self._parse_header(token[1:])
+                continue
+            # 头部和第一个 raw 条目之间有一个换行
+            token = token.lstrip("\n")
+            if commit is None or not token:
+                continue
+            files = commit["files"]
+            if token.startswith(":"):
+                # ":100644 100644 <sha> <sha> M"，状态字母后面可能带相似度 (R100)
+                status = token.rsplit(" ", 1)[-1]
+                path = next(tokens)
+                if status[0] in "RC":
+                    old_path, path = path, next(tokens)
+                    if status[0] == "R":
+                        # 重命名：改动记在新路径上，旧路径从此不存在
+                        files.setdefault(old_path, (old_path, 0, 0, True))
+                if status == "D":
+                    files[path] = (path, 0, 0, True)
+                continue
+            parts = token.split("\t", 2)
+            if len(parts) != 3:
+                continue
+            path = parts[2]
+            if not path:
+                _, path = next(tokens), next(tokens)
+            # 二进制文件的行数是 "-"
+            added = int(parts[0]) if parts[0].isdigit() else 0
+            removed = int(parts[1]) if parts[1].isdigit() else 0
+            commit["additions"] += added
+            commit["deletions"] += removed
+            deleted = files.get(path, (None, 0, 0, False))[3]
+            files[path] = (path, added, removed, deleted)
+        if commit:
+            yield self._finish(commit)
+
+    def _parse_header(self, header):
+        sha, author, timestamp, message = header.split(self.FIELD_SEP, 3)
+        date = datetime.fromtimestamp(int(timestamp), tz=timezone.utc)
+        return {
+            "sha": sha,
+            "author": author,
+            "date": date.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "message": message.rstrip("\n"),
+            "additions": 0,
+            "deletions": 0,
+            "files": {},
+        }
+
+    @staticmethod
+    def _finish(commit):
+        commit["files"] = list(commit["files"].values())
+        return commit
+
+    def iter_commits(self, since_sha=None, since_date=None):
+        """
+        逐条产出 commit (从新到旧)
+
+        :param since_sha: 增量模式：只读这个 SHA 之后的新 commit。本地仓库里没有这个 commit 时
+                          (之前走 API 同步过、clone 过期或者是浅克隆)，`git log <sha>..HEAD` 会直接失败，
+                          这时改为读全部历史，已经存过的 commit 入库时由主键去重
+        :param since_date: 只读这个时间之后的 commit
+        """
+        if since_sha and not self.has_commit(since_sha):
+            perf.incr("git.full_rescans")
+            since_sha = None
+        proc = subprocess.Popen(
+            self._log_cmd(since_sha, since_date),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        )
+        try:
+            yield from self._parse_log(self._iter_tokens(proc.stdout))
+
+            proc.stdout.close()
+            if proc.wait() != 0:
+                stderr = proc.stderr.read().decode("utf-8", errors="replace").strip()
+                raise GitLogError(f"git log failed: {stderr}")
+        finally:
+            # 调用方提前停止迭代时，把 git 进程收掉
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            proc.stderr.close()
+
+    def iter_commit_batches(self, repo_name=None, since_date=None, limit=None, since_sha=None, batch_size=1000):
+        """
+        按批产出清洗后的 commit，接口和 GitHub loader 一致，可以直接交给 sync_pipeline
+
+        :param repo_name: 仅为接口一致，本地仓库由 repo_path 决定
+        :param limit: 最多产出多少条，None 表示全部
+        :param since_sha: 增量模式的起点 (通常是 DBManager.get_latest_commit_sha 的结果)
+        """
+        batch = []
+        total = 0
+        for commit in self.iter_commits(since_sha, since_date):
+            batch.append(commit)
+            total += 1
+            if len(batch) >= batch_size:
+                perf.incr("git.commits", len(batch))
+                yield batch
+                batch = []
+            if limit is not None and total >= limit:
+                break
+        if batch:
+            perf.incr("git.commits", len(batch))
+            yield batch
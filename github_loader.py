@@ -1,81 +1,687 @@
-import requests
+import json
+import math
+import os
+import sqlite3
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlparse, parse_qs
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import perf
+
+
+class RateLimitError(PermissionError):
+    """配额耗尽且需要等待的时间超过了允许的上限"""
+
+
+class ETagCache:
+    """
+    持久化的 ETag 缓存 (SQLite)
+
+    同一个 URL 再次请求时带上 If-None-Match，GitHub 返回 304 时直接用本地的 body，
+    304 不消耗 API 配额。
+
+    缓存存的是整页 body，会不断变大：超过 max_age 没用过的条目删掉，总大小超过 max_bytes 时
+    从最久没用过的开始删。打开时和之后每 PRUNE_EVERY 次写入清理一次。
+    """
+    PRUNE_EVERY = 100
+
+    def __init__(self, db_path="data/http_cache.db", max_age=30 * 86400, max_bytes=256 * 1024 * 1024):
+        """
+        :param max_age: 条目多久没用过 (秒) 就删掉，None 表示不按时间清理
+        :param max_bytes: body 总大小上限 (字节)，None 表示不限
+        """
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self._writes = 0
+        with self.lock:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS etags (
+                    url TEXT PRIMARY KEY, 
+                    etag TEXT, 
+                    body TEXT, 
+                    used_at REAL
+                )
+            ''')
+            # 旧版本的缓存文件没有 used_at：补上这一列，已有条目按现在算
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(etags)")]
+            if "used_at" not in columns:
+                self.conn.execute("ALTER TABLE etags ADD COLUMN used_at REAL")
+                self.conn.execute("UPDATE etags SET used_at = ?", (time.time(),))
+            self._prune()
+            self.conn.commit()
+
+    def get(self, url):
+        """:return: (etag, body) 或 None"""
+        with self.lock:
+            row = self.conn.execute("SELECT etag, body FROM etags WHERE url = ?", (url,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def put(self, url, etag, body):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO etags (url, etag, body, used_at) VALUES (?, ?, ?, ?)",
+                (url, etag, json.dumps(body), time.time()),
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._prune()
+            self.conn.commit()
+
+    def touch(self, url):
+        """命中 (304) 时更新最近使用时间，常用的页不会被清理掉"""
+        with self.lock:
+            self.conn.execute("UPDATE etags SET used_at = ? WHERE url = ?", (time.time(), url))
+            self.conn.commit()
+
+    def _prune(self):
+        """按 max_age / max_bytes 清理 (调用方持有锁，负责提交)"""
+        if self.max_age is not None:
+            self.conn.execute("DELETE FROM etags WHERE used_at < ?", (time.time() - self.max_age,))
+        if self.max_bytes is not None:
+            self.conn.execute('''
+                DELETE FROM etags WHERE url IN (
+                    SELECT url FROM (
+                        SELECT url, SUM(length(body)) OVER (ORDER BY used_at DESC, url) AS total FROM etags
+                    )
+                    WHERE total > ?
+                )
+            ''', (self.max_bytes,))
+
+    def close(self):
+        self.conn.close()
+
+
+class RequestScheduler:
+    """
+    限流感知的请求调度器
+
+    - 读取 X-RateLimit-Remaining / X-RateLimit-Reset / Retry-After，配额快用完时放慢节奏，
+      用完时等到重置时间再继续，而不是直接失败
+    - 5xx 和网络错误按指数退避重试
+    - 可选的 ETag 缓存，命中时返回 304 不计入配额
+    多个线程 (并发翻页、后台同步) 可以共享同一个调度器，也就共享同一份配额。
+    """
+
+    def __init__(self, etag_cache=None, max_retries=5, backoff=1.0, max_wait=900, low_water=50):
+        """
+        :param etag_cache: ETagCache 实例，None 表示不用条件请求
+        :param max_retries: 单个请求的最大重试次数 (错误和限流响应分开计数，各自以此为上限)
+        :param backoff: 指数退避的基础秒数
+        :param max_wait: 等待配额重置的最长秒数，超过则抛 RateLimitError
+        :param low_water: 剩余配额低于该值时开始把请求均匀摊到重置时间之前
+        """
+        self.etag_cache = etag_cache
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_wait = max_wait
+        self.low_water = low_water
+
+        self.remaining = None
+        self.reset_at = None
+        self._next_slot = 0.0  # 配额紧张时下一个请求最早的发送时刻
+        self.lock = threading.Lock()
+
+    def _update_budget(self, response):
+        """根据响应头更新剩余配额"""
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset")
+        with self.lock:
+            if remaining is not None:
+                self.remaining = int(remaining)
+            if reset is not None:
+                self.reset_at = float(reset)
+
+    def _pace(self):
+        """
+        发请求之前调用：配额紧张时等待
+
+        等多久在锁里算好，睡眠时不持有锁：一个线程等配额重置时，其它线程 (包括会命中 ETag 缓存的请求)
+        不会被挡住。配额紧张时每个请求在锁里领一个发送时刻，并发线程依次排开，而不是同时醒来。
+        """
+        exhausted = False
+        delay = 0.0
+        with self.lock:
+            if self.remaining is None or self.reset_at is None:
+                return
+            now = time.time()
+            wait = self.reset_at - now
+            if wait <= 0:
+                return
+            if self.remaining <= 0:
+                # 配额已经耗尽，只能等到重置
+                if wait > self.max_wait:
+                    raise RateLimitError(f"API Rate Limit exceeded. Resets in {wait:.0f}s.")
+                exhausted, delay = True, wait
+            else:
+                if self.remaining < self.low_water:
+                    # 把剩下的请求均匀摊到重置之前
+                    slot = max(now, self._next_slot)
+                    self._next_slot = slot + wait / self.remaining
+                    delay = slot - now
+                # 先占一个名额，避免并发线程同时看到同一个 remaining
+                self.remaining -= 1
+
+        if exhausted:
+            print(f"Rate limit exhausted, waiting {delay:.0f}s for reset...")
+            perf.incr("github.rate_limit_wait_s", delay)
+        elif delay > 0:
+            perf.incr("github.pacing_wait_s", delay)
+        if delay > 0:
+            time.sleep(delay)
+        if exhausted:
+            with self.lock:
+                # 重置之后剩余配额未知，等下一个响应头更新
+                if self.reset_at is not None and self.reset_at <= time.time():
+                    self.remaining = None
+
+    def _retry_wait(self, response):
+        """判断是否是限流响应，是的话返回需要等待的秒数，否则返回 None"""
+        if response.status_code not in (403, 429):
+            return None
+        retry_after = response.headers.get("Retry-After")
+        if retry_after is not None:
+            return float(retry_after)
+        if response.headers.get("X-RateLimit-Remaining") == "0":
+            reset = float(response.headers.get("X-RateLimit-Reset", time.time()))
+            # Reset 是整秒时间戳，多等 1 秒避免刚好卡在边界上
+            return max(0.0, reset - time.time()) + 1.0
+        return None
+
+    # 不进 ETag 缓存键的参数。断点续传的同步每一轮都会带一个新的 until (本轮开始的时刻)，
+    # 算进键的话每轮都是新键，永远拿不到 304，缓存还会无限增长。
+    # GitHub 的 ETag 只由响应内容决定，同一页内容没变就会回 304，所以忽略 until 不会拿到错的页
+    _UNCACHED_PARAMS = ("until",)
+
+    @classmethod
+    def _cache_key(cls, url, params):
+        items = sorted((k, v) for k, v in (params or {}).items() if k not in cls._UNCACHED_PARAMS)
+        return f"{url}?{urlencode(items)}"
+
+    def get(self, session, url, params=None):
+        """
+        发送 GET 请求
+
+        :return: (解析后的 JSON 或 None, response)。非 200/304 的响应原样交给调用方处理
+        """
+        return self.request(session, url, params=params)
+
+    def post(self, session, url, json_body):
+        """发送 POST 请求 (GraphQL)，不走 ETag 缓存，其余限流/重试逻辑和 GET 相同"""
+        return self.request(session, url, json_body=json_body)
+
+    def request(self, session, url, params=None, json_body=None):
+        """
+        发送请求，json_body 不为 None 时用 POST
+
+        :return: (解析后的 JSON 或 None, response)
+        """
+        key = self._cache_key(url, params)
+        etag_cache = self.etag_cache if json_body is None else None
+        attempt = 0
+        rate_limited = 0
+        last_error = None
+
+        # 限流等待不消耗错误的重试次数 (每次等待都受 max_wait 约束)，但单独计数：
+        # 服务器一直回 403 / 429 时最多等 max_retries 次，不会无限循环
+        while attempt <= self.max_retries:
+            self._pace()
+
+            headers = {}
+            cached = etag_cache.get(key) if etag_cache else None
+            if cached:
+                headers["If-None-Match"] = cached[0]
+
+            try:
+                with perf.span("github.request"):
+                    if json_body is None:
+                        response = session.get(url, params=params, headers=headers)
+                    else:
+                        response = session.post(url, json=json_body, headers=headers)
+            except requests.RequestException as e:
+                # 网络抖动：退避重试
+                perf.incr("github.retries")
+                last_error = e
+                time.sleep(self.backoff * 2 ** attempt)
+                attempt += 1
+                continue
+
+            self._update_budget(response)
+            perf.incr("github.requests")
+            perf.incr("github.bytes", len(response.content))
+
+            if response.status_code == 304 and cached:
+                perf.incr("github.not_modified")
+                etag_cache.touch(key)
+                return cached[1], response
+
+            if response.status_code == 200:
+                data = response.json()
+                etag = response.headers.get("ETag")
+                if etag_cache and etag:
+                    etag_cache.put(key, etag, data)
+                return data, response
+
+            wait = self._retry_wait(response)
+            if wait is not None:
+                if wait > self.max_wait:
+                    raise RateLimitError(f"API Rate Limit exceeded. Resets in {wait:.0f}s.")
+                rate_limited += 1
+                if rate_limited > self.max_retries:
+                    raise RateLimitError(f"API Rate Limit exceeded. Still limited after {self.max_retries} waits.")
+                print(f"Rate limited, retrying in {wait:.0f}s...")
+                perf.incr("github.rate_limited")
+                perf.incr("github.rate_limit_wait_s", wait)
+                time.sleep(wait)
+                continue
+
+            if response.status_code >= 500:
+                last_error = f"{response.status_code} - {response.text}"
+                perf.incr("github.retries")
+                time.sleep(self.backoff * 2 ** attempt)
+                attempt += 1
+                continue
+
+            return None, response
+
+        raise Exception(f"Request failed after {self.max_retries} retries: {last_error}")
 
 class GitHubLoader:
     BASE_URL = "https://api.github.com"
+    PER_PAGE = 100  # GitHub API 最大允许每页 100 条
 
-    def __init__(self, token):
+    def __init__(self, token, base_url=None, max_workers=8, scheduler=None, etag_cache_path="data/http_cache.db"):
         """
         初始化加载器
         :param token: GitHub Personal Access Token
+        :param base_url: API 根地址 (默认 GitHub 官方，测试时可指向本地假服务器)
+        :param max_workers: 并发抓取时的最大线程数
+        :param scheduler: 共享的 RequestScheduler (多个 loader 共用一份配额)，None 则自己建一个
+        :param etag_cache_path: ETag 缓存文件路径，None 表示不用条件请求
         """
+        self.base_url = (base_url or self.BASE_URL).rstrip("/")
+        self.max_workers = max_workers
+        if scheduler is None:
+            etag_cache = ETagCache(etag_cache_path) if etag_cache_path else None
+            scheduler = RequestScheduler(etag_cache=etag_cache)
+        self.scheduler = scheduler
         self.headers = {
             "Authorization": f"token {token}", 
             "Accept": "application/vnd.github.v3 + json"
         }
 
-    def fetch_commits(self, repo_name, limit=100, since_date=None):
+        # 复用同一个 Session: keep-alive + 连接池，避免每页都重新握手
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _get_page(self, repo_name, page, since_date=None, until_date=None):
+        """
+        请求单页 commits
+
+        :param until_date: 只要这个时间 (含) 之前的 commit
+        :return: (该页数据列表, response 对象)
+        """
+        # 构造请求参数
+        params = {
+            "per_page": self.PER_PAGE, 
+            "page": page, 
+        }
+        # 如果传入了时间，加到参数里
+        if since_date:
+            params['since'] = since_date
+        if until_date:
+            params['until'] = until_date
+
+        url = f"{self.base_url}/repos/{repo_name}/commits"
+
+        # 发送请求 (限流等待、重试和 ETag 都在调度器里处理)
+        data, response = self.scheduler.get(self.session, url, params)
+        if data is not None:
+            return data, response
+
+        # 错误处理 (404, 403, etc)
+        if response.status_code == 404:
+            # 抛出具体错误，让上层知道仓库名字写错了
+            raise ValueError(f"Repository '{repo_name}' not found. Please check spelling.")
+        
+        elif response.status_code == 403:
+            # 限流的 403 已经在调度器里等待/重试过了，走到这里说明是权限问题
+            raise PermissionError("Token invalid or access denied.")
+        
+        raise Exception(f"Error: {response.status_code} - {response.text}")
+
+    @staticmethod
+    def _last_page(response):
+        """从 Link 头里读出 rel="last" 的页码，没有 Link 头说明只有一页"""
+        last = response.links.get("last")
+        if not last:
+            return 1
+        query = parse_qs(urlparse(last["url"]).query)
+        return int(query.get("page", ["1"])[0])
+
+    @staticmethod
+    def clean_commit(raw):
+        """
+        REST 返回的原始 commit -> save_commits 需要的字典 (列表接口没有行数统计)
+
+        date 是作者时间 (入库和统计都用它)；committed_date 是提交时间，GitHub 的 since / until
+        和列表顺序都按它来，断点续传要用它定位 (rebase / cherry-pick 过的 commit 两者可能差很远)
+        """
+        commit = raw['commit']
+        return {
+            "sha": raw['sha'],
+            "author": commit['author']['name'],
+            "date": commit['author']['date'],
+            "committed_date": (commit.get('committer') or commit['author'])['date'],
+            "message": commit['message'],
+            "additions": 0,
+            "deletions": 0,
+        }
+
+    def fetch_commits(self, repo_name, limit=100, since_date=None, parallel=False):
         """
         获取指定仓库的 commit 列表，处理分页
         
         :param repo_name: 例如 'pandas-dev/pandas'
         :param limit: 限制或取得条数 （防止是 Linux 内核，把内存撑爆）
         :param since_date: ISO 8601 格式时间字符串 (e.g. '2026-01-01T00:00:00Z')
+        :param parallel: True 时先读第 1 页的 Link 头拿到总页数，剩下的页并发抓取
         :return: commits 列表
         """
         commits = []
-        page = 1
-        per_page = 100  # GitHub API 最大允许每页 100 条
 
-        print(f"Start fetching {repo_name} (Since: {since_date})...")
+        # 中途出错直接抛出：不能把网络错误当成"没有更多数据"，返回一份残缺的列表
+        for data in self.iter_commit_pages(repo_name, limit, since_date, parallel):
+            commits.extend(data)
+
+        # 截断到用户限制的数量
+        return commits[:limit]
+
+    def iter_commit_pages(self, repo_name, limit=None, since_date=None, parallel=False):
+        """
+        逐页产出原始 commit 列表 (生成器)，调用方处理完一页再要下一页，内存占用和历史长度无关
+
+        :param limit: 最多产出多少条，None 表示拉取全部历史
+        :param parallel: True 时用线程池预取后面的页，但仍按页码顺序产出
+        """
+        for _, data, _ in self._iter_numbered_pages(repo_name, limit, since_date, parallel=parallel):
+            yield data
+
+    def _iter_numbered_pages(self, repo_name, limit=None, since_date=None, until_date=None,
+                             start_page=1, max_pages=None, parallel=False):
+        """
+        :param start_page: 从第几页开始 (断点续传)
+        :param max_pages: 最多抓多少页，None 表示不限
+        :return: 生成器，产出 (页码, 原始 commit 列表, 后面是否还有页)
+        """
+        if parallel:
+            yield from self._iter_pages_parallel(repo_name, limit, since_date, until_date, start_page, max_pages)
+            return
+
+        page = start_page
+        total = 0
+
+        print(f"Start fetching {repo_name} (Since: {since_date}, Until: {until_date}, Page: {page})...")
+
+        while (limit is None or total < limit) and (max_pages is None or page < start_page + max_pages):
+            data, response = self._get_page(repo_name, page, since_date, until_date)
+
+            # 如果这一页是空的，说明没数据了，退出循环
+            if not data:
+                break
+
+            if limit is not None:
+                data = data[:limit - total]
+            total += len(data)
+            print(f"  --> Page {page} fetched. Total: {total}")
+            more = "next" in response.links
+            yield page, data, more
+            if not more:
+                break
+
+            # 翻页 (节奏由调度器根据剩余配额控制)
+            page += 1
+
+    def _iter_pages_parallel(self, repo_name, limit, since_date, until_date=None, start_page=1, max_pages=None):
+        """
+        并发抓取：第一页顺序请求拿到总页数，其余页交给有上限的线程池。
+        只预取一个固定大小的窗口，按页码顺序产出，已产出的页不再持有。
+        """
+        print(f"Start fetching {repo_name} in parallel (Since: {since_date}, Until: {until_date}, Page: {start_page})...")
+
+        data, response = self._get_page(repo_name, start_page, since_date, until_date)
+        if not data:
+            return
+        if limit is not None:
+            data = data[:limit]
+        total = len(data)
+        total_pages = self._last_page(response)
+        yield start_page, data, start_page < total_pages
+
+        last_page = total_pages
+        if limit is not None:
+            # 只抓到 limit 需要的页数为止
+            last_page = min(last_page, start_page - 1 + math.ceil(limit / self.PER_PAGE))
+        if max_pages is not None:
+            last_page = min(last_page, start_page - 1 + max_pages)
+
+        window = self.max_workers * 2
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = deque()
+            next_page = start_page + 1
+            try:
+                while pending or next_page <= last_page:
+                    while next_page <= last_page and len(pending) < window:
+                        pending.append((next_page, pool.submit(
+                            self._get_page, repo_name, next_page, since_date, until_date
+                        )))
+                        next_page += 1
+
+                    page, future = pending.popleft()
+                    data = future.result()[0]
+
+                    if limit is not None:
+                        data = data[:limit - total]
+                    total += len(data)
+                    print(f"  --> Page {page} fetched. Total: {total}")
+                    yield page, data, page < total_pages
+            finally:
+                # 某一页出错或调用方提前停止：取消还没开始的请求，前面已产出的页保留
+                for _, f in pending:
+                    f.cancel()
+
+    def iter_commit_batches(self, repo_name, since_date=None, limit=None):
+        """逐页产出清洗后的 commit 字典，供 sync_pipeline 使用"""
+        for data in self.iter_commit_pages(repo_name, limit, since_date, parallel=True):
+            yield [self.clean_commit(c) for c in data]
+
+    def iter_resumable_batches(self, repo_name, cursor=None, until_date=None, max_pages=None, parallel=False):
+        """
+        可断点续传的逐页抓取，供 sync_pipeline.ResumableSync 使用
+
+        游标是下一页的页码。页码只有在结果集不变时才稳定，所以续传时要带上同一个 until_date，
+        把抓取期间新推送的 commit 排除在外。
+
+        :param cursor: 上次保存的游标，None 表示从第一页开始
+        :param max_pages: 本次最多抓多少页 (分块回填)
+        :return: 生成器，产出 (清洗后的 commit 列表, 下一页的游标)；没有下一页时游标为 None
+        """
+        start_page = int(cursor) if cursor else 1
+        pages = self._iter_numbered_pages(
+            repo_name, until_date=until_date, start_page=start_page, max_pages=max_pages, parallel=parallel
+        )
+        for page, data, more in pages:
+            yield [self.clean_commit(c) for c in data], str(page + 1) if more else None
+
+
+class GitHubGraphQLLoader:
+    """
+    基于 GraphQL 的 commit 加载器
 
-        while len(commits) < limit:
-            try: 
-                # 构造请求参数
-                params = {
-                    "per_page": per_page, 
-                    "page": page, 
+    REST 的 commits 列表不带 additions/deletions，逐个请求 /commits/{sha} 又是 N+1。
+    GraphQL 的 history(first: 100) 连接一次就能把作者、时间、message 和行数统计一起取回来，
+    每 100 条 commit 只花一次请求。
+
+    输出和 app.py 清洗后的格式一致，可以直接交给 DBManager.save_commits。
+    """
+    GRAPHQL_URL = "https://api.github.com/graphql"
+    PAGE_SIZE = 100  # GraphQL 连接每次最多 100 个节点
+
+    QUERY = """
+    query($owner: String!, $name: String!, $cursor: String, $since: GitTimestamp, $until: GitTimestamp,
+          $first: Int!) {
+      repository(owner: $owner, name: $name) {
+        defaultBranchRef {
+          target {
+            ... on Commit {
+              history(first: $first, after: $cursor, since: $since, until: $until) {
+                pageInfo { hasNextPage endCursor }
+                nodes {
+                  oid
+                  message
+                  additions
+                  deletions
+                  author { name date }
+                  committedDate
                 }
-                # 如果传入了时间，加到参数里
-                if since_date:
-                    params['since'] = since_date
-                
-                url = f"{self.BASE_URL}/repos/{repo_name}/commits"
-
-                # 发送请求
-                response = requests.get(url, headers=self.headers, params=params)
-
-                # 错误处理 (404, 403, etc)
-                if response.status_code == 404:
-                    # 抛出具体错误，让上层知道仓库名字写错了
-                    raise ValueError(f"Repository '{repo_name}' not found. Please check spelling.")
-                
-                elif response.status_code == 403:
-                    raise PermissionError("API Rate Limit exceeded or Token invalid.")
-                
-                elif response.status_code != 200:
-                    raise Exception(f"Error: {response.status_code} - {response.text}")
-                
-                # 解析数据
-                data = response.json()
+              }
+            }
+          }
+        }
+      }
+    }
+    """
+
+    def __init__(self, token, graphql_url=None, scheduler=None):
+        """
+        :param token: GitHub Personal Access Token
+        :param graphql_url: GraphQL 端点 (默认 GitHub 官方，测试时可指向本地假服务器)
+        :param scheduler: 共享的 RequestScheduler，None 则自己建一个 (不带 ETag 缓存)
+        """
+        self.graphql_url = graphql_url or self.GRAPHQL_URL
+        self.scheduler = scheduler or RequestScheduler()
+        self.session = requests.Session()
+        self.session.headers.update({"Authorization": f"bearer {token}"})
+
+    @staticmethod
+    def _clean(node):
+        """GraphQL 节点 -> save_commits 需要的字典"""
+        author = node.get("author") or {}
+        return {
+            "sha": node["oid"],
+            "author": author.get("name"),
+            "date": author.get("date"),
+            "committed_date": node.get("committedDate") or author.get("date"),
+            "message": node["message"],
+            "additions": node.get("additions") or 0,
+            "deletions": node.get("deletions") or 0,
+        }
+
+    def _query_page(self, repo_name, cursor=None, since_date=None, until_date=None):
+        """请求一页 history，返回 history 连接对象"""
+        owner, name = repo_name.split("/", 1)
+        variables = {
+            "owner": owner, 
+            "name": name, 
+            "cursor": cursor, 
+            "since": since_date, 
+            "until": until_date, 
+            "first": self.PAGE_SIZE, 
+        }
+        data, response = self.scheduler.post(
+            self.session, self.graphql_url, {"query": self.QUERY, "variables": variables}
+        )
+
+        if data is None:
+            if response.status_code in (401, 403):
+                raise PermissionError("Token invalid or access denied.")
+            raise Exception(f"Error: {response.status_code} - {response.text}")
+
+        if data.get("errors"):
+            messages = "; ".join(e.get("message", "") for e in data["errors"])
+            if any(e.get("type") == "NOT_FOUND" for e in data["errors"]):
+                raise ValueError(f"Repository '{repo_name}' not found. Please check spelling.")
+            raise Exception(f"GraphQL Error: {messages}")
+
+        repo = (data.get("data") or {}).get("repository")
+        if repo is None:
+            raise ValueError(f"Repository '{repo_name}' not found. Please check spelling.")
+
+        ref = repo.get("defaultBranchRef")
+        if ref is None:
+            # 空仓库，没有默认分支
+            return {"pageInfo": {"hasNextPage": False, "endCursor": None}, "nodes": []}
+        return ref["target"]["history"]
+
+    def fetch_commits(self, repo_name, limit=100, since_date=None):
+        """
+        获取指定仓库的 commit 列表 (已清洗，带行数统计)
 
-                # 如果这一页是空的，说明没数据了，退出循环
-                if not data:
-                    break
+        :param repo_name: 例如 'pandas-dev/pandas'
+        :param limit: 限制获取条数
+        :param since_date: ISO 8601 格式时间字符串
+        :return: 清洗后的 commit 字典列表
+        """
+        commits = []
 
-                # 加入总列表
-                commits.extend(data)
-                print(f"  --> Page {page} fetched. Total: {len(commits)}")
+        # 中途出错直接抛出，不返回残缺的列表
+        for batch in self.iter_commit_batches(repo_name, since_date, limit):
+            commits.extend(batch)
 
-                # 翻页
-                page += 1
+        return commits[:limit]
+
+    def iter_commit_batches(self, repo_name, since_date=None, limit=None):
+        """
+        逐页产出清洗后的 commit 字典 (生成器)
+
+        :param limit: 最多产出多少条，None 表示拉取全部历史
+        """
+        cursor = None
+        total = 0
 
-                # 简单的限流保护 (虽然有 Token, 但稍微礼貌一点)
-                time.sleep(0.1)
+        print(f"Start fetching {repo_name} via GraphQL (Since: {since_date})...")
 
-            except Exception as e:
-                print(f"Network Error: {e}")
+        while limit is None or total < limit:
+            history = self._query_page(repo_name, cursor, since_date)
+            batch = [self._clean(node) for node in history["nodes"]]
+            if limit is not None:
+                batch = batch[:limit - total]
+            total += len(batch)
+            print(f"  --> Page fetched. Total: {total}")
+            if batch:
+                yield batch
+
+            if not history["pageInfo"]["hasNextPage"]:
                 break
+            cursor = history["pageInfo"]["endCursor"]
 
-        # 截断到用户限制的数量
-        return commits[:limit]
\ No newline at end of file
+    def iter_resumable_batches(self, repo_name, cursor=None, until_date=None, max_pages=None, parallel=False):
+        """
+        可断点续传的逐页抓取，接口和 GitHubLoader.iter_resumable_batches 相同
+
+        游标就是 GraphQL 的 endCursor，本身指向历史中的固定位置；parallel 没有意义 (下一页依赖上一页的游标)。
+
+        :return: 生成器，产出 (清洗后的 commit 列表, 下一页的游标)；没有下一页时游标为 None
+        """
+        pages = 0
+        print(f"Start fetching {repo_name} via GraphQL (Until: {until_date}, Cursor: {cursor})...")
+
+        while max_pages is None or pages < max_pages:
+            history = self._query_page(repo_name, cursor, until_date=until_date)
+            pages += 1
+            cursor = history["pageInfo"]["endCursor"] if history["pageInfo"]["hasNextPage"] else None
+            batch = [self._clean(node) for node in history["nodes"]]
+            print(f"  --> Page fetched. {len(batch)} commits")
+            yield batch, cursor
+            if cursor is None:
+                break
@@ -1,18 +1,54 @@
+import argparse
 import sys
 import os
 import subprocess
 import time
+import urllib.request
 import webbrowser
 
-def main():
+DEFAULT_PORT = 8501
+# Streamlit 自带的健康检查接口，服务能处理请求时返回 200
+HEALTH_PATH = "/_stcore/health"
+
+
+def wait_until_ready(process, url, timeout=60.0, interval=0.1):
+    """
+    轮询健康检查接口，服务一就绪就返回 (代替固定的 sleep)
+
+    :param process: streamlit 子进程，提前退出时不再等待
+    :param url: 健康检查地址
+    :return: 从开始等待到就绪的秒数；进程退出或超时返回 None
+    """
+    start = time.monotonic()
+    while time.monotonic() - start < timeout:
+        if process.poll() is not None:
+            return None
+        try:
+            with urllib.request.urlopen(url, timeout=1) as resp:
+                if resp.status == 200:
+                    return time.monotonic() - start
+        except OSError:
+            pass  # 端口还没监听 / 服务还在初始化
+        time.sleep(interval)
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Project Health Dashboard launcher")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="本地端口")
+    parser.add_argument("--warm", type=int, default=0, help="启动后在后台预热最近 N 个仓库的视图 (0 表示不预热)")
+    parser.add_argument("--timeout", type=float, default=60, help="等待服务就绪的最长时间 (秒)")
+    parser.add_argument("--no-browser", action="store_true", help="就绪后不自动打开浏览器")
+    args = parser.parse_args(argv)
+
     print("Initializing Project Health Dashboard...")
-    
+
     # 1. 获取当前脚本所在的目录
     base_dir = os.path.dirname(os.path.abspath(__file__))
-    
+
     # 2. 定位 app.py 的路径
     app_path = os.path.join(base_dir, "app.py")
-    
+
     # 3. 检查 app.py 是否存在
     if not os.path.exists(app_path):
         print(f"Error: Cannot find app.py at {app_path}")
@@ -21,33 +57,53 @@ def main():
 
     # 4. 构造启动命令: streamlit run app.py
     # 使用 sys.executable 确保用的是当前的 python 解释器 (虚拟环境里的那个)
-    cmd = [sys.executable, "-m", "streamlit", "run", app_path]
-    
+    # headless: 由启动器在服务就绪后打开浏览器
+    cmd = [
+        sys.executable, "-m", "streamlit", "run", app_path,
+        "--server.port", str(args.port), "--server.headless", "true",
+    ]
+    env = dict(os.environ)
+    if args.warm > 0:
+        env["PAD_WARM_REPOS"] = str(args.warm)
+
     print("Starting local server...")
-    
+
     # 5. 使用 subprocess 启动后台进程
+    process = None
     try:
         # Popen 不会阻塞，它会在后台跑
-        process = subprocess.Popen(cmd)
-        
-        # 6. 等待几秒让服务启动
-        time.sleep(3)
-        
-        # 7. 尝试自动打开浏览器 (Streamlit 其实通常会自动打开，但这行是双保险)
-        # webbrowser.open("http://localhost:8501")
-        
-        print("Server is running! Please check your browser.")
+        process = subprocess.Popen(cmd, env=env)
+
+        # 6. 轮询健康检查接口，就绪后立刻继续
+        app_url = f"http://localhost:{args.port}"
+        elapsed = wait_until_ready(process, app_url + HEALTH_PATH, timeout=args.timeout)
+        if elapsed is None:
+            if process.poll() is None:
+                print(f"Server did not become ready within {args.timeout:.0f}s.")
+                process.terminate()
+            else:
+                print(f"Server exited with code {process.returncode}.")
+            input("Press Enter to exit...")
+            return
+
+        print(f"Server is ready in {elapsed:.2f}s: {app_url}")
+
+        # 7. 打开浏览器
+        if not args.no_browser:
+            webbrowser.open(app_url)
+
         print("   (Close this window to stop the app)")
-        
+
         # 8. 阻塞主进程，直到用户关闭窗口
         process.wait()
-        
+
     except KeyboardInterrupt:
         print("\nStopping server...")
-        process.terminate()
+        if process is not None:
+            process.terminate()
     except Exception as e:
         print(f"\nError occurred: {e}")
         input("Press Enter to exit...")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
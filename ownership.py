@@ -0,0 +1,135 @@
+"""
+文件级代码归属和 truck factor
+
+- 作者对文件的贡献 = 改动行数 (additions + deletions)；只改过二进制文件 (没有行数) 时按 commit 数算
+- 贡献 >= 该文件最大贡献者的 OWNER_THRESHOLD 倍，就算这个文件的 owner (一个文件可以有多个 owner)
+- 一个文件的 owner 全部离开，这个文件就成了"孤儿"；truck factor = 最少离开几个人，就会有超过一半的文件成为孤儿
+
+(作者 x 文件) 矩阵只按非零项存成稀疏坐标 (两个整数数组)，10 万文件 x 几千作者也只有几百万个非零项。
+精确求最小集合是 NP 难的，这里用贪心：每一步移除"最关键"的作者，得分是他 owner 的每个文件记
+1 / 剩余 owner 数 (独占的文件记 1，和另外两人共有的记 1/3)。移除一个人只更新他的文件和这些文件的共同 owner，
+每一步再用 argmax 选下一个人。
+
+数据来自 DBManager.get_file_ownership (本地 git 同步时 save_commits 增量维护的 file_authors 汇总表)。
+"""
+import numpy as np
+import pandas as pd
+
+# 贡献达到文件最大贡献者的这个比例才算 owner (Avelino 等人 truck factor 算法里的归一化阈值)
+OWNER_THRESHOLD = 0.75
+# 超过这个比例的文件成为孤儿，就认为项目停摆
+ORPHAN_SHARE = 0.5
+
+
+def file_owners(ownership, threshold=OWNER_THRESHOLD):
+    """
+    找出每个文件的 owner
+
+    :param ownership: 每行一个 (文件, 作者) 的 DataFrame，列 path / author / lines / commits (单个仓库)
+    :return: (authors, files, owner_author, owner_file)：作者名和文件名 (Index)，
+             以及 owner 关系的稀疏坐标 (两个等长的整数数组，分别是作者和文件的下标)
+    """
+    author_idx, authors = pd.factorize(ownership['author'], sort=True)
+    file_idx, files = pd.factorize(ownership['path'], sort=True)
+    lines = ownership['lines'].to_numpy(dtype='float64')
+    commits = ownership['commits'].to_numpy(dtype='float64')
+
+    # 只改过二进制文件的文件按 commit 数算
+    file_lines = np.bincount(file_idx, weights=lines, minlength=len(files))
+    weight = np.where(file_lines[file_idx] > 0, lines, commits)
+    file_max = pd.Series(weight).groupby(file_idx).transform('max').to_numpy()
+    is_owner = (weight > 0) & (weight >= threshold * file_max)
+    return authors, files, author_idx[is_owner], file_idx[is_owner]
+
+
+def _csr(keys, size):
+    """按 keys 分组的下标：order[ptr[k]:ptr[k + 1]] 是 keys == k 的所有位置"""
+    order = np.argsort(keys, kind='stable')
+    ptr = np.zeros(size + 1, dtype='int64')
+    np.cumsum(np.bincount(keys, minlength=size), out=ptr[1:])
+    return order, ptr
+
+
+def _gather(order, ptr, groups):
+    """把多个分组的下标拼成一个数组，:return: (下标, 每个下标属于 groups 里的第几个)"""
+    starts = ptr[groups]
+    lengths = ptr[groups + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype='int64'), np.empty(0, dtype='int64')
+    group_of = np.repeat(np.arange(len(groups)), lengths)
+    offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return order[starts[group_of] + offsets], group_of
+
+
+def truck_factor(ownership, threshold=OWNER_THRESHOLD, orphan_share=ORPHAN_SHARE):
+    """
+    贪心计算 truck factor
+
+    :param ownership: 单个仓库的 (文件, 作者) 贡献，见 file_owners
+    :return: 没有文件数据时为 None；否则字典：
+             truck_factor: 离开多少人后孤儿文件超过 orphan_share
+             key_authors: 这些人 (按移除顺序)
+             orphaned: 每移除一人之后的孤儿文件比例
+             files / authors: 参与计算的文件数 / 作者数
+    """
+    if ownership.empty:
+        return None
+    authors, files, owner_author, owner_file = file_owners(ownership, threshold)
+    n_authors, n_files = len(authors), len(files)
+
+    by_author, author_ptr = _csr(owner_author, n_authors)
+    by_file, file_ptr = _csr(owner_file, n_files)
+    remaining = np.bincount(owner_file, minlength=n_files)  # 每个文件还剩几个 owner
+    score = np.bincount(owner_author, weights=1.0 / remaining[owner_file], minlength=n_authors)
+
+    orphaned = 0
+    key_authors, curve = [], []
+    while orphaned <= orphan_share * n_files and len(key_authors) < n_authors:
+        a = int(np.argmax(score))
+        score[a] = -np.inf
+        own_files = owner_file[by_author[author_ptr[a]:author_ptr[a + 1]]]
+        remaining[own_files] -= 1
+        left = remaining[own_files]
+        orphaned += int((left == 0).sum())
+        key_authors.append(authors[a])
+        curve.append(orphaned / n_files)
+
+        # 还有人在的文件：剩下的每个 owner 对这个文件的份额从 1/(k+1) 变成 1/k
+        shared = own_files[left > 0]
+        if shared.size:
+            k = remaining[shared].astype('float64')
+            positions, group_of = _gather(by_file, file_ptr, shared)
+            score += np.bincount(
+                owner_author[positions], weights=(1.0 / k - 1.0 / (k + 1))[group_of], minlength=n_authors
+            )
+
+    return {
+        "truck_factor": len(key_authors),
+        "key_authors": key_authors,
+        "orphaned": curve,
+        "files": n_files,
+        "authors": n_authors,
+    }
+
+
+def truck_factors(ownership, threshold=OWNER_THRESHOLD, orphan_share=ORPHAN_SHARE):
+    """
+    多个仓库的 truck factor
+
+    :param ownership: 带 repo_name 列的 DataFrame (DBManager.get_file_ownership(None))
+    :return: Series，repo_name -> truck factor (没有文件数据的仓库不在里面)
+    """
+    result = {
+        repo: truck_factor(group, threshold, orphan_share)
+        for repo, group in ownership.groupby('repo_name', observed=True, sort=False)
+    }
+    return pd.Series(
+        {repo: r["truck_factor"] for repo, r in result.items() if r is not None}, name='truck_factor', dtype='int64'
+    )
+
+
+def truck_factor_penalty(tf):
+    """truck factor -> 社区评分的扣分 (1 人: 10，2 人: 5)，标量和数组都可以"""
+    tf = np.asarray(tf, dtype='float64')
+    return np.select([tf == 1, tf == 2], [10, 5], default=0)
@@ -0,0 +1,122 @@
+"""
+轻量级性能埋点：计时 span + 计数器
+
+    with perf.span("db.save_commits"):
+        ...
+    perf.incr("db.rows_written", count)
+
+默认关闭 (环境变量 PAD_PERF=1 或 perf.enable() 打开)。关闭时 span() 返回一个共享的空上下文，
+incr() 直接返回，热路径上几乎没有额外开销。统计数据是进程级的，所有会话共享。
+"""
+import functools
+import json
+import os
+import threading
+import time
+
+_enabled = os.environ.get("PAD_PERF", "") not in ("", "0")
+_lock = threading.Lock()
+_spans = {}     # name -> [次数, 总耗时, 最大耗时]
+_counters = {}  # name -> 累计值
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        with _lock:
+            stat = _spans.get(self.name)
+            if stat is None:
+                _spans[self.name] = [1, elapsed, elapsed]
+            else:
+                stat[0] += 1
+                stat[1] += elapsed
+                if elapsed > stat[2]:
+                    stat[2] = elapsed
+        return False
+
+
+def span(name):
+    """计时上下文管理器"""
+    return _Span(name) if _enabled else _NULL_SPAN
+
+
+def incr(name, value=1):
+    """累加计数器"""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def timed(name=None):
+    """函数计时装饰器，span 名默认为 模块.函数名"""
+    def decorator(func):
+        span_name = name or f"{func.__module__}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def enable(flag=True):
+    global _enabled
+    _enabled = bool(flag)
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+
+
+def snapshot():
+    """
+    :return: {"enabled": bool, "spans": {name: {count, total_s, mean_ms, max_ms}}, "counters": {name: value}}
+    """
+    with _lock:
+        spans = {
+            name: {
+                "count": count,
+                "total_s": round(total, 6),
+                "mean_ms": round(total / count * 1000, 3),
+                "max_ms": round(peak * 1000, 3),
+            }
+            for name, (count, total, peak) in sorted(_spans.items())
+        }
+        counters = dict(sorted(_counters.items()))
+    return {"enabled": _enabled, "spans": spans, "counters": counters}
+
+
+def to_json(indent=2):
+    return json.dumps(snapshot(), indent=indent)
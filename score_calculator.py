@@ -1,11 +1,18 @@
 import numpy as np
 import pandas as pd
 
-def calculate_health_score(df):
+import perf
+from churn import CHURN_WINDOW_DAYS, churn_penalty, churn_to_growth, window_churn_ratio
+from ownership import truck_factor_penalty
+
+@perf.timed("score.calculate_health_score")
+def calculate_health_score(df, now=None, truck_factor=None):
     """
     根据 commit 历史计算健康度评分 (0-100)
     
     :param df: 包含 datetime 索引的 DataFrame
+    :param now: 计算活跃度用的"当前时间"，默认取系统时间
+    :param truck_factor: 文件级 truck factor (ownership.truck_factor)，有的话代替按 commit 占比估算的独裁惩罚
     :return: 整数分数，解释文本字典
     """
     score = 0
@@ -16,7 +23,8 @@ def calculate_health_score(df):
 
     # --- 活跃度评分 ---
     last_commit_date = df.index.max()
-    now = pd.Timestamp.now(tz=last_commit_date.tz)  # 保持时区一致
+    if now is None:
+        now = pd.Timestamp.now(tz=last_commit_date.tz)  # 保持时区一致
     days_since_last = (now - last_commit_date).days
 
     if days_since_last < 30:
@@ -50,8 +58,16 @@ def calculate_health_score(df):
         explanations.append("Bus Factor Risk: Only 1-2 contributors. ")
 
     # 惩罚项：看独裁程度
-    # 如果一个人干了超过 80% 的活，且团队人数 > 1 (避免把个人项目误判)，扣 10 分
-    if top_contributor_ratio > 0.8 and unique_authors > 1:
+    # 有文件级数据时看 truck factor：1 个人离开就有一半以上的文件没人懂，扣 10 分；2 个人扣 5 分
+    if truck_factor is not None:
+        penalty = int(truck_factor_penalty(truck_factor)) if unique_authors > 1 else 0
+        community_score = max(0, community_score - penalty)
+        if penalty:
+            explanations.append(f"Truck Factor Risk: Losing {truck_factor} developer(s) would orphan over half of the files.")
+        else:
+            explanations.append(f"Truck Factor: {truck_factor}. ")
+    # 否则：如果一个人干了超过 80% 的活，且团队人数 > 1 (避免把个人项目误判)，扣 10 分
+    elif top_contributor_ratio > 0.8 and unique_authors > 1:
         community_score = max(0, community_score - 10) # 不扣成负数
         explanations.append(f"HIGH RISK: One developer wrote {top_contributor_ratio:.1%} of code.")
 
@@ -67,8 +83,158 @@ def calculate_health_score(df):
         explanations.append("Young Project: <6 months history.")
     else:
         stability_score = 0
-        explanations.appent("Baby Project: Just started. ")
+        explanations.append("Baby Project: Just started. ")
 
     score += stability_score
 
-    return score, explanations
\ No newline at end of file
+    # --- Churn 惩罚 (只有带行数统计的数据才计算) ---
+    churn_ratio = window_churn_ratio(df)
+    if churn_ratio is not None:
+        penalty = int(churn_penalty(churn_ratio))
+        score = max(0, score - penalty)
+        if penalty:
+            explanations.append(f"High Churn: Code is rewritten faster than it grows (churn/growth {churn_ratio:.1f} in last {CHURN_WINDOW_DAYS} days).")
+        else:
+            explanations.append("Healthy Churn: Most changed lines are kept. ")
+
+    return score, explanations
+
+
+# score_inputs 的列：每个仓库一行，所有仓库的评分只需要这些聚合值
+SCORE_INPUT_COLUMNS = [
+    'commits', 'first_ts', 'last_ts', 'unique_authors', 'authored_commits', 'top_author_commits', 
+    'total_lines', 'recent_additions', 'recent_deletions', 
+]
+
+
+def score_inputs(df):
+    """
+    从 commit 明细算出批量评分需要的每仓库聚合值 (pandas 版本；analytics.py 里的引擎用 SQL 算同样的东西)
+
+    :param df: 同 calculate_health_scores
+    :return: 以 repo_name 为索引的 DataFrame，列见 SCORE_INPUT_COLUMNS：
+             first_ts / last_ts 是 epoch 秒；authored_commits 是作者不为空的 commit 数；
+             total_lines 是全部改动行数 (0 表示没有行数统计)；recent_* 是最后一个 commit 往前 CHURN_WINDOW_DAYS 天的合计
+    """
+    if df.empty:
+        return pd.DataFrame(columns=SCORE_INPUT_COLUMNS).rename_axis('repo_name')
+
+    # 用 .array 保留 Categorical，避免退化成 object 数组
+    dates = df['date'].array if 'date' in df.columns else df.index.array
+    frame = pd.DataFrame({
+        'repo_name': df['repo_name'].array, 
+        'author': df['author'].array, 
+        'ts': pd.DatetimeIndex(dates).as_unit('ns').asi8 // 1_000_000_000, 
+    })
+    has_line_columns = 'additions' in df.columns and 'deletions' in df.columns
+    frame['additions'] = df['additions'].to_numpy() if has_line_columns else 0
+    frame['deletions'] = df['deletions'].to_numpy() if has_line_columns else 0
+
+    by_repo = frame.groupby('repo_name', sort=False, observed=True)
+    result = pd.DataFrame({
+        'commits': by_repo.size(), 
+        'first_ts': by_repo['ts'].min(), 
+        'last_ts': by_repo['ts'].max(), 
+    })
+
+    # 每个 (仓库, 作者) 的 commit 数；作者为空的行不参与 (和 value_counts 行为一致)
+    per_author = frame.groupby(['repo_name', 'author'], sort=False, observed=True).size()
+    per_author = per_author[per_author > 0].groupby(level=0, sort=False, observed=True)
+    result['unique_authors'] = per_author.size().reindex(result.index, fill_value=0)
+    result['authored_commits'] = per_author.sum().reindex(result.index, fill_value=0)
+    result['top_author_commits'] = per_author.max().reindex(result.index, fill_value=0)
+
+    lines = by_repo[['additions', 'deletions']].sum()
+    result['total_lines'] = lines['additions'] + lines['deletions']
+    cutoff = by_repo['ts'].transform('max') - CHURN_WINDOW_DAYS * 86400
+    recent = frame[frame['ts'] > cutoff]
+    recent = (recent.groupby('repo_name', sort=False, observed=True)[['additions', 'deletions']]
+              .sum().reindex(result.index, fill_value=0))
+    result['recent_additions'] = recent['additions']
+    result['recent_deletions'] = recent['deletions']
+    return result[SCORE_INPUT_COLUMNS].rename_axis('repo_name')
+
+
+@perf.timed("score.scores_from_inputs")
+def scores_from_inputs(inputs, now=None, truck_factors=None):
+    """
+    由每仓库的聚合值向量化地算出所有仓库的评分 (pandas 路径和 SQL 引擎共用这一份打分规则)
+
+    :param inputs: score_inputs 或 analytics 引擎的 score_inputs 结果
+    :param now: 计算活跃度用的"当前时间"，默认取系统时间
+    :param truck_factors: 同 calculate_health_scores
+    :return: 同 calculate_health_scores
+    """
+    cols = ['score', 'activity_score', 'community_score', 'stability_score', 'churn_penalty', 
+            'commits', 'unique_authors', 'top_contributor_ratio', 'days_since_last', 'project_age_days', 
+            'churn_ratio', 'truck_factor']
+    if inputs.empty:
+        return pd.DataFrame(columns=cols).rename_axis('repo_name')
+
+    first = pd.to_datetime(inputs['first_ts'].to_numpy(dtype='int64'), unit='s', utc=True)
+    last = pd.to_datetime(inputs['last_ts'].to_numpy(dtype='int64'), unit='s', utc=True)
+    if now is None:
+        now = pd.Timestamp.now(tz='UTC')
+
+    days_since_last = (now - last).days.to_numpy()
+    project_age_days = (last - first).days.to_numpy()
+    authors = inputs['unique_authors'].to_numpy(dtype='int64')
+    authored = inputs['authored_commits'].to_numpy(dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(authored > 0, inputs['top_author_commits'].to_numpy(dtype='float64') / authored, 0.0)
+
+    # --- 活跃度评分 ---
+    activity = np.select([days_since_last < 30, days_since_last < 90], [40, 20], default=0)
+
+    # --- 社区评分 (含独裁惩罚) ---
+    community = np.select([authors >= 10, authors >= 3], [30, 15], default=5)
+    tf = np.full(len(inputs), np.nan)
+    if truck_factors is not None:
+        tf = truck_factors.reindex(inputs.index).to_numpy(dtype='float64')
+    has_tf = ~np.isnan(tf)
+    dictator_penalty = np.where((ratio > 0.8) & (authors > 1), 10, 0)
+    tf_penalty = np.where(authors > 1, truck_factor_penalty(tf), 0)
+    community = np.maximum(0, community - np.where(has_tf, tf_penalty, dictator_penalty))
+
+    # --- 稳定性评分 ---
+    stability = np.select([project_age_days > 180, project_age_days > 30], [30, 15], default=0)
+
+    # --- Churn 惩罚：每个仓库最后一个 commit 往前 CHURN_WINDOW_DAYS 天，没有行数统计的仓库不扣分 ---
+    with_stats = inputs['total_lines'].to_numpy(dtype='float64') > 0
+    ratio_all = churn_to_growth(inputs['recent_additions'].to_numpy(), inputs['recent_deletions'].to_numpy())
+    churn_ratio = np.where(with_stats, ratio_all, np.nan)
+    penalty = np.where(with_stats, churn_penalty(ratio_all), 0)
+
+    result = pd.DataFrame({
+        'score': np.maximum(0, activity + community + stability - penalty), 
+        'activity_score': activity, 
+        'community_score': community, 
+        'stability_score': stability, 
+        'churn_penalty': penalty, 
+        'commits': inputs['commits'].to_numpy(dtype='int64'), 
+        'unique_authors': authors, 
+        'top_contributor_ratio': ratio, 
+        'days_since_last': days_since_last, 
+        'project_age_days': project_age_days, 
+        'churn_ratio': churn_ratio, 
+        'truck_factor': tf, 
+    }, index=inputs.index)
+    return result.sort_values('score', ascending=False, kind='stable')
+
+
+@perf.timed("score.calculate_health_scores")
+def calculate_health_scores(df, now=None, truck_factors=None):
+    """
+    批量计算多个仓库的健康度评分 (向量化版本，结果和 calculate_health_score 逐个计算一致)
+
+    所有仓库的 commit 放在同一个 DataFrame 里，一次 groupby 算出各项输入 (score_inputs)，
+    再用 NumPy 一次性算出所有仓库的分项得分 (scores_from_inputs)，没有逐仓库的 Python 分支。
+
+    :param df: 包含 datetime 索引 (或 date 列)、repo_name 列和 author 列的 DataFrame；
+               有 additions / deletions 列时同时计算 churn 惩罚
+    :param now: 计算活跃度用的"当前时间"，默认取系统时间
+    :param truck_factors: Series，repo_name -> 文件级 truck factor (ownership.truck_factors)，
+                          有值的仓库用它代替按 commit 占比估算的独裁惩罚
+    :return: 以 repo_name 为索引、按 score 降序的 DataFrame
+    """
+    return scores_from_inputs(score_inputs(df), now=now, truck_factors=truck_factors)
@@ -0,0 +1,184 @@
+"""
+单仓库快照的导出 / 导入 (Arrow IPC 或 Parquet)
+
+快照是列式文件，author / category / rule_version 用字典编码 (重复值只存一份)，时间是 UTC 时间戳列。
+- .arrow: Arrow IPC 文件，不压缩，可以内存映射打开，冷启动时几乎不拷贝数据
+- .parquet: 压缩后体积更小，适合发给同事
+
+    python snapshot.py export pandas-dev/pandas data/snapshots/pandas.arrow
+    python snapshot.py import data/snapshots/pandas.arrow
+    python snapshot.py info data/snapshots/pandas.parquet
+"""
+import argparse
+import json
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+import perf
+from classifier import CommitClassifier
+from db_manager import DBManager
+
+# 快照格式版本，写在文件的 schema 元数据里
+SNAPSHOT_VERSION = 1
+
+_DICT = pa.dictionary(pa.int32(), pa.string())
+
+SNAPSHOT_SCHEMA = pa.schema([
+    ("sha", pa.string()),
+    ("author", _DICT),
+    ("date", pa.timestamp("ns", tz="UTC")),  # 用 ns，转 pandas 时不需要换算
+    ("message", pa.large_string()),
+    ("additions", pa.int64()),
+    ("deletions", pa.int64()),
+    ("category", _DICT),
+    ("msg_hash", pa.string()),
+    ("rule_version", _DICT),
+])
+
+
+def _is_parquet(path):
+    return str(path).lower().endswith(".parquet")
+
+
+@perf.timed("snapshot.export")
+def export_snapshot(db, repo_name, path, since=None, until=None):
+    """
+    把一个仓库导出成快照文件 (按扩展名选择 Arrow IPC 或 Parquet)
+
+    :param since / until: 只导出这个时间窗口 [since, until)，None 表示全部
+    :return: 导出的 commit 数
+    """
+    cols, rows = db.get_commit_rows(repo_name, since=since, until=until)
+    df = pd.DataFrame.from_records(rows, columns=cols)
+    del rows
+    df['date'] = pd.to_datetime(df.pop('ts').astype('int64'), unit='s', utc=True).astype('datetime64[ns, UTC]')
+    df['additions'] = df['additions'].fillna(0).astype('int64')
+    df['deletions'] = df['deletions'].fillna(0).astype('int64')
+    for column in ('author', 'category', 'rule_version'):
+        df[column] = df[column].astype('category')
+
+    metadata = {
+        "repo_name": repo_name,
+        "snapshot_version": str(SNAPSHOT_VERSION),
+        "exported_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commits": str(len(df)),
+    }
+    table = pa.Table.from_pandas(df[SNAPSHOT_SCHEMA.names], schema=SNAPSHOT_SCHEMA, preserve_index=False)
+    table = table.replace_schema_metadata(metadata)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if _is_parquet(path):
+        pq.write_table(table, path, compression="zstd")
+    else:
+        with pa.OSFile(str(path), "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    print(f"Exported {table.num_rows} commits of {repo_name} to {path}.")
+    return table.num_rows
+
+
+@perf.timed("snapshot.read")
+def read_snapshot(path):
+    """
+    打开快照 (内存映射)，Arrow IPC 文件读出来的列直接指向映射的页，不拷贝
+
+    :return: pyarrow.Table
+    """
+    if _is_parquet(path):
+        table = pq.read_table(path, memory_map=True)
+    else:
+        table = ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+
+    version = int(snapshot_info(table).get("snapshot_version", 0))
+    if version > SNAPSHOT_VERSION:
+        raise ValueError(f"Snapshot format v{version} is newer than supported v{SNAPSHOT_VERSION}: {path}")
+    return table
+
+
+def snapshot_info(table):
+    """:return: 快照元数据字典 (repo_name / snapshot_version / exported_at / commits)"""
+    return {k.decode(): v.decode() for k, v in (table.schema.metadata or {}).items()}
+
+
+def snapshot_frame(table, include_messages=False):
+    """
+    快照 -> 和 DBManager.get_commits_frame 同样格式的 DataFrame
+
+    字典列直接变成 pandas Categorical，时间列已经是 ns 精度；split_blocks 让没有空值的数值列尽量零拷贝。
+    """
+    columns = ['sha', 'author', 'date', 'additions', 'deletions', 'category']
+    if include_messages:
+        columns.append('message')
+    df = table.select(columns).to_pandas(split_blocks=True)
+    return df.set_index('date')
+
+
+@perf.timed("snapshot.import")
+def import_snapshot(db, path, repo_name=None, classifier=None, batch_size=50000):
+    """
+    把快照批量写回数据库 (走 save_commits：临时表 + executemany，同时维护汇总表)
+
+    已存在的 commit 会被忽略，所以重复导入是安全的。
+
+    :param repo_name: 导入成哪个仓库名，默认用快照里记录的名字
+    :param classifier: 给了的话，快照里按其他规则版本打的标签会按当前规则重新分类
+    :return: 新写入的 commit 数
+    """
+    table = read_snapshot(path)
+    repo_name = repo_name or snapshot_info(table).get("repo_name")
+    if not repo_name:
+        raise ValueError(f"Snapshot has no repo_name metadata, pass repo_name explicitly: {path}")
+
+    saved = 0
+    for batch in table.to_batches(max_chunksize=batch_size):
+        df = batch.to_pandas()
+        df['date'] = df['date'].dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+        for column in ('author', 'category', 'rule_version'):
+            df[column] = df[column].astype(object).where(df[column].notna(), None)
+        saved += db.save_commits(repo_name, df.to_dict('records'))
+    if classifier is not None and db.needs_reclassification(repo_name, classifier.rule_version):
+        db.reclassify(classifier, repo_name)
+    print(f"Imported {saved} new commits of {repo_name} from {path}.")
+    return saved
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export / import per-repository snapshots (Arrow IPC or Parquet)")
+    parser.add_argument("--db", default="data/project_data.db", help="SQLite 数据库路径")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export", help="导出一个仓库")
+    p_export.add_argument("repo")
+    p_export.add_argument("path", help=".arrow (可内存映射) 或 .parquet (压缩)")
+    p_export.add_argument("--since", help="只导出这个时间之后的 commit (ISO 日期)")
+    p_export.add_argument("--until", help="只导出这个时间之前的 commit (ISO 日期)")
+
+    p_import = sub.add_parser("import", help="把快照导入数据库")
+    p_import.add_argument("path")
+    p_import.add_argument("--repo", help="导入成这个仓库名 (默认用快照里的名字)")
+
+    p_info = sub.add_parser("info", help="查看快照元数据")
+    p_info.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        table = read_snapshot(args.path)
+        print(json.dumps({**snapshot_info(table), "rows": table.num_rows}, indent=2))
+        return
+
+    db = DBManager(args.db)
+    try:
+        if args.command == "export":
+            export_snapshot(db, args.repo, args.path, since=args.since, until=args.until)
+        else:
+            import_snapshot(db, args.path, repo_name=args.repo, classifier=CommitClassifier())
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
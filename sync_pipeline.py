@@ -0,0 +1,234 @@
+"""
+流式的 抓取 → 分类 → 入库 流水线
+
+数据源 (GitHubLoader / GitHubGraphQLLoader 的 iter_commit_batches) 一页一页地产出清洗后的 commit，
+这里边收边分类，攒够 batch_size 条就写一次 SQLite。任何时刻内存里最多只有一个批次，
+所以再长的历史也不会把内存撑爆；中途出错时，已经写入的批次也都保留在数据库里。
+
+API 同步由 ResumableSync 完成，每写完一页就把翻页游标存进 sync_state 表，
+中断 (网络错误、配额耗尽、进程被杀) 之后下次从断点继续，而不是从头再来。
+"""
+import logging
+import time
+
+import perf
+from git_loader import LocalGitLoader
+
+# 库代码不直接 print：进度走 progress 回调，状态信息走日志，由入口 (CLI / Dashboard) 决定要不要显示
+logger = logging.getLogger(__name__)
+
+
+@perf.timed("sync.ingest_commits")
+def ingest_commits(batches, db, classifier, repo_name, batch_size=500, progress=None):
+    """
+    消费数据源产出的批次，分类后分批写入数据库
+
+    :param batches: 可迭代对象，每个元素是一页清洗后的 commit 字典列表
+    :param db: DBManager
+    :param classifier: CommitClassifier
+    :param repo_name: 仓库名
+    :param batch_size: 每次写库的条数
+    :param progress: 回调 progress(fetched, saved)，每处理完一页调用一次
+    :return: 新写入的 commit 数
+    """
+    buffer = []
+    fetched = 0
+    saved = 0
+
+    for page in batches:
+        # 整页批量分类 (先查持久化的分类缓存，只对没见过的 message 跑分类器)
+        db.classify_commits(page, classifier)
+        buffer.extend(page)
+        fetched += len(page)
+
+        if len(buffer) >= batch_size:
+            saved += db.save_commits(repo_name, buffer)
+            buffer = []
+
+        if progress:
+            progress(fetched, saved)
+
+    if buffer:
+        saved += db.save_commits(repo_name, buffer)
+        if progress:
+            progress(fetched, saved)
+
+    return saved
+
+
+class ResumableSync:
+    """
+    可断点续传的 API 同步
+
+    本地数据是一段连续的历史 [oldest, newest]，同步分两步，每步都按页保存进度：
+
+    1. 增量：从最新的 commit 往回翻，遇到已经存过的 newest_sha 就停，通常只要一页。
+       本轮的 until 固定在开始时刻，中断后带同样的 until 和游标续传，页码不会因为新推送而错位；
+       整轮完成后才把 newest 推进到本轮见到的最新 commit，保证区间里没有缺口。
+    2. 回填：从 oldest 继续往更老的历史翻，直到历史的开头。可以用 max_pages 限制每次运行的页数，
+       分多次完成 (大仓库第一次同步不必一口气拉完)。GitHub 的 until 按提交时间过滤，
+       所以 oldest_date 记的是最老 commit 的提交时间 (committed_date)，不是作者时间。
+
+    游标都是在对应的页写入数据库之后才保存的，最坏情况下续传时重复抓一页，重复的 commit 会被忽略。
+    """
+
+    def __init__(self, db, classifier, repo_name, loader, progress=None):
+        """
+        :param loader: GitHubLoader 或 GitHubGraphQLLoader (需要 iter_resumable_batches)
+        :param progress: 回调 progress(fetched, saved)，每处理完一页调用一次
+        """
+        self.db = db
+        self.classifier = classifier
+        self.repo_name = repo_name
+        self.loader = loader
+        self.progress = progress
+        self.fetched = 0
+        self.saved = 0
+        self.state = db.get_sync_state(repo_name) or self._initial_state()
+
+    def _initial_state(self):
+        """没有同步记录时：库里已有的数据 (旧版本同步的) 当作一段连续区间，否则从零开始"""
+        state = {field: None for field in self.db.SYNC_STATE_FIELDS}
+        state['backfill_complete'] = 0
+        newest_sha = self.db.get_latest_commit_sha(self.repo_name)
+        if newest_sha:
+            # 库里只有作者时间，不知道最老 commit 的提交时间：oldest_date 留空，回填从现在往回翻一遍
+            # (已存过的 commit 会被忽略)，用作者时间当 until 可能漏掉 rebase 过的 commit
+            state.update(
+                newest_sha=newest_sha, newest_date=self.db.get_latest_commit_date(self.repo_name), 
+                oldest_sha=self.db.get_oldest_commit(self.repo_name)[0], 
+            )
+        return state
+
+    def _update(self, **fields):
+        self.state.update(fields)
+        self.db.update_sync_state(self.repo_name, **fields)
+
+    def _ingest(self, batch):
+        if batch:
+            self.db.classify_commits(batch, self.classifier)
+            self.saved += self.db.save_commits(self.repo_name, batch)
+            self.fetched += len(batch)
+        perf.incr("sync.pages")
+        if self.progress:
+            self.progress(self.fetched, self.saved)
+
+    def run(self, backfill_pages=None):
+        """
+        :param backfill_pages: 本次回填最多抓多少页，None 表示一直到历史开头
+        :return: 新写入的 commit 数
+        """
+        state = self.state
+        fields = {k: state[k] for k in self.db.SYNC_STATE_FIELDS}
+        self._update(**{**fields, 'status': "running", 'error': None})
+        try:
+            if state['newest_sha']:
+                self._incremental()
+            if not state['backfill_complete']:
+                self._backfill(backfill_pages)
+        except BaseException as e:
+            # 游标已经保存在最后一个写入成功的页上，下次从这里继续
+            self._update(status="interrupted", error=str(e) or type(e).__name__)
+            raise
+
+        self._update(status="complete" if state['backfill_complete'] else "partial")
+        return self.saved
+
+    def _incremental(self):
+        state = self.state
+        if state['inc_until'] is None:
+            # 新的一轮：把结果集固定在现在，之后推送的 commit 留给下一轮
+            self._update(inc_until=_utc_now(), inc_cursor=None, inc_top_sha=None, inc_top_date=None)
+
+        stop_sha = state['newest_sha']
+        batches = self.loader.iter_resumable_batches(
+            self.repo_name, cursor=state['inc_cursor'], until_date=state['inc_until']
+        )
+        for batch, next_cursor in batches:
+            if batch and state['inc_top_sha'] is None:
+                self._update(inc_top_sha=batch[0]['sha'], inc_top_date=batch[0]['date'])
+
+            shas = [c['sha'] for c in batch]
+            reached = stop_sha in shas
+            if reached:
+                batch = batch[:shas.index(stop_sha)]
+            self._ingest(batch)
+
+            if reached or next_cursor is None:
+                break
+            self._update(inc_cursor=next_cursor)
+
+        # 遇到了已存过的 commit (或者翻到了底)：本轮完成，区间上端推进到本轮见到的最新 commit
+        self._update(
+            newest_sha=state['inc_top_sha'] or state['newest_sha'], 
+            newest_date=state['inc_top_date'] or state['newest_date'], 
+            inc_cursor=None, inc_until=None, inc_top_sha=None, inc_top_date=None, 
+        )
+
+    def _backfill(self, max_pages=None):
+        state = self.state
+        if state['backfill_until'] is None:
+            # 新的回填：从 oldest 的提交时间往前 (GitHub 的 until 包含边界，边界上的 commit 会被忽略)，
+            # 空仓库或者不知道 oldest 提交时间的旧数据从现在开始
+            self._update(backfill_until=state['oldest_date'] or _utc_now(), backfill_cursor=None)
+
+        pages = 0
+        complete = True
+        batches = self.loader.iter_resumable_batches(
+            self.repo_name, cursor=state['backfill_cursor'], until_date=state['backfill_until'], 
+            max_pages=max_pages, parallel=True, 
+        )
+        for batch, next_cursor in batches:
+            self._ingest(batch)
+            pages += 1
+            fields = {'backfill_cursor': next_cursor}
+            if batch:
+                if state['newest_sha'] is None:
+                    # 第一次同步：第一页的第一条就是区间上端
+                    fields.update(newest_sha=batch[0]['sha'], newest_date=batch[0]['date'])
+                fields.update(oldest_sha=batch[-1]['sha'], oldest_date=batch[-1]['committed_date'])
+            self._update(**fields)
+            complete = next_cursor is None
+            if complete or pages == max_pages:
+                break
+
+        if complete:
+            self._update(backfill_complete=1, backfill_cursor=None, backfill_until=None)
+        logger.info("Backfill of %s: %d pages, %s.", self.repo_name, pages,
+                    "complete" if complete else f"paused at {state['oldest_date']}")
+        return complete
+
+
+def _utc_now():
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+@perf.timed("sync.sync_repo")
+def sync_repo(db, classifier, repo_name, loader=None, local_path=None, progress=None, backfill_pages=None):
+    """
+    增量同步一个仓库：API 数据源走 ResumableSync (可断点续传)，本地 clone 从上次的最新 commit 往后读，
+    入库后必要时增量重分类
+
+    Dashboard 的 Analyze 按钮和后台同步服务 (sync_service.py) 共用这一个入口。
+
+    :param loader: GitHubLoader 或 GitHubGraphQLLoader (local_path 为空时使用)
+    :param local_path: 本地 clone 路径，给了 (不是 None) 就用 git log 读取，不走 API；
+                       路径为空或者不是 git 仓库时抛 GitRepoError，不会退回 API；
+                       上次存的最新 commit 不在这个 clone 里时读全部历史 (见 LocalGitLoader.iter_commits)
+    :param backfill_pages: API 同步时本次回填历史最多抓多少页，None 表示全部
+    :return: 新写入的 commit 数
+    """
+    if local_path is not None:
+        git_loader = LocalGitLoader(local_path)
+        git_loader.check()
+        # 本地仓库按 SHA 增量，从上次存过的最新 commit 往后读
+        batches = git_loader.iter_commit_batches(repo_name, since_sha=db.get_latest_commit_sha(repo_name))
+        added = ingest_commits(batches, db, classifier, repo_name, progress=progress)
+    else:
+        added = ResumableSync(db, classifier, repo_name, loader, progress=progress).run(backfill_pages)
+
+    # 分类规则改过的话，只对新规则下没见过的 message 增量重分类
+    if db.needs_reclassification(repo_name, classifier.rule_version):
+        db.reclassify(classifier, repo_name)
+
+    return added
@@ -0,0 +1,157 @@
+"""
+后台同步服务 (无界面)
+
+按固定间隔刷新一组仓库，写入和 Dashboard 相同的 SQLite 数据库。Dashboard 只需要读本地数据，
+打开即用；数据由这个进程保持新鲜。所有仓库共用一个 RequestScheduler，也就共用同一份 API 配额。
+
+    python sync_service.py --repos pandas-dev/pandas numpy/numpy --interval 3600
+    python sync_service.py --repos-file repos.txt --workers 4 --once
+
+仓库列表文件每行一个仓库，`#` 开头为注释；`owner/name=/path/to/clone` 表示从本地 clone 读取。
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+import tomllib
+from concurrent.futures import ThreadPoolExecutor
+
+from classifier import CommitClassifier
+from db_manager import DBManager
+from github_loader import GitHubLoader, GitHubGraphQLLoader
+from sync_pipeline import sync_repo
+
+# SyncService 的状态信息走日志 (main 里配置成输出到终端)，嵌在别的进程里时由调用方决定怎么处理
+logger = logging.getLogger(__name__)
+
+
+def parse_repo_specs(specs):
+    """['owner/name', 'owner/name=/path'] -> [(repo_name, local_path 或 None)]"""
+    repos = []
+    for spec in specs:
+        spec = spec.strip()
+        if not spec or spec.startswith("#"):
+            continue
+        name, _, path = spec.partition("=")
+        repos.append((name.strip(), path.strip() or None))
+    return repos
+
+
+def load_token(cli_token=None):
+    """Token 优先级：命令行 > 环境变量 GITHUB_TOKEN > .streamlit/secrets.toml (和 Dashboard 共用)"""
+    if cli_token:
+        return cli_token
+    if os.environ.get("GITHUB_TOKEN"):
+        return os.environ["GITHUB_TOKEN"]
+    secrets_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".streamlit", "secrets.toml")
+    if os.path.exists(secrets_path):
+        with open(secrets_path, "rb") as f:
+            return tomllib.load(f).get("GITHUB_TOKEN")
+    return None
+
+
+class SyncService:
+    def __init__(self, repos, db, loader, classifier=None, interval=3600, workers=4, backfill_pages=None):
+        """
+        :param repos: [(repo_name, local_path 或 None)]
+        :param db: DBManager
+        :param loader: 所有 API 仓库共用的 loader (共享调度器和配额)
+        :param interval: 两轮同步之间的间隔 (秒)
+        :param workers: 同时同步的仓库数
+        :param backfill_pages: 每轮每个仓库回填历史最多抓多少页 (大仓库的历史分多轮拉完)，None 表示不限
+        """
+        self.repos = repos
+        self.db = db
+        self.loader = loader
+        self.classifier = classifier or CommitClassifier()
+        self.interval = interval
+        self.workers = workers
+        self.backfill_pages = backfill_pages
+        self.stop_event = threading.Event()
+
+    def sync_one(self, repo_name, local_path=None):
+        """同步单个仓库并记录状态，异常不会向外抛，避免一个仓库拖垮整轮"""
+        self.db.record_sync_status(repo_name, "running")
+        start = time.perf_counter()
+        try:
+            added = sync_repo(
+                self.db, self.classifier, repo_name, loader=self.loader, local_path=local_path, 
+                backfill_pages=self.backfill_pages, 
+            )
+        except Exception as e:
+            duration = time.perf_counter() - start
+            logger.error("[sync] %s: FAILED after %.1fs - %s", repo_name, duration, e)
+            self.db.record_sync_status(repo_name, "error", duration=duration, error=str(e))
+            return False
+
+        duration = time.perf_counter() - start
+        logger.info("[sync] %s: +%d commits in %.1fs", repo_name, added, duration)
+        self.db.record_sync_status(repo_name, "ok", commits_added=added, duration=duration)
+        return True
+
+    def run_once(self):
+        """并发刷新所有仓库一轮，:return: 成功的仓库数"""
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(lambda r: self.sync_one(*r), self.repos))
+        return sum(results)
+
+    def run_forever(self):
+        """按间隔循环同步，直到 stop() 被调用 (或 Ctrl+C)"""
+        while not self.stop_event.is_set():
+            start = time.monotonic()
+            ok = self.run_once()
+            logger.info("[sync] Round finished: %d/%d repos OK.", ok, len(self.repos))
+            # 间隔从本轮开始算，本轮耗时超过间隔时立即开始下一轮
+            self.stop_event.wait(max(0.0, self.interval - (time.monotonic() - start)))
+
+    def stop(self):
+        self.stop_event.set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless background sync for Project Activity Dashboard")
+    parser.add_argument("--repos", nargs="*", default=[], help="owner/name 或 owner/name=/path/to/clone")
+    parser.add_argument("--repos-file", help="仓库列表文件，每行一个")
+    parser.add_argument("--interval", type=float, default=3600, help="两轮同步的间隔 (秒)")
+    parser.add_argument("--workers", type=int, default=4, help="同时同步的仓库数")
+    parser.add_argument("--once", action="store_true", help="只同步一轮就退出")
+    parser.add_argument("--db", default="data/project_data.db", help="SQLite 数据库路径")
+    parser.add_argument("--token", help="GitHub Token (默认读环境变量或 .streamlit/secrets.toml)")
+    parser.add_argument("--base-url", help="API 根地址 (测试时指向本地假服务器)")
+    parser.add_argument("--graphql", action="store_true", help="用 GraphQL 拉取 (带行数统计)")
+    parser.add_argument("--backfill-pages", type=int, help="每轮每个仓库回填历史最多抓多少页 (默认不限)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    specs = list(args.repos)
+    if args.repos_file:
+        with open(args.repos_file, encoding="utf-8") as f:
+            specs.extend(f.read().splitlines())
+    repos = parse_repo_specs(specs)
+    if not repos:
+        parser.error("No repositories configured. Use --repos or --repos-file.")
+
+    token = load_token(args.token)
+    loader = GitHubLoader(token, base_url=args.base_url)
+    if args.graphql:
+        graphql_url = f"{args.base_url.rstrip('/')}/graphql" if args.base_url else None
+        loader = GitHubGraphQLLoader(token, graphql_url=graphql_url, scheduler=loader.scheduler)
+
+    service = SyncService(
+        repos, DBManager(args.db), loader, interval=args.interval, workers=args.workers, 
+        backfill_pages=args.backfill_pages, 
+    )
+    print(f"Sync service started: {len(repos)} repos, {args.workers} workers, every {args.interval:.0f}s.")
+    try:
+        if args.once:
+            service.run_once()
+        else:
+            service.run_forever()
+    except KeyboardInterrupt:
+        print("\nStopping sync service...")
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DBManager
+
+
+@pytest.fixture
+def db(tmp_path):
+    """临时目录里的全新数据库 (所有迁移都跑一遍)"""
+    manager = DBManager(str(tmp_path / "data" / "test.db"))
+    yield manager
+    manager.close()
+
+
+def make_commit(sha, message, date="2024-01-01T00:00:00Z", author="alice", **extra):
+    """save_commits 接受的清洗后字典"""
+    return {"sha": sha, "author": author, "date": date, "message": message,
+            "additions": 0, "deletions": 0, "category": "Other", **extra}
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from ai_analyst import AIAnalyst
+from benchmarks.fake_openai import FakeOpenAIServer
+
+
+def item(repo_name, score=80):
+    return {"repo_name": repo_name, "health_score": score, "bus_factor_risk": False,
+            "intent_dist": {"Feature": 3, "Bugfix": 1}, "activity_trend": "Stable"}
+
+
+@pytest.fixture
+def server():
+    with FakeOpenAIServer(latency=0.05) as server:
+        yield server
+
+
+def test_batches_call_api_once_per_repo(server, db):
+    analyst = AIAnalyst("dummy", db=db, base_url=server.url)
+
+    # 每次点击都是一个新的事件循环 (asyncio.run)，和 app.py 一样
+    first = asyncio.run(analyst.generate_reports_batch([item("a/x"), item("b/y"), item("a/x"), item("c/z")]))
+    assert server.request_count == 3
+    assert first[0] == first[2] and len(set(first)) == 3
+    assert all(isinstance(report, str) and "stub report" in report for report in first)
+
+    second = asyncio.run(analyst.generate_reports_batch([item("d/w"), item("e/v"), item("a/x", score=50)]))
+    assert server.request_count == 6
+    assert all(isinstance(report, str) for report in second)
+
+    # 第三批全部命中持久化缓存
+    assert asyncio.run(analyst.generate_reports_batch([item("b/y"), item("d/w")])) == [first[1], second[0]]
+    assert server.request_count == 6
+
+
+def test_batch_respects_concurrency(server):
+    analyst = AIAnalyst("dummy", base_url=server.url)
+    reports = asyncio.run(analyst.generate_reports_batch([item(f"r/{i}") for i in range(6)], concurrency=2))
+    assert len(set(reports)) == 6
+    assert server.request_count == 6
+    assert server.max_active <= 2
+
+
+def test_get_report_is_cached(server, db):
+    analyst = AIAnalyst("dummy", db=db, base_url=server.url)
+    args = ("a/x", 80, False, {"Feature": 3}, "Stable")
+    chunks = []
+    report = analyst.get_report(*args, on_chunk=chunks.append)
+    assert chunks[-1] == report
+    assert analyst.get_cached_report(*args) == report
+    assert analyst.get_report(*args) == report
+    assert server.request_count == 1
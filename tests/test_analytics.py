@@ -0,0 +1,97 @@
+import pandas as pd
+import pytest
+
+from analytics import DuckDBAnalytics, SQLiteAnalytics, open_analytics
+from conftest import make_commit
+
+duckdb = pytest.importorskip("duckdb")
+snapshot = pytest.importorskip("snapshot")
+
+REPOS = ["acme/rocket", "acme/tiny"]
+NOW = pd.Timestamp("2024-06-01", tz="UTC")
+CATEGORIES = ["Feature", "Bugfix", "Docs", "Other"]
+
+
+def commits_for(repo_index, n):
+    commits = []
+    step = 8760 // n  # 小时：n 个 commit 分散在一年里
+    for i in range(n):
+        # 包括零点附近 (按天归属) 和作者为空的 commit
+        date = pd.Timestamp("2023-06-01", tz="UTC") + pd.Timedelta(hours=step * i + 23 * repo_index, seconds=i % 7)
+        author = None if i % 17 == 0 else f"dev{(i * (repo_index + 1)) % 6}"
+        commits.append(make_commit(
+            f"r{repo_index}-{i}", f"change {i}", date=date.strftime("%Y-%m-%dT%H:%M:%SZ"), author=author,
+            additions=(i * 37) % 200, deletions=(i * 11) % 90, category=CATEGORIES[i % len(CATEGORIES)],
+        ))
+    return commits
+
+
+@pytest.fixture
+def engines(db, tmp_path):
+    db.save_commits(REPOS[0], commits_for(0, 150))
+    db.save_commits(REPOS[1], commits_for(1, 12))
+    # 一个 Parquet，一个 Arrow IPC：两种快照格式都要覆盖
+    paths = [str(tmp_path / "rocket.parquet"), str(tmp_path / "tiny.arrow")]
+    for repo_name, path in zip(REPOS, paths):
+        snapshot.export_snapshot(db, repo_name, path)
+    duck = DuckDBAnalytics.from_snapshots(paths)
+    yield SQLiteAnalytics(db), duck
+    duck.close()
+
+
+def queries(repo_name, **window):
+    return {
+        "daily_counts": lambda e: e.get_daily_counts(repo_name, **window),
+        "weekly_counts": lambda e: e.get_weekly_counts(repo_name, **window),
+        "weekday_counts": lambda e: e.get_weekday_counts(repo_name, **window),
+        "author_counts": lambda e: e.get_author_counts(repo_name, **window),
+        "top_authors": lambda e: e.get_author_counts(repo_name, limit=3, **window),
+        "category_counts": lambda e: e.get_category_counts(repo_name, **window),
+        "score_inputs": lambda e: e.get_score_inputs(**window),
+        "repo_score_inputs": lambda e: e.get_score_inputs(repo_name, **window),
+        "health_scores": lambda e: e.get_health_scores(now=NOW, **window),
+    }
+
+
+def assert_same(a, b):
+    (pd.testing.assert_frame_equal if isinstance(a, pd.DataFrame) else pd.testing.assert_series_equal)(a, b)
+
+
+@pytest.mark.parametrize("window", [
+    {},
+    {"since": "2023-09-01"},
+    {"since": pd.Timestamp("2023-08-15 13:00", tz="UTC"), "until": pd.Timestamp("2024-01-10 06:30", tz="UTC")},
+])
+@pytest.mark.parametrize("repo_name", REPOS)
+def test_duckdb_snapshots_match_sqlite(engines, repo_name, window):
+    sqlite_engine, duck = engines
+    for name, query in queries(repo_name, **window).items():
+        expected = query(sqlite_engine)
+        assert len(expected), name
+        try:
+            assert_same(query(duck), expected)
+        except AssertionError as e:
+            raise AssertionError(f"{name}: {e}") from e
+
+
+def test_missing_repo_is_empty_in_both(engines):
+    sqlite_engine, duck = engines
+    for engine in engines:
+        assert engine.get_daily_counts("no/such-repo").empty
+        assert engine.get_score_inputs("no/such-repo").empty
+    assert_same(duck.get_weekday_counts("no/such-repo"), sqlite_engine.get_weekday_counts("no/such-repo"))
+
+
+def test_from_sqlite_attaches_database(db):
+    db.save_commits(REPOS[0], commits_for(0, 40))
+    try:
+        duck = open_analytics("duckdb", db=db)
+    except RuntimeError as e:
+        # sqlite 扩展第一次使用时要联网下载
+        pytest.skip(f"DuckDB sqlite extension unavailable: {e}")
+    try:
+        sqlite_engine = SQLiteAnalytics(db)
+        for name, query in queries(REPOS[0]).items():
+            assert_same(query(duck), query(sqlite_engine))
+    finally:
+        duck.close()
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from churn import (CHURN_MIN_NET_SHARE, CHURN_RATIO_ELEVATED, CHURN_RATIO_HIGH, churn_penalty, churn_to_growth,
+                   rolling_churn, window_churn_ratio)
+from score_calculator import calculate_health_score, calculate_health_scores
+
+
+@pytest.mark.parametrize("additions, deletions, ratio, penalty", [
+    (0, 0, 0.0, 0),          # 没有改动
+    (1000, 0, 1.0, 0),       # 只加不删
+    (1000, 200, 1.5, 0),
+    (1000, 500, 3.0, 0),     # 正好在阈值上不扣
+    (1000, 600, 4.0, 5),
+    (1000, 800, 9.0, 5),
+    (1000, 850, 12.33, 10),
+    (0, 500, 1.0, 0),        # 纯删除 (清理旧代码) 不扣分
+    (100, 1000, 1.22, 0),    # 净减少为主
+    (600, 1000, 4.0, 5),     # 净减少，但大部分改动是原地重写
+    (1000, 1000, 1 / CHURN_MIN_NET_SHARE, 10),  # 加删完全抵消：封顶，仍是最高一档
+    (1000, 1001, 1 / CHURN_MIN_NET_SHARE, 10),
+])
+def test_penalty_curve(additions, deletions, ratio, penalty):
+    value = float(churn_to_growth(additions, deletions))
+    assert value == pytest.approx(ratio, abs=0.01)
+    assert int(churn_penalty(value)) == penalty
+
+
+def test_ratio_is_finite_and_symmetric():
+    additions = np.arange(0, 2001, 50)
+    deletions = additions[::-1]
+    ratios = churn_to_growth(additions, deletions)
+    assert np.isfinite(ratios).all()
+    assert ratios.max() == pytest.approx(1 / CHURN_MIN_NET_SHARE)
+    # 增长和收缩同样的净行数，比值一样
+    np.testing.assert_allclose(ratios, churn_to_growth(deletions, additions))
+
+
+def test_penalty_is_monotonic_in_rewrite_share():
+    # 净增长固定为 100 行，原地重写的行越多，扣分只增不减
+    rewritten = np.arange(0, 2000, 10)
+    penalties = churn_penalty(churn_to_growth(100 + rewritten, rewritten))
+    assert (np.diff(penalties) >= 0).all()
+    assert penalties[0] == 0 and penalties[-1] == 10
+    assert set(penalties) == {0, 5, 10}
+    assert CHURN_RATIO_ELEVATED < CHURN_RATIO_HIGH
+
+
+def frame(additions, deletions, authors=("a", "b", "c")):
+    n = len(additions)
+    index = pd.date_range(end="2024-06-01", periods=n, freq="D", tz="UTC", name="date")
+    return pd.DataFrame({"repo_name": "x/y", "author": [authors[i % len(authors)] for i in range(n)],
+                         "additions": additions, "deletions": deletions}, index=index)
+
+
+def test_cleanup_window_is_not_penalized():
+    now = pd.Timestamp("2024-06-02", tz="UTC")
+    cleanup = frame([10, 0, 5, 20], [800, 400, 600, 30])
+    assert window_churn_ratio(cleanup) < CHURN_RATIO_ELEVATED
+    baseline, _ = calculate_health_score(frame([1, 0, 0, 0], [0, 0, 0, 0]), now=now)
+    score, explanations = calculate_health_score(cleanup, now=now)
+    assert score == baseline
+    assert not any("High Churn" in e for e in explanations)
+    assert calculate_health_scores(cleanup, now=now).loc["x/y", "churn_penalty"] == 0
+
+    # 在原地来回改：仍然扣满
+    thrash = frame([500, 500, 500, 500], [500, 480, 520, 500])
+    score, explanations = calculate_health_score(thrash, now=now)
+    assert score == baseline - 10
+    assert calculate_health_scores(thrash, now=now).loc["x/y", "churn_penalty"] == 10
+
+
+def test_rolling_ratio_has_no_infinities():
+    rolled = rolling_churn(frame([0, 100, 0, 0, 300], [50, 0, 100, 0, 300]), window=2)
+    assert np.isfinite(rolled["churn_to_growth"]).all()
+    assert rolled["churn_to_growth"].iloc[0] == 1.0
@@ -0,0 +1,112 @@
+import random
+
+import pandas as pd
+import pytest
+
+from classifier import CommitClassifier
+from conftest import make_commit
+
+EDGE_CASES = [
+    "feat: login page", " FEAT : y", "\x1cfix　: spaces", "feature(ui): x", "bugfix: x", ":fix", "fix",
+    "Merge pull request #12 from user/branch", "prefix the cache", "fix_me later", "a-fix", "x\nfix", "",
+    "İssue with upper dotted I", "ΑΣ: greek", "ǅfix", "①fix", "éfix", "\U00011f02fix", "docs​fix", "WIP",
+]
+
+
+def random_messages(n, seed=0):
+    """随机拼出来的 message：关键词、单词边界、Unicode 字符和前缀的各种组合"""
+    rng = random.Random(seed)
+    pieces = ["fix", "Feat", "docs", "prefix", "address", "cd", "ci", "bump", "test", "readme", "misc",
+              "cache", "login", "É", "İ", "_", "-", ":", " ", "\n", "　", "中文", "①", "2"]
+    return [
+        "".join(rng.choice(pieces) for _ in range(rng.randint(0, 8))) + rng.choice(["", ": x", " #1"])
+        for _ in range(n)
+    ]
+
+
+@pytest.mark.parametrize("word_boundaries", [False, True])
+def test_classify_many_matches_classify(word_boundaries):
+    clf = CommitClassifier(word_boundaries=word_boundaries)
+    messages = EDGE_CASES + random_messages(5000)
+    assert clf.classify_many(messages) == [clf.classify(m) for m in messages]
+
+
+def test_classify_priority_and_prefix():
+    clf = CommitClassifier()
+    assert clf.classify("docs: fix typo") == "Docs"
+    # 同时命中多个分类时取优先级高的，和关键词出现的位置无关
+    assert clf.classify("update readme and fix crash") == "Bugfix"
+    assert clf.classify("cdocs") == "Docs"
+    assert clf.classify("Merge branch 'main'") == "Other"
+    assert CommitClassifier(word_boundaries=True).classify("prefix the cache") == "Other"
+
+
+def test_classify_many_series_and_duplicates():
+    clf = CommitClassifier()
+    series = pd.Series(["fix: a", None, "bump deps", "fix: a"], index=[5, 6, 7, 8], name="message")
+    result = clf.classify_many(series)
+    assert result.tolist() == ["Bugfix", "Other", "Build", "Bugfix"]
+    assert result.index.tolist() == [5, 6, 7, 8] and result.name == "message"
+    assert clf.classify_many([]) == []
+
+
+def test_recompile_after_rule_change():
+    clf = CommitClassifier()
+    version = clf.rule_version
+    clf.rules = {"Security": ["cve", "vuln"], **clf.rules}
+    clf.compile()
+    assert clf.rule_version != version
+    assert clf.classify_many(["fix CVE-2021-44228", "security: x", "fix crash"]) == ["Security", "Security", "Bugfix"]
+
+
+class CountingClassifier(CommitClassifier):
+    """记录交给 classify_many 的 message"""
+
+    def __init__(self):
+        super().__init__()
+        self.seen = []
+
+    def classify_many(self, messages):
+        self.seen.extend(messages)
+        return super().classify_many(messages)
+
+
+def test_classification_cache_skips_seen_messages(db):
+    commits = [make_commit(f"c{i}", ["bump deps", "fix: crash", "Merge branch 'main'"][i % 3]) for i in range(30)]
+    classifier = CountingClassifier()
+    db.classify_commits(commits, classifier)
+    # 重复的 message 只分类一次
+    assert sorted(classifier.seen) == ["Merge branch 'main'", "bump deps", "fix: crash"]
+    assert {c["rule_version"] for c in commits} == {classifier.rule_version}
+    db.save_commits("a/b", commits)
+
+    # 同样的规则 (新的实例，比如重启之后)：全部命中持久化缓存
+    again = CountingClassifier()
+    more = [make_commit(f"d{i}", "fix: crash") for i in range(5)]
+    db.classify_commits(more, again)
+    assert again.seen == []
+    assert {c["category"] for c in more} == {"Bugfix"}
+    assert not db.needs_reclassification("a/b", again.rule_version)
+
+
+def test_rule_change_reclassifies_only_new_distinct_messages(db):
+    messages = ["bump deps", "fix crash", "security: patch"] * 10
+    commits = [make_commit(f"c{i}", m) for i, m in enumerate(messages)]
+    db.classify_commits(commits, CommitClassifier())
+    db.save_commits("a/b", commits)
+
+    changed = CountingClassifier()
+    changed.rules = {"Security": ["security", "cve"], **changed.rules}
+    changed.compile()
+    assert db.needs_reclassification("a/b", changed.rule_version)
+    assert db.reclassify(changed, "a/b") == 30
+    assert sorted(changed.seen) == sorted(set(messages))
+    assert not db.needs_reclassification("a/b", changed.rule_version)
+    assert db.get_category_counts("a/b").to_dict() == {"Bugfix": 10, "Build": 10, "Security": 10}
+
+    # 改回原来的规则：旧版本的标签还在缓存里，不需要再跑分类器
+    original = CountingClassifier()
+    assert db.reclassify(original, "a/b") == 30
+    assert original.seen == []
+    assert db.get_category_counts("a/b")["Bugfix"] == 20
+    assert db.reclassify(original, "a/b") == 0
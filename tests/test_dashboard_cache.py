@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+
+import dashboard_cache
+from analytics import SQLiteAnalytics
+from conftest import make_commit
+
+REPO = "test/cache"
+
+
+@pytest.fixture
+def cache_db(db):
+    now = pd.Timestamp.now(tz="UTC").floor("s")
+    db.save_commits(REPO, [
+        make_commit(f"c{i}", "fix: x", date=(now - pd.Timedelta(days=i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    author=f"dev{i % 3}")
+        for i in range(60)
+    ])
+    dashboard_cache._build_repo_view.clear()
+    dashboard_cache._build_portfolio_ranking.clear()
+    return db
+
+
+def test_views_are_cached_per_data_version_and_day(cache_db, monkeypatch):
+    analytics = SQLiteAnalytics(cache_db)
+    view = dashboard_cache.load_repo_view(cache_db, REPO, "v1", analytics=analytics)
+    ranking = dashboard_cache.load_portfolio_ranking(cache_db, analytics=analytics)
+    assert dashboard_cache.load_repo_view(cache_db, REPO, "v1", analytics=analytics) is view
+    assert dashboard_cache.load_portfolio_ranking(cache_db, analytics=analytics) is ranking
+
+    # 没有新 commit，但过了一年：活跃度相关的分数要重算，而不是一直用旧的缓存
+    later = pd.Timestamp.now(tz="UTC") + pd.Timedelta(days=365)
+    monkeypatch.setattr(dashboard_cache, "_utc_today", lambda: later.strftime("%Y-%m-%d"))
+    monkeypatch.setattr(pd.Timestamp, "now", classmethod(lambda cls, tz=None: later))
+    stale = dashboard_cache.load_repo_view(cache_db, REPO, "v1", analytics=analytics)
+    assert stale is not view
+    assert stale["score"] < view["score"]
+    assert dashboard_cache.load_portfolio_ranking(cache_db, analytics=analytics) is not ranking
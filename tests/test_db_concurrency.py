@@ -0,0 +1,172 @@
+import threading
+import time
+
+import pytest
+
+import perf
+from conftest import make_commit
+from db_manager import DBManager
+
+REPO = "test/concurrency"
+
+# 写线程里直接执行的原始方法 (绕过 @_writer 的排队)
+save_commits_job = DBManager.save_commits.__wrapped__
+
+
+def batch(prefix, n, day=1):
+    return [make_commit(f"{prefix}{i:05d}", f"fix: {prefix} {i}", date=f"2024-01-{day:02d}T{i % 24:02d}:00:00Z",
+                        author=f"dev{i % 3}") for i in range(n)]
+
+
+def count_rows(db):
+    return len(db.get_commits_frame(REPO))
+
+
+@pytest.fixture
+def perf_enabled():
+    was_enabled = perf.is_enabled()
+    perf.reset()
+    perf.enable()
+    yield
+    perf.enable(was_enabled)
+    perf.reset()
+
+
+def block_writer(db):
+    """让写线程停在一个写操作里，直到返回的 Event 被 set；:return: (gate, 这个写操作的 Future)"""
+    started, gate = threading.Event(), threading.Event()
+
+    def job(self):
+        started.set()
+        gate.wait(5)
+
+    future = db._submit(job, (), {})
+    assert started.wait(5)
+    return gate, future
+
+
+def test_group_commit_rolls_back_only_the_failing_job(db, perf_enabled):
+    gate, blocker = block_writer(db)
+
+    def failing_job(self):
+        # 先写进一批，再失败：这一批必须整体回滚
+        save_commits_job(self, REPO, batch("bad", 50, day=3))
+        raise RuntimeError("boom")
+
+    # 写线程被挡住时排队的三个操作合并成一个事务
+    good1 = db._submit(save_commits_job, (REPO, batch("a", 40, day=1)), {})
+    bad = db._submit(failing_job, (), {})
+    good2 = db._submit(save_commits_job, (REPO, batch("b", 30, day=2)), {})
+    gate.set()
+
+    blocker.result(timeout=5)
+    assert good1.result(timeout=5) == 40
+    with pytest.raises(RuntimeError, match="boom"):
+        bad.result(timeout=5)
+    assert good2.result(timeout=5) == 30
+
+    counters = perf.snapshot()["counters"]
+    assert counters["db.group_commits"] == 2
+    assert counters["db.write_jobs"] == 4
+
+    frame = db.get_commits_frame(REPO)
+    assert len(frame) == 70
+    assert not frame["sha"].str.startswith("bad").any()
+    # 汇总表也一起回滚了
+    assert db.get_daily_counts(REPO).sum() == 70
+    assert "2024-01-03" not in set(db.get_daily_counts(REPO).index.strftime("%Y-%m-%d"))
+
+    # 后面的写入不受影响
+    assert db.save_commits(REPO, batch("c", 5, day=4)) == 5
+
+
+def test_concurrent_overlapping_writers_lose_and_duplicate_nothing(db):
+    batches = [batch(f"w{i % 5}-", 200, day=1 + i % 5) for i in range(20)]  # 每批写了 4 遍
+    errors = []
+
+    def write(b):
+        try:
+            db.save_commits(REPO, b)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(b,)) for b in batches]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    frame = db.get_commits_frame(REPO)
+    assert len(frame) == 1000
+    assert frame["sha"].is_unique
+    assert db.get_daily_counts(REPO).sum() == 1000
+    assert db.get_author_counts(REPO).sum() == 1000
+
+
+def test_reads_do_not_wait_for_the_writer(db):
+    db.save_commits(REPO, batch("a", 10))
+    gate, blocker = block_writer(db)
+    try:
+        # 写线程正占着写事务 (BEGIN IMMEDIATE 之后)，WAL 下读不用等它
+        start = time.perf_counter()
+        assert count_rows(db) == 10
+        assert time.perf_counter() - start < 1
+    finally:
+        gate.set()
+    blocker.result(timeout=5)
+
+
+def test_reader_pool_under_concurrent_writes(db):
+    total_batches, per_batch = 30, 100
+    stop = threading.Event()
+    errors, seen = [], []
+
+    def writer():
+        try:
+            for i in range(total_batches):
+                db.save_commits(REPO, batch(f"p{i:02d}-", per_batch, day=1 + i % 28))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            stop.set()
+
+    def reader():
+        counts = []
+        try:
+            while not stop.is_set():
+                counts.append(count_rows(db))
+                db.get_author_counts(REPO)
+        except Exception as e:
+            errors.append(e)
+        seen.append(counts)
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    writer_thread = threading.Thread(target=writer)
+    for t in readers:
+        t.start()
+    writer_thread.start()
+    writer_thread.join()
+    for t in readers:
+        t.join()
+
+    assert errors == []
+    # 每个读者看到的都是已提交的完整批次，行数只增不减
+    for counts in seen:
+        assert counts == sorted(counts)
+        assert all(c % per_batch == 0 for c in counts)
+    assert count_rows(db) == total_batches * per_batch
+
+
+def test_close_flushes_queued_writes(tmp_path):
+    path = str(tmp_path / "data" / "flush.db")
+    db = DBManager(path)
+    futures = [db._submit(save_commits_job, (REPO, batch(f"f{i}-", 20)), {}) for i in range(5)]
+    db.close()
+    assert [f.result(timeout=0) for f in futures] == [20] * 5
+
+    db = DBManager(path)
+    try:
+        assert count_rows(db) == 100
+    finally:
+        db.close()
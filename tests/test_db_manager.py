@@ -0,0 +1,120 @@
+import pandas as pd
+
+from classifier import CommitClassifier
+from conftest import make_commit
+
+REPO = "test/db"
+
+
+def sample_commits():
+    return [
+        make_commit("c1", "feat: first", date="2024-01-01T10:00:00Z", author="alice", additions=10, category="Feature"),
+        # 带时区偏移的时间要换算成 UTC
+        make_commit("c2", "fix: second", date="2024-01-02T01:00:00+02:00", author="bob", deletions=3, category="Bugfix"),
+        make_commit("c3", "fix: third", date="2024-01-03T00:00:00Z", author="alice", category="Bugfix"),
+        make_commit("c4", "chore: fourth", date="2024-01-05T12:30:00Z", author=None),
+    ]
+
+
+def test_commits_frame_is_typed(db):
+    db.save_commits(REPO, sample_commits())
+    df = db.get_commits_frame(REPO)
+
+    assert isinstance(df.index, pd.DatetimeIndex)
+    assert str(df.index.tz) == "UTC"
+    assert df.index.name == "date"
+    assert df.index.is_monotonic_increasing
+    assert list(df["sha"]) == ["c1", "c2", "c3", "c4"]
+    assert df.index[1] == pd.Timestamp("2024-01-01T23:00:00Z")
+    assert isinstance(df["author"].dtype, pd.CategoricalDtype)
+    assert isinstance(df["category"].dtype, pd.CategoricalDtype)
+    assert set(df["author"].cat.categories) == {"alice", "bob"}
+    assert df["author"].isna().sum() == 1
+    assert df["additions"].dtype == "int64" and df["deletions"].dtype == "int64"
+    assert df["additions"].sum() == 10 and df["deletions"].sum() == 3
+    # message 默认不加载
+    assert "message" not in df.columns
+
+
+def test_messages_are_loaded_on_demand(db):
+    db.save_commits(REPO, sample_commits())
+    with_messages = db.get_commits_frame(REPO, include_messages=True)
+    assert list(with_messages["message"]) == ["feat: first", "fix: second", "fix: third", "chore: fourth"]
+    assert db.get_commit_messages(REPO, shas=["c3", "c1", "missing"]) == {"c3": "fix: third", "c1": "feat: first"}
+    assert len(db.get_commit_messages(REPO)) == 4
+
+
+def plain(series):
+    """{sha: 值}，Categorical / 缺失值都换成普通 Python 对象，方便和逐行接口比较"""
+    return series.astype(object).where(series.notna(), None).to_dict()
+
+
+def test_commits_frame_matches_row_api(db):
+    db.save_commits(REPO, sample_commits())
+    frame = db.get_commits_frame(REPO, include_messages=True).reset_index().set_index("sha")
+    rows = pd.DataFrame(db.get_all_commits(REPO)).set_index("sha")
+    for column in ("author", "message", "additions", "deletions", "category"):
+        assert plain(frame[column]) == plain(rows[column]), column
+    dates = pd.to_datetime(rows["date"], utc=True, format="ISO8601")
+    assert (dates.sort_index() == frame["date"].sort_index()).all()
+
+
+def test_commits_frame_of_unknown_repo_is_empty(db):
+    df = db.get_commits_frame("no/such-repo")
+    assert df.empty
+    assert isinstance(df.index, pd.DatetimeIndex)
+    assert {"sha", "author", "category", "additions", "deletions"} <= set(df.columns)
+
+
+def history(start, stop, repo_index=0):
+    """start..stop-1 号 commit：每 7 小时一个，作者和分类轮换，偶尔作者为空"""
+    base = pd.Timestamp("2024-01-01", tz="UTC")
+    messages = ["feat: add thing", "crash on startup", "docs: typo", "random change"]
+    return [
+        make_commit(f"r{repo_index}-{i}", messages[i % 4], author=None if i % 11 == 0 else f"dev{i % 5}",
+                    date=(base + pd.Timedelta(hours=7 * i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    category=["Feature", "Bugfix", "Docs", "Other"][i % 4])
+        for i in range(start, stop)
+    ]
+
+
+def assert_rollups_match_commits(db, repo_name, **window):
+    """汇总表上的各项计数要和 commits 明细算出来的一致"""
+    df = db.get_commits_frame(repo_name, **window)
+    daily = df.groupby(df.index.floor("D")).size()
+    pd.testing.assert_series_equal(db.get_daily_counts(repo_name, **window), daily, check_names=False,
+                                   check_index_type=False, check_freq=False)
+    weekday = df.index.dayofweek.value_counts().reindex(range(7), fill_value=0)
+    assert db.get_weekday_counts(repo_name, **window).tolist() == weekday.tolist()
+    authors = df["author"].astype(object).fillna("").value_counts()
+    assert db.get_author_counts(repo_name, **window).to_dict() == authors.to_dict()
+    categories = df["category"].astype(object).value_counts()
+    assert db.get_category_counts(repo_name, **window).to_dict() == categories.to_dict()
+
+
+def test_rollups_follow_overlapping_saves(db):
+    # 批次之间有重叠、批内有重复：已存在的 commit 不能重复计数
+    assert db.save_commits(REPO, history(0, 300)) == 300
+    assert db.save_commits(REPO, history(200, 500) + history(450, 460)) == 200
+    assert db.save_commits(REPO, history(0, 500)) == 0
+    db.save_commits("other/repo", history(0, 100, repo_index=1))
+
+    assert db.get_daily_counts(REPO).sum() == 500
+    assert_rollups_match_commits(db, REPO)
+    assert_rollups_match_commits(db, "other/repo")
+    assert_rollups_match_commits(db, REPO, since="2024-01-20", until="2024-02-10")
+
+
+
+def test_rollups_follow_reclassification(db):
+    classifier = CommitClassifier()
+    commits = history(0, 200)
+    db.classify_commits(commits, classifier)
+    db.save_commits(REPO, commits)
+    assert_rollups_match_commits(db, REPO)
+
+    classifier.rules = {"Security": ["crash"], **classifier.rules}
+    classifier.compile()
+    db.reclassify(classifier, REPO)
+    assert db.get_category_counts(REPO)["Security"] == 50
+    assert_rollups_match_commits(db, REPO)
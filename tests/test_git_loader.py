@@ -0,0 +1,136 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from classifier import CommitClassifier
+from conftest import make_commit
+from git_loader import GitLogError, GitRepoError, LocalGitLoader
+from sync_pipeline import sync_repo
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+
+def git(repo, *args, date="2024-01-01T00:00:00Z"):
+    env = dict(os.environ, GIT_AUTHOR_DATE=date, GIT_COMMITTER_DATE=date)
+    subprocess.run(
+        ["git", "-C", str(repo), "-c", "user.name=Ann Ü", "-c", "user.email=ann@example.com", *args],
+        check=True, capture_output=True, env=env,
+    )
+
+
+def write(repo, path, text):
+    (repo / path).parent.mkdir(parents=True, exist_ok=True)
+    (repo / path).write_text(text, encoding="utf-8")
+
+
+@pytest.fixture
+def unicode_repo(tmp_path):
+    """路径里有非 ASCII 字符、制表符和 " => " 的仓库，第二个 commit 重命名 / 删除它们"""
+    repo = tmp_path / "repo"
+    git(tmp_path, "init", "-q", str(repo))
+    write(repo, "ü.txt", "a\nb\n")
+    write(repo, "tab\tname.txt", "x\n")
+    write(repo, "a => b.txt", "z\n")
+    write(repo, "docs/guide.md", "q\n")
+    git(repo, "add", "-A")
+    git(repo, "commit", "-q", "-m", "first\n\nbody")
+    git(repo, "mv", "ü.txt", "ö.txt")
+    (repo / "docs" / "handbuch").mkdir()
+    git(repo, "mv", "docs/guide.md", "docs/handbuch/guide.md")
+    git(repo, "rm", "-q", "tab\tname.txt")
+    write(repo, "a => b.txt", "1\n2\n3\n")
+    git(repo, "add", "-A")
+    git(repo, "commit", "-q", "-m", "second", date="2024-01-02T00:00:00Z")
+    return repo
+
+
+def test_non_ascii_paths_and_renames(unicode_repo):
+    second, first = LocalGitLoader(str(unicode_repo)).iter_commits()
+
+    assert first["message"] == "first\n\nbody"
+    assert first["author"] == "Ann Ü"
+    assert sorted(first["files"]) == [
+        ("a => b.txt", 1, 0, False), ("docs/guide.md", 1, 0, False),
+        ("tab\tname.txt", 1, 0, False), ("ü.txt", 2, 0, False),
+    ]
+
+    assert second["date"] == "2024-01-02T00:00:00Z"
+    assert (second["additions"], second["deletions"]) == (3, 2)
+    assert sorted(second["files"]) == [
+        ("a => b.txt", 3, 1, False),
+        ("docs/guide.md", 0, 0, True), ("docs/handbuch/guide.md", 0, 0, False),
+        ("tab\tname.txt", 0, 1, True),
+        ("ö.txt", 0, 0, False), ("ü.txt", 0, 0, True),
+    ]
+
+
+@pytest.fixture
+def history_repo(tmp_path):
+    """三个 commit：新增两个文件，重命名其中一个，再删掉另一个"""
+    repo = tmp_path / "history"
+    git(tmp_path, "init", "-q", str(repo))
+    write(repo, "src/app.py", "print(1)\nprint(2)\n")
+    write(repo, "README.md", "hello\n")
+    git(repo, "add", "-A")
+    git(repo, "commit", "-q", "-m", "feat: initial import", date="2024-01-01T00:00:00Z")
+    git(repo, "mv", "src/app.py", "src/main.py")
+    git(repo, "commit", "-q", "-m", "refactor: rename app", date="2024-01-02T00:00:00Z")
+    git(repo, "rm", "-q", "README.md")
+    git(repo, "commit", "-q", "-m", "chore: drop readme", date="2024-01-03T00:00:00Z")
+    return repo
+
+
+def test_iter_commit_batches(history_repo):
+    loader = LocalGitLoader(str(history_repo))
+    batches = list(loader.iter_commit_batches(batch_size=2))
+    assert [len(b) for b in batches] == [2, 1]
+    drop, rename, initial = [c for batch in batches for c in batch]
+
+    assert [c["message"] for c in (drop, rename, initial)] == [
+        "chore: drop readme", "refactor: rename app", "feat: initial import",
+    ]
+    assert drop["date"] == "2024-01-03T00:00:00Z"
+    assert drop["files"] == [("README.md", 0, 1, True)]
+    assert sorted(rename["files"]) == [("src/app.py", 0, 0, True), ("src/main.py", 0, 0, False)]
+    assert (initial["additions"], initial["deletions"]) == (3, 0)
+
+    # 增量：只读给定 SHA 之后的 commit；limit 截断
+    newer = [c for batch in loader.iter_commit_batches(since_sha=initial["sha"]) for c in batch]
+    assert [c["sha"] for c in newer] == [drop["sha"], rename["sha"]]
+    assert [c["sha"] for b in loader.iter_commit_batches(limit=1) for c in b] == [drop["sha"]]
+
+
+def test_check_rejects_invalid_paths(tmp_path, history_repo):
+    LocalGitLoader(str(history_repo)).check()
+    for path in ["", "   ", str(tmp_path / "missing"), str(tmp_path)]:
+        with pytest.raises(GitRepoError):
+            LocalGitLoader(path).check()
+
+
+def test_sync_repo_does_not_fall_back_to_api(db):
+    # 空路径必须报错，而不是当成没给路径、拿 loader=None 去走 API
+    with pytest.raises(GitRepoError):
+        sync_repo(db, CommitClassifier(), "local/repo", loader=None, local_path="")
+
+
+def test_sync_repo_local_clone(db, history_repo):
+    assert sync_repo(db, CommitClassifier(), "local/repo", local_path=str(history_repo)) == 3
+    assert sync_repo(db, CommitClassifier(), "local/repo", local_path=str(history_repo)) == 0
+
+
+def test_sync_repo_switches_from_api_to_local_clone(db, history_repo):
+    # 之前走 API 同步过：库里最新的 commit 不在这个 clone 里，git log <sha>..HEAD 会失败，要退回读全部历史
+    db.save_commits("local/repo", [make_commit("deadbeef" * 5, "api commit", date="2024-02-01T00:00:00Z")])
+    loader = LocalGitLoader(str(history_repo))
+    assert not loader.has_commit("deadbeef" * 5)
+    assert [len(b) for b in loader.iter_commit_batches(since_sha="deadbeef" * 5)] == [3]
+
+    assert sync_repo(db, CommitClassifier(), "local/repo", local_path=str(history_repo)) == 3
+    assert sync_repo(db, CommitClassifier(), "local/repo", local_path=str(history_repo)) == 0
+
+
+def test_git_log_failure_is_typed(history_repo):
+    with pytest.raises(GitLogError, match="git log failed"):
+        list(LocalGitLoader(str(history_repo), rev="no-such-branch").iter_commits())
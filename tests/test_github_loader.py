@@ -0,0 +1,198 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from benchmarks.fake_github import FakeGitHubServer, make_commits
+from github_loader import ETagCache, GitHubLoader, RateLimitError, RequestScheduler
+
+REPO = "fake/repo"
+
+
+@pytest.fixture
+def server():
+    with FakeGitHubServer(make_commits(2050), repo_name=REPO, latency=0.01) as server:
+        yield server
+
+
+def loader_for(server, **kwargs):
+    return GitHubLoader("dummy", base_url=server.url, etag_cache_path=None, **kwargs)
+
+
+def test_parallel_fetch_keeps_page_order(server):
+    expected = [c["sha"] for c in server.httpd.repos[REPO]]
+    loader = loader_for(server, max_workers=4)
+    # 越靠前的页越慢，并发请求按相反的顺序完成，产出仍然要按页码
+    get_page = loader._get_page
+    finished = []
+
+    def slow_get_page(repo_name, page, *args):
+        time.sleep(0.005 * (22 - page))
+        result = get_page(repo_name, page, *args)
+        finished.append(page)
+        return result
+
+    loader._get_page = slow_get_page
+
+    parallel = [c["sha"] for c in loader.fetch_commits(REPO, limit=None, parallel=True)]
+    assert parallel == expected
+    assert server.request_count == 21
+    assert finished != sorted(finished)
+
+    pages = list(loader.iter_commit_pages(REPO, parallel=True))
+    assert [len(p) for p in pages] == [100] * 20 + [50]
+    assert [c["sha"] for p in pages for c in p] == expected
+    assert [c["sha"] for c in loader.fetch_commits(REPO, limit=None)] == expected
+
+
+def test_limit_only_requests_needed_pages(server):
+    loader = loader_for(server, max_workers=4)
+    fetched = loader.fetch_commits(REPO, limit=250, parallel=True)
+    assert [c["sha"] for c in fetched] == [c["sha"] for c in server.httpd.repos[REPO][:250]]
+    assert server.request_count == 3
+
+
+def test_early_stop_cancels_queued_pages(server):
+    loader = loader_for(server, max_workers=2)
+    pages = loader.iter_commit_pages(REPO, parallel=True)
+    assert len(next(pages)) == 100
+    assert len(next(pages)) == 100
+    pages.close()
+    # 第 1 页 + 已经开始的请求 (最多 max_workers 个) + 已经完成的窗口，远少于 21 页
+    assert server.request_count <= 2 + 2 * 2
+
+
+def test_failed_page_stops_fetch(server):
+    loader = loader_for(server, max_workers=2)
+    pages = loader.iter_commit_pages(REPO, parallel=True)
+    next(pages)
+    # 抓取途中仓库消失：后面的页 404，错误要抛给调用方，而不是返回残缺的结果
+    server.httpd.repos.pop(REPO)
+    with pytest.raises(ValueError, match="not found"):
+        list(pages)
+    assert server.request_count < 21
+
+
+def test_missing_repository(server):
+    with pytest.raises(ValueError, match="not found"):
+        loader_for(server).fetch_commits("no/such-repo", parallel=True)
+
+
+def test_not_modified_pages_come_from_etag_cache(tmp_path):
+    with FakeGitHubServer(make_commits(250), repo_name=REPO, rate_limit=100) as server:
+        loader = GitHubLoader("dummy", base_url=server.url, etag_cache_path=str(tmp_path / "http_cache.db"))
+        first = loader.fetch_commits(REPO, limit=None)
+        remaining = server.httpd.remaining
+
+        # 同一个 loader 再抓一遍：三页都是 304，用本地 body，不消耗配额
+        assert loader.fetch_commits(REPO, limit=None) == first
+        assert server.not_modified_count == 3
+        assert server.httpd.remaining == remaining
+
+        # 缓存是持久化的，新的 loader 也能用
+        loader = GitHubLoader("dummy", base_url=server.url, etag_cache_path=str(tmp_path / "http_cache.db"))
+        assert loader.fetch_commits(REPO, limit=None, parallel=True) == first
+        assert server.not_modified_count == 6
+        assert server.request_count == 9
+
+
+def test_etag_cache_prunes_by_age_and_size(tmp_path):
+    path = str(tmp_path / "http_cache.db")
+    cache = ETagCache(path, max_age=None, max_bytes=None)
+    for i in range(5):
+        cache.put(f"u{i}", f"e{i}", ["x" * 100])
+    cache.conn.execute("UPDATE etags SET used_at = used_at - 3600 WHERE url IN ('u0', 'u1')")
+    cache.conn.commit()
+    cache.touch("u0")
+    cache.close()
+
+    # u1 超过一小时没用过；u0 刚命中过，留下
+    cache = ETagCache(path, max_age=60, max_bytes=None)
+    assert cache.get("u1") is None
+    assert cache.get("u0") == ("e0", ["x" * 100])
+    cache.close()
+
+    # 总大小超限时先删最久没用过的
+    cache = ETagCache(path, max_age=None, max_bytes=250)
+    kept = [url for url in ("u0", "u2", "u3", "u4") if cache.get(url)]
+    assert kept == ["u0", "u4"]
+    cache.close()
+
+
+def test_etag_cache_upgrades_old_table(tmp_path):
+    import sqlite3
+    path = str(tmp_path / "http_cache.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE etags (url TEXT PRIMARY KEY, etag TEXT, body TEXT)")
+    conn.execute("""INSERT INTO etags VALUES ('u', 'e', '[1]')""")
+    conn.commit()
+    conn.close()
+
+    cache = ETagCache(path)
+    assert cache.get("u") == ("e", [1])
+    cache.put("v", "f", [2])
+    assert cache.get("v") == ("f", [2])
+    cache.close()
+
+
+def test_pacing_does_not_hold_the_lock():
+    scheduler = RequestScheduler()
+    scheduler.remaining = 0
+    scheduler.reset_at = time.time() + 0.5
+    waiter = threading.Thread(target=scheduler._pace)
+    waiter.start()
+    time.sleep(0.05)
+    # 等配额重置的线程不能挡住其它线程
+    assert scheduler.lock.acquire(timeout=0.1)
+    scheduler.lock.release()
+    waiter.join()
+    assert scheduler.remaining is None
+
+
+def test_pacing_spreads_concurrent_requests():
+    scheduler = RequestScheduler(low_water=10)
+    scheduler.remaining = 4
+    scheduler.reset_at = time.time() + 0.4
+    start = time.time()
+    done = []
+
+    def pace():
+        scheduler._pace()
+        done.append(time.time() - start)
+
+    threads = [threading.Thread(target=pace) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # 剩 4 个名额、0.4 秒后重置：四个请求大约每 0.1 秒放行一个，而不是同时放行
+    done.sort()
+    assert done[0] < 0.05
+    assert done[-1] >= 0.25
+    assert scheduler.remaining == 0
+
+
+def test_fetch_waits_for_rate_limit_reset():
+    with FakeGitHubServer(make_commits(500), repo_name=REPO, rate_limit=3, rate_window=1.0) as server:
+        loader = loader_for(server, max_workers=2)
+        fetched = loader.fetch_commits(REPO, limit=None, parallel=True)
+        assert [c["sha"] for c in fetched] == [c["sha"] for c in server.httpd.repos[REPO]]
+
+
+def test_rate_limit_retries_are_bounded():
+    class AlwaysLimited:
+        calls = 0
+
+        def get(self, url, params=None, headers=None, timeout=None):
+            self.calls += 1
+            response = requests.Response()
+            response.status_code = 429
+            response.headers["Retry-After"] = "0"
+            response._content = b""
+            return response
+
+    session = AlwaysLimited()
+    with pytest.raises(RateLimitError, match="after 2 waits"):
+        RequestScheduler(max_retries=2).get(session, "http://example.invalid/x")
+    assert session.calls == 3
@@ -0,0 +1,64 @@
+import pytest
+
+from benchmarks.fake_github import FakeGitHubServer, make_commits
+from classifier import CommitClassifier
+from github_loader import GitHubGraphQLLoader
+
+REPO = "fake/repo"
+
+
+@pytest.fixture
+def server():
+    with FakeGitHubServer(make_commits(250), repo_name=REPO) as server:
+        yield server
+
+
+@pytest.fixture
+def loader(server):
+    return GitHubGraphQLLoader("dummy", graphql_url=f"{server.url}/graphql")
+
+
+def test_one_request_per_page_with_line_stats(server, loader):
+    commits = loader.fetch_commits(REPO, limit=None)
+    raw = server.httpd.repos[REPO]
+
+    # 250 个 commit、每页 100 个：3 个请求，不是每个 commit 一个
+    assert server.request_count == 3
+    assert [c["sha"] for c in commits] == [c["sha"] for c in raw]
+    first = commits[0]
+    assert first == {
+        "sha": raw[0]["sha"],
+        "author": raw[0]["commit"]["author"]["name"],
+        "date": raw[0]["commit"]["author"]["date"],
+        "committed_date": raw[0]["commit"]["committer"]["date"],
+        "message": raw[0]["commit"]["message"],
+        "additions": raw[0]["stats"]["additions"],
+        "deletions": raw[0]["stats"]["deletions"],
+    }
+    assert sum(c["additions"] for c in commits) == sum(c["stats"]["additions"] for c in raw)
+
+
+def test_output_is_accepted_by_save_commits(db, loader):
+    commits = loader.fetch_commits(REPO, limit=None)
+    db.classify_commits(commits, CommitClassifier())
+    assert db.save_commits(REPO, commits) == 250
+
+    frame = db.get_commits_frame(REPO)
+    assert len(frame) == 250
+    assert frame["additions"].sum() == sum(c["additions"] for c in commits)
+    assert frame["deletions"].sum() == sum(c["deletions"] for c in commits)
+
+
+def test_limit_and_since(server, loader):
+    assert len(loader.fetch_commits(REPO, limit=150)) == 150
+    assert server.request_count == 2
+
+    raw = server.httpd.repos[REPO]
+    since = raw[30]["commit"]["committer"]["date"]
+    recent = loader.fetch_commits(REPO, limit=None, since_date=since)
+    assert [c["sha"] for c in recent] == [c["sha"] for c in raw[:31]]
+
+
+def test_missing_repository(loader):
+    with pytest.raises(ValueError, match="not found"):
+        loader.fetch_commits("no/such-repo")
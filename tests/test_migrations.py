@@ -0,0 +1,108 @@
+import sqlite3
+
+import pytest
+
+from conftest import make_commit
+from db_manager import DBManager, message_hash
+
+REPO = "legacy/repo"
+
+LEGACY_ROWS = [
+    # (sha, repo_name, author, date, message, additions, deletions, category)
+    ("a1", REPO, "alice", "2024-01-01T10:00:00Z", "fix memory leak", 3, 1, "Bugfix"),
+    ("a2", REPO, "bob", "2024-01-01T12:00:00Z", "add login page", 10, 0, "Feature"),
+    # 旧版本每次增量同步都会把边界 commit 再存一遍：重复行里最早写入的那一行保留
+    ("a1", REPO, "alice", "2024-01-01T10:00:00Z", "fix memory leak (again)", 99, 99, "Other"),
+    ("a3", REPO, None, "2024-01-02T08:00:00Z", "docs: update readme", 1, 1, None),
+    ("a2", REPO, "bob", "2024-01-01T12:00:00Z", "add login page", 10, 0, "Feature"),
+    # 同一个 sha 在另一个仓库里不算重复
+    ("a1", "other/repo", "carol", "2024-02-01T00:00:00Z", "initial commit", 5, 0, "Other"),
+    # 没有 sha 的坏行被丢掉
+    (None, REPO, "dave", "2024-01-03T00:00:00Z", "broken row", 0, 0, "Other"),
+]
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    """最初版本的数据库：commits 表的 sha 写成了 PRIMATY KEY (等于没有主键)，user_version = 0"""
+    path = tmp_path / "data" / "legacy.db"
+    path.parent.mkdir()
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE commits (
+            sha TEXT PRIMATY KEY,
+            repo_name TEXT,
+            author TEXT,
+            date TEXT,
+            message TEXT,
+            additions INTEGER,
+            deletions INTEGER,
+            category TEXT
+        )
+    ''')
+    conn.executemany("INSERT INTO commits VALUES (?, ?, ?, ?, ?, ?, ?, ?)", LEGACY_ROWS)
+    conn.commit()
+    conn.close()
+
+    manager = DBManager(str(path))
+    yield manager
+    manager.close()
+
+
+def query(db, sql, params=()):
+    conn = sqlite3.connect(db.db_path)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def test_migrates_to_latest_version(legacy_db):
+    assert query(legacy_db, "PRAGMA user_version") == [(DBManager.SCHEMA_VERSION,)]
+    tables = {name for (name,) in query(legacy_db, "SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {
+        "commits", "daily_author_counts", "daily_category_counts", "classification_cache", "sync_status",
+        "ai_reports", "sync_state", "commits_fts", "repo_files", "file_changes", "file_authors",
+    } <= tables
+    assert "commits_legacy" not in tables
+    indexes = {name for (name,) in query(legacy_db, "SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"idx_commits_repo_ts", "idx_commits_repo_rule"} <= indexes
+    assert "idx_commits_repo_date" not in indexes
+
+
+def test_dedupes_legacy_rows(legacy_db):
+    rows = query(legacy_db, '''
+        SELECT repo_name, sha, message, additions, ts, msg_hash FROM commits ORDER BY repo_name, sha
+    ''')
+    assert [(r[0], r[1], r[2], r[3]) for r in rows] == [
+        ("legacy/repo", "a1", "fix memory leak", 3),
+        ("legacy/repo", "a2", "add login page", 10),
+        ("legacy/repo", "a3", "docs: update readme", 1),
+        ("other/repo", "a1", "initial commit", 5),
+    ]
+    assert rows[0][4] == 1704103200
+    assert all(r[5] == message_hash(r[2]) for r in rows)
+
+    # 主键生效：再存一次同一个 commit 不会新增
+    assert legacy_db.save_commits(REPO, [make_commit("a1", "fix memory leak")]) == 0
+    assert legacy_db.save_commits(REPO, [make_commit("a4", "new", date="2024-01-04T00:00:00Z")]) == 1
+
+
+def test_rebuilds_rollups_and_search_index(legacy_db):
+    assert query(legacy_db, '''
+        SELECT day, author, commits FROM daily_author_counts WHERE repo_name = ? ORDER BY day, author
+    ''', (REPO,)) == [("2024-01-01", "alice", 1), ("2024-01-01", "bob", 1), ("2024-01-02", "", 1)]
+    assert legacy_db.get_category_counts(REPO).to_dict() == {"Bugfix": 1, "Feature": 1, "": 1}
+    assert legacy_db.get_data_version() == ("2024-02-01T00:00:00Z", 4)
+    assert legacy_db.get_data_version(REPO) == ("2024-01-02T08:00:00Z", 3)
+
+    hits = legacy_db.search_commits("leak")
+    assert hits[["repo_name", "sha"]].values.tolist() == [[REPO, "a1"]]
+    assert legacy_db.search_commits("again").empty
+    assert legacy_db.search_commits("initial", repo_name="other/repo")["sha"].tolist() == ["a1"]
+
+
+def test_reopen_is_a_no_op(legacy_db, capsys):
+    DBManager(legacy_db.db_path).close()
+    assert "migrated" not in capsys.readouterr().out
+    assert query(legacy_db, "SELECT COUNT(*) FROM commits") == [(4,)]
@@ -0,0 +1,106 @@
+import json
+import threading
+
+import pytest
+
+import perf
+from benchmarks.fake_github import FakeGitHubServer, make_commits
+from classifier import CommitClassifier
+from github_loader import GitHubLoader
+from sync_pipeline import ingest_commits
+
+
+@pytest.fixture
+def enabled():
+    was_enabled = perf.is_enabled()
+    perf.reset()
+    perf.enable()
+    yield
+    perf.enable(was_enabled)
+    perf.reset()
+
+
+@pytest.fixture
+def disabled():
+    was_enabled = perf.is_enabled()
+    perf.reset()
+    perf.enable(False)
+    yield
+    perf.enable(was_enabled)
+
+
+def test_disabled_records_nothing(disabled):
+    @perf.timed("test.func")
+    def func(x):
+        return x * 2
+
+    with perf.span("test.span") as s:
+        pass
+    perf.incr("test.counter", 5)
+    assert func(21) == 42
+    # 关闭时共用同一个空上下文，不创建对象
+    assert s is perf.span("other")
+    assert perf.snapshot() == {"enabled": False, "spans": {}, "counters": {}}
+
+
+def test_spans_and_counters(enabled):
+    @perf.timed()
+    def helper():
+        return "ok"
+
+    for _ in range(3):
+        with perf.span("test.span"):
+            pass
+    assert helper() == "ok"
+    perf.incr("test.counter")
+    perf.incr("test.counter", 4)
+
+    snap = perf.snapshot()
+    assert snap["enabled"] is True
+    assert snap["counters"] == {"test.counter": 5}
+    assert snap["spans"]["test.span"]["count"] == 3
+    assert snap["spans"][f"{__name__}.helper"]["count"] == 1
+    stat = snap["spans"]["test.span"]
+    assert stat["max_ms"] >= stat["mean_ms"] >= 0
+    assert json.loads(perf.to_json()) == snap
+
+    perf.reset()
+    assert perf.snapshot()["spans"] == {}
+
+
+def test_span_records_failures_and_reraises(enabled):
+    with pytest.raises(KeyError):
+        with perf.span("test.fails"):
+            raise KeyError("x")
+    assert perf.snapshot()["spans"]["test.fails"]["count"] == 1
+
+
+def test_counters_are_thread_safe(enabled):
+    def work():
+        for _ in range(2000):
+            perf.incr("test.threads")
+            with perf.span("test.threads"):
+                pass
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    snap = perf.snapshot()
+    assert snap["counters"]["test.threads"] == 16000
+    assert snap["spans"]["test.threads"]["count"] == 16000
+
+
+def test_sync_is_instrumented(enabled, db):
+    with FakeGitHubServer(make_commits(250), repo_name="fake/repo") as server:
+        loader = GitHubLoader("dummy", base_url=server.url, etag_cache_path=None)
+        ingest_commits(loader.iter_commit_batches("fake/repo"), db, CommitClassifier(), "fake/repo")
+
+    snap = perf.snapshot()
+    assert snap["counters"]["github.requests"] == 3
+    assert snap["counters"]["github.bytes"] > 0
+    assert snap["counters"]["db.rows_written"] == 250
+    assert snap["counters"]["classifier.messages"] == 250
+    for name in ("github.request", "db.save_commits", "sync.ingest_commits", "classifier.classify_many"):
+        assert snap["spans"][name]["count"] >= 1, name
@@ -0,0 +1,105 @@
+import pytest
+
+from benchmarks.fake_github import FakeGitHubServer, make_commits
+from classifier import CommitClassifier
+from github_loader import GitHubGraphQLLoader, GitHubLoader
+from sync_pipeline import sync_repo
+
+REPO = "fake/repo"
+
+
+@pytest.fixture
+def server():
+    with FakeGitHubServer(make_commits(250), repo_name=REPO) as s:
+        yield s
+
+
+def rest_loader(server, tmp_path):
+    loader = GitHubLoader("dummy", base_url=server.url, etag_cache_path=str(tmp_path / "http_cache.db"))
+    loader.PER_PAGE = 20
+    return loader
+
+
+def graphql_loader(server, tmp_path):
+    loader = GitHubGraphQLLoader("dummy", graphql_url=f"{server.url}/graphql")
+    loader.PAGE_SIZE = 20
+    return loader
+
+
+def stored_shas(db):
+    return set(db.get_commits_frame(REPO)['sha'])
+
+
+class FlakyLoader:
+    """第 fail_after 页之后抛出网络错误，模拟同步中途被打断"""
+
+    def __init__(self, loader, fail_after):
+        self.loader = loader
+        self.fail_after = fail_after
+
+    def iter_resumable_batches(self, *args, **kwargs):
+        for i, item in enumerate(self.loader.iter_resumable_batches(*args, **kwargs)):
+            if i == self.fail_after:
+                raise ConnectionError("network down")
+            yield item
+
+
+@pytest.mark.parametrize("make_loader", [rest_loader, graphql_loader])
+def test_interrupted_sync_resumes_from_checkpoint(db, server, tmp_path, make_loader):
+    classifier = CommitClassifier()
+    loader = make_loader(server, tmp_path)
+    with pytest.raises(ConnectionError):
+        sync_repo(db, classifier, REPO, FlakyLoader(loader, fail_after=3))
+    state = db.get_sync_state(REPO)
+    assert state['status'] == "interrupted"
+    assert len(stored_shas(db)) == 60
+
+    before = server.request_count
+    sync_repo(db, classifier, REPO, loader)
+    assert db.get_sync_state(REPO)['status'] == "complete"
+    assert stored_shas(db) == {c['sha'] for c in make_commits(250)}
+    # 从断点继续：只抓剩下的 10 页 (+ 一次不足一页的增量检查)，不从头再来
+    assert server.request_count - before <= 11
+
+
+@pytest.mark.parametrize("make_loader", [rest_loader, graphql_loader])
+def test_incremental_sync_fetches_only_new_commits(db, server, tmp_path, make_loader):
+    classifier = CommitClassifier()
+    loader = make_loader(server, tmp_path)
+    sync_repo(db, classifier, REPO, loader)
+
+    commits = make_commits(280)
+    server.add_repo(REPO, commits)
+    assert sync_repo(db, classifier, REPO, loader) == 30
+    assert stored_shas(db) == {c['sha'] for c in commits}
+    assert db.get_sync_state(REPO)['newest_sha'] == commits[0]['sha']
+
+
+def test_unchanged_incremental_sync_is_answered_by_304(db, server, tmp_path, monkeypatch):
+    """每一轮增量的 until 都不一样，但第一页内容没变，条件请求仍然命中"""
+    import sync_pipeline
+
+    classifier = CommitClassifier()
+    loader = rest_loader(server, tmp_path)
+    sync_repo(db, classifier, REPO, loader)
+
+    for day in range(1, 4):
+        monkeypatch.setattr(sync_pipeline, "_utc_now", lambda day=day: f"2030-01-0{day}T00:00:00Z")
+        before_requests, before_304 = server.request_count, server.not_modified_count
+        assert sync_repo(db, classifier, REPO, loader) == 0
+        assert server.request_count - before_requests == 1
+        assert server.not_modified_count - before_304 == 1
+
+
+def test_backfill_of_legacy_data_does_not_skip_rebased_commits(db, tmp_path):
+    """
+    旧版本同步的数据 (没有 sync_state)：最老的 commit 作者时间远早于提交时间 (rebase 过)，
+    拿它的作者时间当 until 会把更老的历史整段跳过
+    """
+    commits = make_commits(100)
+    commits[19]['commit']['author']['date'] = "2015-01-01T00:00:00Z"
+    db.save_commits(REPO, [GitHubLoader.clean_commit(c) for c in commits[:20]])
+    with FakeGitHubServer(commits, repo_name=REPO) as server:
+        sync_repo(db, CommitClassifier(), REPO, rest_loader(server, tmp_path))
+    assert db.get_sync_state(REPO)['status'] == "complete"
+    assert stored_shas(db) == {c['sha'] for c in commits}
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from score_calculator import calculate_health_score, calculate_health_scores, score_inputs, scores_from_inputs
+
+NOW = pd.Timestamp("2024-06-01", tz="UTC")
+
+
+def repo_frame(repo_name, days_ago, authors, additions=None, deletions=None):
+    """days_ago[i] 天前 authors[i] 提交的一个 commit"""
+    n = len(days_ago)
+    return pd.DataFrame({
+        "repo_name": repo_name,
+        "author": authors,
+        "additions": additions if additions is not None else [0] * n,
+        "deletions": deletions if deletions is not None else [0] * n,
+    }, index=pd.DatetimeIndex([NOW - pd.Timedelta(days=d) for d in days_ago], name="date"))
+
+
+def sample_repos():
+    rng = np.random.default_rng(9)
+    return {
+        # 活跃、社区大、历史长
+        "big/community": repo_frame("big/community", rng.integers(0, 400, 300), [f"dev{i % 12}" for i in range(300)]),
+        # 一个人写了 90%
+        "one/dictator": repo_frame("one/dictator", range(0, 100, 2), ["boss"] * 45 + ["a", "b", "c", "d", "e"]),
+        # 只有一个 commit
+        "single/commit": repo_frame("single/commit", [45], ["solo"]),
+        # 两个作者，很久没动
+        "stale/pair": repo_frame("stale/pair", [200, 250, 300], ["x", "y", "x"]),
+        # 有行数统计：改来改去多，留下的少 (churn 惩罚)
+        "churny/repo": repo_frame("churny/repo", [1, 5, 20, 60, 200], ["p", "q", "r", "p", "q"],
+                                  additions=[100, 20, 30, 400, 1000], deletions=[300, 10, 40, 50, 0]),
+        # 有行数统计：稳定增长
+        "growing/repo": repo_frame("growing/repo", [3, 10, 40], ["p", "q", "r"],
+                                   additions=[100, 200, 300], deletions=[10, 10, 10]),
+        # 作者为空的 commit 不计入作者
+        "anon/repo": repo_frame("anon/repo", [2, 4, 6, 8], [None, "a", "b", "a"]),
+    }
+
+
+@pytest.mark.parametrize("with_truck_factors", [False, True])
+def test_batch_matches_per_repo(with_truck_factors):
+    repos = sample_repos()
+    truck_factors = pd.Series({"big/community": 1, "one/dictator": 3, "churny/repo": 2}) if with_truck_factors else None
+    batch = calculate_health_scores(pd.concat(repos.values()), now=NOW, truck_factors=truck_factors)
+
+    assert sorted(batch.index) == sorted(repos)
+    assert batch["score"].is_monotonic_decreasing
+    for repo_name, df in repos.items():
+        tf = None
+        if truck_factors is not None and repo_name in truck_factors:
+            tf = int(truck_factors[repo_name])
+        expected, _ = calculate_health_score(df, now=NOW, truck_factor=tf)
+        assert batch.loc[repo_name, "score"] == expected, repo_name
+        assert batch.loc[repo_name, "commits"] == len(df)
+
+
+def test_scores_from_inputs_matches_calculate_health_scores():
+    df = pd.concat(sample_repos().values())
+    pd.testing.assert_frame_equal(scores_from_inputs(score_inputs(df), now=NOW), calculate_health_scores(df, now=NOW))
+
+
+def test_single_commit_repo():
+    df = repo_frame("single/commit", [0], ["solo"])
+    score, _ = calculate_health_score(df, now=NOW)
+    batch = calculate_health_scores(df, now=NOW)
+    # 活跃 40 + 1-2 人 5 + 刚开始 0
+    assert score == 45
+    assert batch.loc["single/commit", "score"] == score
+    assert batch.loc["single/commit", "project_age_days"] == 0
+    assert batch.loc["single/commit", "top_contributor_ratio"] == 1.0
+
+
+def test_empty_repo():
+    empty = repo_frame("empty/repo", [], [])
+    assert calculate_health_score(empty, now=NOW) == (0, ["No data available"])
+    assert calculate_health_scores(empty, now=NOW).empty
+    assert scores_from_inputs(score_inputs(empty), now=NOW).empty
+
+    # 没有 commit 的仓库 (Categorical 里有这个类别但没有行) 不出现在批量结果里，也不影响其它仓库
+    repos = sample_repos()
+    df = pd.concat(repos.values())
+    df["repo_name"] = pd.Categorical(df["repo_name"], categories=["empty/repo", *repos])
+    batch = calculate_health_scores(df, now=NOW)
+    assert "empty/repo" not in batch.index
+    assert len(batch) == len(repos)
@@ -0,0 +1,61 @@
+import pytest
+
+from conftest import make_commit
+from db_manager import SearchQueryError, fts_query
+
+REPO = "test/search"
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("leak", '"leak"'),
+    ("CVE-2021-44228", '"CVE-2021-44228"'),
+    ('"memory leak" revert*', '"memory leak" "revert"*'),
+    ("security OR vulnerability", '"security" OR "vulnerability"'),
+    ("leak NOT test", '"leak" NOT "test"'),
+    ("leak AND NOT test", '"leak" NOT "test"'),
+    ("OR leak AND", '"leak"'),
+    ("", ""),
+    ("AND", ""),
+])
+def test_fts_query(text, expected):
+    assert fts_query(text) == expected
+
+
+@pytest.mark.parametrize("text", ["foo AND OR bar", "x NOT NOT y", "NOT leak", "OR NOT leak", "a OR OR b"])
+def test_fts_query_rejects_invalid_operators(text):
+    with pytest.raises(SearchQueryError):
+        fts_query(text)
+
+
+@pytest.fixture
+def search_db(db):
+    db.save_commits(REPO, [
+        make_commit("a1", "fix memory leak in parser"),
+        make_commit("a2", "add leak test", date="2024-01-09T00:00:00Z"),
+        make_commit("a3", "Bump lodash from 4.17.20 to 4.17.21"),
+    ])
+    return db
+
+
+def test_search_commits(search_db):
+    assert set(search_db.search_commits("leak", REPO)['sha']) == {"a1", "a2"}
+    assert list(search_db.search_commits("leak NOT test", REPO)['sha']) == ["a1"]
+    assert list(search_db.search_commits("4.17.21", REPO)['sha']) == ["a3"]
+    assert search_db.get_search_counts("leak", REPO, bucket="week").sum() == 2
+
+
+@pytest.mark.parametrize("text", ["foo AND OR bar", "x NOT NOT y", "NOT leak"])
+def test_invalid_queries_raise_search_query_error(search_db, text):
+    with pytest.raises(SearchQueryError):
+        search_db.search_commits(text, REPO)
+    with pytest.raises(SearchQueryError):
+        search_db.get_search_counts(text, REPO)
+
+
+def test_fts5_syntax_errors_become_search_query_error(search_db, monkeypatch):
+    """清洗漏掉的语法错误也不会变成 sqlite3.OperationalError"""
+    import db_manager
+
+    monkeypatch.setattr(db_manager, "fts_query", lambda text: '"foo" AND OR "bar"')
+    with pytest.raises(SearchQueryError):
+        search_db.search_commits("foo", REPO)
@@ -0,0 +1,106 @@
+import pandas as pd
+import pytest
+
+from classifier import CommitClassifier
+from conftest import make_commit
+from db_manager import DBManager
+
+pa = pytest.importorskip("pyarrow")
+snapshot = pytest.importorskip("snapshot")
+
+REPO = "acme/rocket"
+
+
+@pytest.fixture
+def source_db(db):
+    classifier = CommitClassifier()
+    commits = [
+        make_commit(f"{i:040x}", ["feat: add", "fix: bug", "docs: typo", "random"][i % 4],
+                    date=(pd.Timestamp("2024-01-01", tz="UTC") + pd.Timedelta(hours=5 * i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    author=None if i % 13 == 0 else f"dev{i % 6}", additions=i % 40, deletions=i % 9)
+        for i in range(300)
+    ]
+    db.classify_commits(commits, classifier)
+    db.save_commits(REPO, commits)
+    return db
+
+
+@pytest.fixture
+def target_db(tmp_path):
+    manager = DBManager(str(tmp_path / "target" / "target.db"))
+    yield manager
+    manager.close()
+
+
+def assert_same_history(a, b, repo_a=REPO, repo_b=REPO):
+    cols_a, rows_a = a.get_commit_rows(repo_a)
+    cols_b, rows_b = b.get_commit_rows(repo_b)
+    assert cols_a == cols_b
+    assert rows_a == rows_b
+    for query in ("get_daily_counts", "get_author_counts", "get_category_counts"):
+        pd.testing.assert_series_equal(getattr(a, query)(repo_a), getattr(b, query)(repo_b))
+
+
+@pytest.mark.parametrize("suffix", [".arrow", ".parquet"])
+def test_round_trip(source_db, target_db, tmp_path, suffix):
+    path = str(tmp_path / f"rocket{suffix}")
+    assert snapshot.export_snapshot(source_db, REPO, path) == 300
+
+    table = snapshot.read_snapshot(path)
+    info = snapshot.snapshot_info(table)
+    assert info["repo_name"] == REPO and info["commits"] == "300"
+    assert info["snapshot_version"] == str(snapshot.SNAPSHOT_VERSION)
+    # author / category 是字典编码
+    assert pa.types.is_dictionary(table.schema.field("author").type)
+    assert pa.types.is_dictionary(table.schema.field("category").type)
+
+    assert snapshot.import_snapshot(target_db, path) == 300
+    assert_same_history(source_db, target_db)
+    # 重复导入是安全的
+    assert snapshot.import_snapshot(target_db, path) == 0
+    assert len(target_db.get_commits_frame(REPO)) == 300
+
+
+def test_snapshot_frame_matches_db_frame(source_db, tmp_path):
+    path = str(tmp_path / "rocket.arrow")
+    snapshot.export_snapshot(source_db, REPO, path)
+    frame = snapshot.snapshot_frame(snapshot.read_snapshot(path), include_messages=True)
+    expected = source_db.get_commits_frame(REPO, include_messages=True)
+    pd.testing.assert_frame_equal(frame, expected, check_categorical=False)
+
+
+def test_windowed_export_and_rename(source_db, target_db, tmp_path):
+    path = str(tmp_path / "window.parquet")
+    since, until = "2024-01-10", "2024-01-20"
+    count = snapshot.export_snapshot(source_db, REPO, path, since=since, until=until)
+    assert count == len(source_db.get_commits_frame(REPO, since=since, until=until)) > 0
+
+    assert snapshot.import_snapshot(target_db, path, repo_name="copy/rocket") == count
+    assert target_db.list_repos() == ["copy/rocket"]
+    frame = target_db.get_commits_frame("copy/rocket")
+    assert frame.index.min() >= pd.Timestamp(since, tz="UTC")
+    assert frame.index.max() < pd.Timestamp(until, tz="UTC")
+
+
+def test_import_reclassifies_labels_from_other_rules(source_db, target_db, tmp_path):
+    path = str(tmp_path / "rocket.arrow")
+    snapshot.export_snapshot(source_db, REPO, path)
+
+    classifier = CommitClassifier()
+    classifier.rules = {"Docs": ["typo", "doc"], "Mystery": ["random"], **classifier.rules}
+    classifier.compile()
+    snapshot.import_snapshot(target_db, path, classifier=classifier)
+    assert not target_db.needs_reclassification(REPO, classifier.rule_version)
+    assert target_db.get_category_counts(REPO)["Mystery"] == 75
+
+
+def test_newer_snapshot_version_is_rejected(source_db, tmp_path):
+    path = str(tmp_path / "rocket.arrow")
+    snapshot.export_snapshot(source_db, REPO, path)
+    table = snapshot.read_snapshot(path)
+    newer = table.replace_schema_metadata({**table.schema.metadata, b"snapshot_version": b"999"})
+    future = str(tmp_path / "future.arrow")
+    with pa.OSFile(future, "wb") as sink, pa.ipc.new_file(sink, newer.schema) as writer:
+        writer.write_table(newer)
+    with pytest.raises(ValueError, match="newer than supported"):
+        snapshot.read_snapshot(future)
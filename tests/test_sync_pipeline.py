@@ -0,0 +1,59 @@
+import pytest
+
+from benchmarks.fake_github import FakeGitHubServer, make_commits
+from classifier import CommitClassifier
+from conftest import make_commit
+from github_loader import GitHubLoader
+from sync_pipeline import ingest_commits
+
+REPO = "fake/repo"
+
+
+def pages(n_pages, page_size, pulled):
+    """逐页产出 commit，记录被拉取了多少页"""
+    for p in range(n_pages):
+        pulled.append(p)
+        yield [make_commit(f"{p:04d}{i:04d}", f"fix: change {p}-{i}") for i in range(page_size)]
+
+
+def test_batches_are_written_while_pages_arrive(db, monkeypatch):
+    pulled, saves, progress = [], [], []
+    save_commits = db.save_commits
+
+    def spy(repo_name, commits):
+        saves.append((len(pulled), len(commits)))
+        return save_commits(repo_name, commits)
+
+    monkeypatch.setattr(db, "save_commits", spy)
+    saved = ingest_commits(pages(11, 120, pulled), db, CommitClassifier(), REPO, batch_size=500,
+                           progress=lambda fetched, saved: progress.append((fetched, saved)))
+
+    assert saved == 1320
+    assert len(db.get_commits_frame(REPO)) == 1320
+    # 攒够 500 条就写：拉到第 5 页和第 10 页时各写一次，剩下的最后写，而不是全部拉完再写
+    assert saves == [(5, 600), (10, 600), (11, 120)]
+    assert progress[0] == (120, 0)
+    assert progress[-1] == (1320, 1320)
+    assert [f for f, _ in progress] == sorted(f for f, _ in progress)
+
+
+def test_written_batches_survive_a_failure(db):
+    def failing():
+        yield from pages(3, 100, [])
+        raise ConnectionError("network down")
+
+    with pytest.raises(ConnectionError):
+        ingest_commits(failing(), db, CommitClassifier(), REPO, batch_size=200)
+    # 前 200 条已经写入，第三页还在缓冲区里
+    assert len(db.get_commits_frame(REPO)) == 200
+
+
+def test_full_history_beyond_old_cap(db):
+    with FakeGitHubServer(make_commits(1234), repo_name=REPO) as server:
+        loader = GitHubLoader("dummy", base_url=server.url, etag_cache_path=None)
+        batches = loader.iter_commit_batches(REPO)
+        assert ingest_commits(batches, db, CommitClassifier(), REPO, batch_size=300) == 1234
+
+    frame = db.get_commits_frame(REPO)
+    assert len(frame) == 1234
+    assert set(frame["category"].astype(str)) == {"Bugfix"}
@@ -0,0 +1,112 @@
+import logging
+import threading
+import time
+
+import pytest
+
+import sync_service
+from benchmarks.fake_github import FakeGitHubServer, make_commits
+from db_manager import DBManager
+from github_loader import GitHubLoader
+from sync_service import SyncService, parse_repo_specs
+
+
+@pytest.fixture
+def server():
+    with FakeGitHubServer(make_commits(230), repo_name="fake/one") as server:
+        server.httpd.repos["fake/two"] = make_commits(120, authors=3)
+        yield server
+
+
+def test_parse_repo_specs():
+    specs = ["fake/one", "  # comment", "", "fake/two = /tmp/clone", "fake/three="]
+    assert parse_repo_specs(specs) == [("fake/one", None), ("fake/two", "/tmp/clone"), ("fake/three", None)]
+
+
+def test_run_once_records_status_per_repo(db, server):
+    loader = GitHubLoader("dummy", base_url=server.url, etag_cache_path=None)
+    repos = [("fake/one", None), ("fake/two", None), ("no/such-repo", None)]
+    service = SyncService(repos, db, loader, workers=2)
+
+    # 一个仓库失败不影响其它仓库
+    assert service.run_once() == 2
+    status = {s["repo_name"]: s for s in db.get_sync_status()}
+    assert status["fake/one"]["status"] == "ok" and status["fake/one"]["commits_added"] == 230
+    assert status["fake/two"]["status"] == "ok" and status["fake/two"]["commits_added"] == 120
+    assert status["no/such-repo"]["status"] == "error"
+    assert "not found" in status["no/such-repo"]["error"]
+    assert len(db.get_commits_frame("fake/one")) == 230
+
+    # 下一轮只拉新 commit
+    server.httpd.repos["fake/two"] = make_commits(125, authors=3)
+    assert service.run_once() == 2
+    assert db.get_sync_status("fake/two")[0]["commits_added"] == 5
+    assert db.get_sync_status("fake/one")[0]["commits_added"] == 0
+    assert len(db.get_commits_frame("fake/two")) == 125
+
+
+def test_status_goes_to_the_log_not_stdout(db, server, caplog, capsys):
+    loader = GitHubLoader("dummy", base_url=server.url, etag_cache_path=None)
+    service = SyncService([("fake/two", None), ("no/such-repo", None)], db, loader, backfill_pages=1)
+    with caplog.at_level(logging.INFO):
+        service.run_once()
+
+    messages = {}
+    for record in caplog.records:
+        messages.setdefault(record.name, []).append((record.levelno, record.getMessage()))
+    # 120 个 commit，每轮只回填一页：停在第一页最老的 commit 上
+    assert any(level == logging.INFO and msg.startswith("Backfill of fake/two: 1 pages, paused at")
+               for level, msg in messages["sync_pipeline"])
+    assert any(level == logging.INFO and msg.startswith("[sync] fake/two: +100 commits")
+               for level, msg in messages["sync_service"])
+    assert any(level == logging.ERROR and msg.startswith("[sync] no/such-repo: FAILED")
+               for level, msg in messages["sync_service"])
+    out = capsys.readouterr().out
+    assert "[sync]" not in out and "Backfill of" not in out
+
+
+def test_worker_pool_is_bounded(db, monkeypatch):
+    active, peak = 0, 0
+    lock = threading.Lock()
+
+    def fake_sync_repo(*args, **kwargs):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+        return 0
+
+    monkeypatch.setattr(sync_service, "sync_repo", fake_sync_repo)
+    service = SyncService([(f"r/{i}", None) for i in range(6)], db, loader=None, workers=2)
+    assert service.run_once() == 6
+    assert peak == 2
+
+
+def test_run_forever_repeats_until_stopped(db, monkeypatch):
+    rounds = []
+    monkeypatch.setattr(sync_service, "sync_repo", lambda *args, **kwargs: rounds.append(time.monotonic()) or 0)
+    service = SyncService([("r/1", None)], db, loader=None, interval=0.05)
+    thread = threading.Thread(target=service.run_forever)
+    thread.start()
+    time.sleep(0.3)
+    service.stop()
+    thread.join(timeout=2)
+    assert not thread.is_alive()
+    assert 3 <= len(rounds) <= 8
+
+
+def test_cli_once_against_fake_api(server, tmp_path, monkeypatch):
+    # ETag 缓存用默认的相对路径 data/http_cache.db，不要写进仓库目录
+    monkeypatch.chdir(tmp_path)
+    db_path = str(tmp_path / "sync.db")
+    sync_service.main(["--repos", "fake/one", "fake/two", "--once", "--workers", "2",
+                       "--db", db_path, "--token", "dummy", "--base-url", server.url])
+    db = DBManager(db_path)
+    try:
+        assert [s["status"] for s in db.get_sync_status()] == ["ok", "ok"]
+        assert len(db.get_commits_frame("fake/one")) == 230
+    finally:
+        db.close()
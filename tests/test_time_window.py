@@ -0,0 +1,89 @@
+import datetime
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from conftest import make_commit
+from db_manager import _time_window, to_epoch
+from score_calculator import score_inputs
+
+REPO = "test/window"
+BASE = pd.Timestamp("2024-03-01", tz="UTC")
+
+
+@pytest.fixture
+def window_db(db):
+    # 每 6 小时一个 commit，共 20 天
+    db.save_commits(REPO, [
+        make_commit(f"c{i:03d}", f"fix: {i}", author=f"dev{i % 4}", additions=i, deletions=i % 3,
+                    date=(BASE + pd.Timedelta(hours=6 * i)).strftime("%Y-%m-%dT%H:%M:%SZ"))
+        for i in range(80)
+    ])
+    db.save_commits("other/repo", [make_commit("o1", "x", date="2024-03-05T00:00:00Z")])
+    return db
+
+
+@pytest.mark.parametrize("value", [
+    1709251200,
+    1709251200.7,
+    "2024-03-01",
+    "2024-03-01T00:00:00Z",
+    "2024-03-01T02:00:00+02:00",
+    datetime.date(2024, 3, 1),
+    datetime.datetime(2024, 3, 1),
+    pd.Timestamp("2024-03-01", tz="UTC"),
+])
+def test_to_epoch(value):
+    assert to_epoch(value) == 1709251200
+
+
+def test_to_epoch_none():
+    assert to_epoch(None) is None
+    assert _time_window() == ("", ())
+
+
+def test_exact_window_is_half_open(window_db):
+    since, until = BASE + pd.Timedelta(hours=12), BASE + pd.Timedelta(days=2)
+    df = window_db.get_commits_frame(REPO, since=since, until=until)
+    # since 那一刻的 commit 包含在内，until 那一刻的不包含
+    assert df.index.min() == since
+    assert df.index.max() == until - pd.Timedelta(hours=6)
+    assert len(df) == 6
+    assert [c["sha"] for c in window_db.get_all_commits(REPO, since=since, until=until)] == list(df["sha"][::-1])
+    assert set(window_db.get_commit_messages(REPO, since=since, until=until)) == set(df["sha"])
+
+    assert len(window_db.get_commits_frame(REPO, since="2024-03-15")) == 24
+    assert len(window_db.get_commits_frame(REPO, until="2024-03-02")) == 4
+    assert window_db.get_commits_frame(REPO, since="2025-01-01").empty
+
+
+def test_rollup_window_is_by_day(window_db):
+    # 汇总表按天过滤：until 所在的那天只要有一部分落在窗口里就整天算进来
+    daily = window_db.get_daily_counts(REPO, since="2024-03-02T18:00:00Z", until="2024-03-04T01:00:00Z")
+    assert list(daily.index.strftime("%Y-%m-%d")) == ["2024-03-02", "2024-03-03", "2024-03-04"]
+    assert daily.tolist() == [4, 4, 4]
+    assert window_db.get_daily_counts(REPO, since="2024-03-02", until="2024-03-04").tolist() == [4, 4]
+    assert window_db.get_author_counts(REPO, since="2024-03-02", until="2024-03-04").sum() == 8
+
+
+def test_score_inputs_window_matches_pandas(window_db):
+    since, until = "2024-03-05T06:00:00Z", "2024-03-12"
+    expected = score_inputs(window_db.get_commits_frame(REPO, since=since, until=until).assign(repo_name=REPO))
+    actual = window_db.get_score_inputs(REPO, since=since, until=until)
+    pd.testing.assert_frame_equal(actual, expected.astype("int64"), check_names=False)
+    # 所有仓库：窗口外的仓库不出现
+    assert list(window_db.get_score_inputs(since="2024-03-06").index) == [REPO]
+
+
+def test_window_uses_repo_ts_index(window_db):
+    window, params = _time_window("2024-03-02", "2024-03-04")
+    conn = sqlite3.connect(window_db.db_path)
+    try:
+        plan = " ".join(row[-1] for row in conn.execute(
+            f"EXPLAIN QUERY PLAN SELECT sha FROM commits WHERE repo_name = ?{window} ORDER BY ts", (REPO, *params)
+        ))
+    finally:
+        conn.close()
+    assert "idx_commits_repo_ts" in plan
+    assert "TEMP B-TREE" not in plan